@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.auth import get_current_admin_user
 from app.core.database import get_db
 from app.schemas import (
@@ -12,11 +12,20 @@ from app.schemas import (
     ContentModeration
 )
 from app.crud import (
-    user_crud,
     prompt_crud,
     comment_crud,
     stats_crud
 )
+from app.repositories.comment_repository import CommentRepository
+from app.repositories.user_repository import UserRepository
+from app.services.comment_service import CommentService
+from app.services.counter_service import CounterService
+from app.services.loaders import COMMENT_USER, PROMPT_AUTHOR, Loaders
+from app.services.rating_service import RatingService
+from app.services.search_service import SearchService
+from app.services.user_service import UserService
+from app.core.cache import invalidate
+from app.core.pagination import set_next_cursor
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -25,7 +34,7 @@ admin_auth = Depends(get_current_admin_user)
 
 @router.get("/stats", response_model=AdminStats)
 async def get_admin_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
@@ -35,58 +44,75 @@ async def get_admin_stats(
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
     全ユーザー情報の取得（ページネーション付き）
+    次ページがある場合はX-Next-Cursorヘッダーにカーソルを設定する
     """
-    return user_crud.get_users(db, skip=skip, limit=limit, search=search)
+    if skip:
+        return await UserRepository(db).list_users(skip=skip, limit=limit, search=search)
+
+    users, next_cursor = await UserService(db).get_users(limit=limit, search=search, cursor=cursor)
+    set_next_cursor(response, next_cursor)
+    return users
 
 @router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user_status(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
     ユーザーステータスの更新（アクティブ/非アクティブ、権限変更など）
     """
-    return user_crud.update_user(db, user_id, user_update)
+    users = UserRepository(db)
+    user = await users.get(user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = await users.update(user, user_update.dict(exclude_unset=True))
+    await invalidate("user", user_id)
+    return user
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
     ユーザーの削除
     """
-    user_crud.delete_user(db, user_id)
+    if not await UserRepository(db).delete_by_id(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await invalidate("user", user_id)
     return {"message": "User deleted successfully"}
 
 @router.get("/prompts/reported", response_model=List[PromptResponse])
 async def get_reported_prompts(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
     報告されたプロンプトの一覧を取得
     """
-    return prompt_crud.get_reported_prompts(db, skip=skip, limit=limit)
+    prompts = prompt_crud.get_reported_prompts(db, skip=skip, limit=limit)
+    return await Loaders(db).include(prompts, PROMPT_AUTHOR)
 
 @router.post("/prompts/{prompt_id}/moderate")
 async def moderate_prompt(
     prompt_id: int,
     moderation: ContentModeration,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
@@ -98,30 +124,33 @@ async def moderate_prompt(
 async def get_reported_comments(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
     報告されたコメントの一覧を取得
     """
-    return comment_crud.get_reported_comments(db, skip=skip, limit=limit)
+    comments = comment_crud.get_reported_comments(db, skip=skip, limit=limit)
+    return await Loaders(db).include(comments, COMMENT_USER)
 
 @router.delete("/comments/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
-    コメントの削除
+    コメントの削除（返信を含めて物理削除）
     """
-    comment_crud.delete_comment(db, comment_id)
+    comment = await CommentRepository(db).get(comment_id)
+    if comment:
+        await CommentService(db).delete_comment_tree(comment)
     return {"message": "Comment deleted successfully"}
 
 @router.post("/system/maintenance")
 async def toggle_maintenance_mode(
     enable: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
@@ -130,11 +159,44 @@ async def toggle_maintenance_mode(
     # メンテナンスモードの設定を更新
     return {"message": f"Maintenance mode {'enabled' if enable else 'disabled'}"}
 
+@router.post("/search/rebuild")
+async def rebuild_search_index(
+    db: AsyncSession = Depends(get_db),
+    current_admin = admin_auth
+):
+    """
+    プロンプト検索インデックスの再構築
+    """
+    count = await SearchService(db).rebuild_index()
+    return {"message": "Search index rebuilt", "indexed": count}
+
+@router.post("/ratings/reconcile")
+async def reconcile_ratings(
+    db: AsyncSession = Depends(get_db),
+    current_admin = admin_auth
+):
+    """
+    プロンプトの評価の集計値を評価テーブルから再計算し、ずれを修正
+    """
+    repaired = await RatingService(db).reconcile()
+    return {"message": "Rating aggregates reconciled", "repaired": repaired}
+
+@router.post("/counters/reconcile")
+async def reconcile_counters(
+    db: AsyncSession = Depends(get_db),
+    current_admin = admin_auth
+):
+    """
+    コメント数・いいね数のカウンターを子テーブルから再計算し、ずれを修正
+    """
+    repaired = await CounterService(db).reconcile()
+    return {"message": "Counters reconciled", "repaired": repaired}
+
 @router.get("/audit-logs")
 async def get_audit_logs(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin = admin_auth
 ):
     """
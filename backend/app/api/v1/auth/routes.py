@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any
 from datetime import timedelta
 
@@ -11,7 +11,7 @@ from app.core.security import (
     verify_password,
     get_password_hash
 )
-from app.crud import crud_user
+from app.repositories.user_repository import UserRepository
 from app.schemas import user as user_schema
 from app.schemas import token as token_schema
 from app.api import deps
@@ -21,16 +21,17 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="v1/auth/login")
 
 @router.post("/register", response_model=user_schema.User)
-def register_user(
+async def register_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_in: user_schema.UserCreate,
 ) -> Any:
     """
     新規ユーザー登録エンドポイント
     """
     # メールアドレスの重複チェック
-    user = crud_user.get_user_by_email(db, email=user_in.email)
+    users = UserRepository(db)
+    user = await users.get_by_email(user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,21 +39,19 @@ def register_user(
         )
     
     # ユーザーの作成
-    user = crud_user.create_user(db, obj_in=user_in)
+    user = await users.create(user_in.dict())
     return user
 
 @router.post("/login", response_model=token_schema.Token)
-def login(
-    db: Session = Depends(deps.get_db),
+async def login(
+    db: AsyncSession = Depends(deps.get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     ログインエンドポイント
     """
     # ユーザー認証
-    user = crud_user.authenticate(
-        db, email=form_data.username, password=form_data.password
-    )
+    user = await UserRepository(db).authenticate(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,8 +76,8 @@ def login(
     }
 
 @router.post("/refresh", response_model=token_schema.Token)
-def refresh_token(
-    db: Session = Depends(deps.get_db),
+async def refresh_token(
+    db: AsyncSession = Depends(deps.get_db),
     current_token: str = Depends(oauth2_scheme)
 ) -> Any:
     """
@@ -93,7 +92,7 @@ def refresh_token(
                 detail="無効なトークンです。"
             )
             
-        user = crud_user.get_user(db, id=user_id)
+        user = await UserRepository(db).get(int(user_id))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
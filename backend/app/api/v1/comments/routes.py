@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.auth import get_current_user
-from app.core.database import get_db
+from app.core.database import get_db, get_db_context, get_read_db
 from app.models.user import User
-from app.models.comment import Comment
-from app.schemas.comment import CommentCreate, CommentResponse, CommentUpdate
+from app.schemas.comment import CommentCreate, CommentResponse, CommentUpdate, CommentWithReplies
 from app.crud import comment as comment_crud
+from app.repositories.comment_repository import CommentRepository
+from app.services.comment_like_service import CommentLikeService
+from app.services.comment_service import CommentService, walk_thread
+from app.services.loaders import COMMENT_USER, Loaders
+from app.core.cache import get_cache, invalidate
+from app.core.etag import compute_etag, etag_matches, not_modified, set_etag
+from app.core.pagination import set_next_cursor
+from app.core.serialization import list_response
 
 router = APIRouter(
     prefix="/comments",
@@ -17,41 +24,58 @@ router = APIRouter(
 async def create_comment(
     comment: CommentCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     新しいコメントを作成する
+    parent_idを指定した場合はそのコメントへの返信になる
     """
-    return comment_crud.create_comment(db=db, comment=comment, user_id=current_user.id)
+    created = await CommentService(db).create_comment(comment.prompt_id, current_user.id, comment)
+    await Loaders(db).include([created], COMMENT_USER)
+    return created
 
 @router.get("/{prompt_id}", response_model=List[CommentResponse])
 async def get_comments_by_prompt(
     prompt_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     特定のプロンプトに対するコメントを取得する
+    ETagを返し、If-None-Matchが一致する場合はコメントを読み込まずに304を返す
+    投稿者はページ分をまとめて読み込み、一覧はコンパイル済みのエンコーダーで直接JSONに変換する
     """
-    return comment_crud.get_comments_by_prompt(
-        db=db,
-        prompt_id=prompt_id,
-        skip=skip,
-        limit=limit
-    )
+    cache = get_cache()
+    stamp = await cache.get_stamp("comment_list", prompt_id)
+    if stamp is None:
+        # キャッシュに保存するスタンプはレプリカの遅延の影響を受けないようプライマリから求める
+        async with get_db_context(read_only=True) as primary_db:
+            stamp = await CommentService(primary_db).get_comment_list_stamp(prompt_id)
+        await cache.set_stamp("comment_list", prompt_id, stamp)
+    etag = compute_etag(stamp, skip, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+    comments = await CommentRepository(db).list_by_prompt(prompt_id, skip=skip, limit=limit)
+    await Loaders(db).include(comments, COMMENT_USER)
+    return list_response(response, CommentResponse, comments)
 
 @router.put("/{comment_id}", response_model=CommentResponse)
 async def update_comment(
     comment_id: int,
     comment_update: CommentUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     コメントを更新する
     """
-    existing_comment = comment_crud.get_comment(db=db, comment_id=comment_id)
+    comments = CommentRepository(db)
+    existing_comment = await comments.get(comment_id)
     if not existing_comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,22 +88,21 @@ async def update_comment(
             detail="Not authorized to update this comment"
         )
     
-    return comment_crud.update_comment(
-        db=db,
-        comment_id=comment_id,
-        comment_update=comment_update
-    )
+    updated = await comments.update_content(existing_comment, comment_update.content)
+    await invalidate("comment_list", existing_comment.prompt_id)
+    await Loaders(db).include([updated], COMMENT_USER)
+    return updated
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_comment(
     comment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    コメントを削除する
+    コメントを削除する（論理削除。返信はスレッドに残る）
     """
-    existing_comment = comment_crud.get_comment(db=db, comment_id=comment_id)
+    existing_comment = await CommentRepository(db).get(comment_id)
     if not existing_comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -93,38 +116,113 @@ async def delete_comment(
             detail="Not authorized to delete this comment"
         )
     
-    comment_crud.delete_comment(db=db, comment_id=comment_id)
+    await CommentService(db).soft_delete_comment(comment_id)
     return None
 
+@router.post("/{comment_id}/like")
+async def like_comment(
+    comment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    コメントにいいねをする
+    """
+    await CommentLikeService(db).like(comment_id, current_user.id)
+    return {"message": "Comment liked successfully"}
+
+@router.delete("/{comment_id}/like")
+async def unlike_comment(
+    comment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    コメントのいいねを取り消す
+    """
+    await CommentLikeService(db).unlike(comment_id, current_user.id)
+    return {"message": "Comment unliked successfully"}
+
+@router.get("/{prompt_id}/thread", response_model=List[CommentWithReplies])
+async def get_comment_thread(
+    prompt_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    reply_limit: int = Query(3, ge=0, le=50),
+    depth: int = Query(3, ge=0, le=10),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    プロンプトのコメントを返信を含むスレッドとして新しい順に取得する
+    - reply_limit: 各コメントに含める返信の最大数（続きは /comments/{comment_id}/replies で取得する）
+    - depth: 含める返信の深さ
+    次ページがある場合はX-Next-Cursorヘッダーにカーソルを設定する
+    """
+    thread, next_cursor = await CommentService(db).get_thread(
+        prompt_id,
+        limit=limit,
+        cursor=cursor,
+        reply_limit=reply_limit,
+        max_depth=depth
+    )
+    set_next_cursor(response, next_cursor)
+    await Loaders(db).include(list(walk_thread(thread)), COMMENT_USER)
+    return list_response(response, CommentWithReplies, thread)
+
+@router.get("/{comment_id}/replies", response_model=List[CommentWithReplies])
+async def get_comment_replies(
+    comment_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    コメントへの直接の返信を古い順に取得する
+    各返信の reply_count と has_more_replies で、さらに返信があるかを示す
+    """
+    replies, next_cursor = await CommentService(db).get_replies(comment_id, limit=limit, cursor=cursor)
+    set_next_cursor(response, next_cursor)
+    await Loaders(db).include(replies, COMMENT_USER)
+    return list_response(response, CommentWithReplies, replies)
+
 @router.get("/user/{user_id}", response_model=List[CommentResponse])
 async def get_user_comments(
     user_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    特定のユーザーのコメントを取得する
+    特定のユーザーのコメントを新しい順に取得する
+    次ページがある場合はX-Next-Cursorヘッダーにカーソルを設定する
     """
-    return comment_crud.get_comments_by_user(
-        db=db,
-        user_id=user_id,
-        skip=skip,
-        limit=limit
-    )
+    if skip:
+        comments = await CommentRepository(db).list_by_user(user_id, skip=skip, limit=limit)
+    else:
+        comments, next_cursor = await CommentService(db).get_comments_by_user(
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor
+        )
+        set_next_cursor(response, next_cursor)
+    await Loaders(db).include(comments, COMMENT_USER)
+    return list_response(response, CommentResponse, comments)
 
 @router.get("/report/{comment_id}")
 async def report_comment(
     comment_id: int,
     reason: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     不適切なコメントを報告する
     """
-    comment = comment_crud.get_comment(db=db, comment_id=comment_id)
-    if not comment:
+    if not await CommentRepository(db).exists(comment_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Comment not found"
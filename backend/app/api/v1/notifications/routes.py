@@ -1,60 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
 
-from app.core.deps import get_current_user, get_db
+from app.core.config import settings
+from app.core.auth import get_current_user
+from app.core.database import get_db
+from app.core.notification_hub import event_stream, format_sse, get_notification_hub
 from app.models.user import User
-from app.models.notification import Notification
 from app.schemas.notification import (
+    NotificationBulkDelete,
+    NotificationBulkResult,
+    NotificationBulkUpdate,
+    NotificationCount,
     NotificationCreate,
-    NotificationResponse,
-    NotificationUpdate
-)
-from app.crud.notification import (
-    create_notification,
-    get_notifications,
-    get_notification_by_id,
-    update_notification,
-    delete_notification,
-    mark_notification_as_read
+    NotificationResponse
 )
+from app.repositories.notification_repository import NotificationRepository
+from app.services.notification_retention import retention_cutoff
+from app.services.notification_service import NotificationService
+from app.services.loaders import NOTIFICATION_SENDER, Loaders
+from app.core.pagination import set_next_cursor
+from app.core.serialization import list_response
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationResponse])
 async def list_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     ユーザーの通知一覧を取得します。
-    - skip: ページネーションのオフセット
+    - skip: ページネーションのオフセット（非推奨、cursorを使用してください）
     - limit: 1ページあたりの最大件数
+    - cursor: 前のページのX-Next-Cursorヘッダーの値
     - unread_only: 未読の通知のみを取得するかどうか
+    送信者はページ分をまとめて読み込み、一覧はコンパイル済みのエンコーダーで直接JSONに変換します。
     """
-    notifications = get_notifications(
-        db=db,
+    if skip:
+        notifications = await NotificationRepository(db).list_for_user(
+            current_user.id,
+            skip=skip,
+            limit=limit,
+            unread_only=unread_only,
+            since=retention_cutoff()
+        )
+        await Loaders(db).include(notifications, NOTIFICATION_SENDER)
+        return list_response(response, NotificationResponse, notifications)
+
+    notifications, next_cursor = await NotificationService(db).get_user_notifications(
         user_id=current_user.id,
-        skip=skip,
         limit=limit,
+        cursor=cursor,
         unread_only=unread_only
     )
-    return notifications
+    set_next_cursor(response, next_cursor)
+    await Loaders(db).include(notifications, NOTIFICATION_SENDER)
+    return list_response(response, NotificationResponse, notifications)
+
+@router.get("/unread-count", response_model=NotificationCount)
+async def get_unread_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    未読通知の数を取得します。
+    通知を数えずに、通知の作成・既読・削除の際に更新しているユーザーの未読数をキャッシュ経由で返します。
+    """
+    return NotificationCount(unread_count=await NotificationService(db).get_unread_count(current_user.id))
+
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通知をServer-Sent Eventsで配信します（通知一覧と未読数のポーリングの代わりに使用します）。
+    - notification イベント: 新しい通知（id は通知のID、data に操作後の未読数を含む）
+    - unread_count イベント: 既読・削除で変化した未読数（接続時にも現在の未読数を送ります）
+    Last-Event-IDヘッダーを付けて再接続すると、そのID以降に作成された通知を再送してから配信を再開します。
+    """
+    hub = get_notification_hub()
+    # 再送する通知の取得中に作成された通知を取りこぼさないように、先に購読を開始する
+    subscription = hub.subscribe(current_user.id)
+    try:
+        initial = []
+        if last_event_id is not None:
+            notifications = await NotificationRepository(db).list_after(
+                current_user.id, last_event_id, limit=settings.NOTIFICATION_STREAM_REPLAY_LIMIT
+            )
+            initial = [
+                (notification.id, format_sse("notification", notification.to_dict(), notification.id))
+                for notification in notifications
+            ]
+        unread_count = await NotificationService(db).get_unread_count(current_user.id)
+        initial.append((None, format_sse("unread_count", {"unread_count": unread_count})))
+        # ストリームの間DBの接続を保持しないように、応答を返す前にセッションを閉じる
+        await db.close()
+    except Exception:
+        hub.unsubscribe(subscription)
+        raise
+    return StreamingResponse(
+        event_stream(hub, subscription, initial, settings.NOTIFICATION_STREAM_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     指定されたIDの通知を取得します。
     """
-    notification = get_notification_by_id(db, notification_id)
+    notification = await NotificationRepository(db).get(notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     if notification.user_id != current_user.id:
@@ -64,64 +132,95 @@ async def get_notification(
 @router.post("/", response_model=NotificationResponse)
 async def create_new_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     新しい通知を作成します。
     主に内部システムから呼び出されることを想定しています。
     """
-    return create_notification(db=db, notification=notification, user_id=current_user.id)
+    return await NotificationService(db).create_notification(
+        notification.recipient_id,
+        notification.type.value,
+        notification.message,
+        sender_id=current_user.id,
+        link=notification.link
+    )
 
 @router.patch("/{notification_id}/read", response_model=NotificationResponse)
 async def mark_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    通知を既読状態にマークします。
+    通知を既読状態にマークします（未読数も同じトランザクションで更新します）。
     """
-    notification = get_notification_by_id(db, notification_id)
+    notification = await NotificationRepository(db).get(notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to modify this notification")
     
-    return mark_notification_as_read(db=db, notification_id=notification_id)
+    if not await NotificationService(db).mark_as_read(notification_id):
+        raise HTTPException(status_code=500, detail="Failed to mark notification as read")
+    return notification
 
 @router.delete("/{notification_id}")
 async def remove_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    指定された通知を削除します。
+    指定された通知を削除します（未読の通知の場合は未読数も同じトランザクションで更新します）。
     """
-    notification = get_notification_by_id(db, notification_id)
+    notification = await NotificationRepository(db).get(notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this notification")
     
-    delete_notification(db=db, notification_id=notification_id)
+    if not await NotificationService(db).delete_notification(notification_id):
+        raise HTTPException(status_code=500, detail="Failed to delete notification")
     return {"message": "Notification successfully deleted"}
 
 @router.patch("/read-all")
 async def mark_all_as_read(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    ユーザーの全ての未読通知を既読状態にマークします。
+    ユーザーの全ての未読通知を既読状態にマークします（1回のUPDATEで更新します）。
     """
-    notifications = get_notifications(
-        db=db,
-        user_id=current_user.id,
-        unread_only=True
-    )
-    for notification in notifications:
-        mark_notification_as_read(db=db, notification_id=notification.id)
-    
-    return {"message": "All notifications marked as read"}
\ No newline at end of file
+    if not await NotificationService(db).mark_all_as_read(current_user.id):
+        raise HTTPException(status_code=500, detail="Failed to mark notifications as read")
+    return {"message": "All notifications marked as read"}
+
+@router.patch("/bulk", response_model=NotificationBulkResult)
+async def bulk_update_notifications(
+    data: NotificationBulkUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通知をまとめて既読（is_read=false の場合は未読）にします（1回のUPDATEで更新します）。
+    - notification_ids: 対象の通知のID（最大1000件）
+    - before: この日時より前に作成された全ての通知を対象にする
+    状態を変更した通知の数と、操作後の未読数を返します。
+    """
+    return await NotificationService(db).update_many(current_user.id, data)
+
+@router.post("/bulk-delete", response_model=NotificationBulkResult)
+async def bulk_delete_notifications(
+    data: NotificationBulkDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通知をまとめて削除します（1回のDELETEで削除します）。
+    - notification_ids: 対象の通知のID（最大1000件）
+    - before: この日時より前に作成された全ての通知を対象にする
+    削除した通知の数と、操作後の未読数を返します。
+    """
+    return await NotificationService(db).delete_many(current_user.id, data)
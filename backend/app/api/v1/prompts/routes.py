@@ -1,118 +1,296 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.core.deps import get_current_user, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.auth import get_current_user
+from app.core.database import get_db, get_db_context, get_read_db
 from app.schemas.prompt import (
     PromptCreate,
     PromptUpdate,
     PromptResponse,
     PromptListResponse
 )
-from app.crud.prompt import prompt_crud
 from app.models.user import User
+from app.repositories.prompt_repository import PromptRepository
+from app.schemas.rating import RatingCreate, RatingDistribution, RatingResponse
+from app.services.like_service import LikeService
+from app.services.loaders import PROMPT_AUTHOR, Loaders
+from app.services.prompt_service import PromptService, prompt_stamp
+from app.services.rating_service import RatingService
+from app.services.tag_service import TagService, normalize_tags
+from app.services.trending_service import TrendingService, record_event
+from app.services.view_counter import get_view_counter
+from app.core.cache import get_cache
+from app.core.etag import compute_etag, etag_matches, not_modified, set_etag
+from app.core.pagination import set_next_cursor
+from app.core.serialization import list_response
 
 router = APIRouter()
 
+async def _mark_liked(db: AsyncSession, prompts: List, current_user: Optional[User]) -> List:
+    """ログイン中のユーザーがいいねしているかを一覧に設定する（1回のクエリで取得）"""
+    if current_user is None or not prompts:
+        return prompts
+    return await LikeService(db).mark_liked_by_user(prompts, current_user.id)
+
+def _as_dicts(prompts: List) -> List[dict]:
+    """一覧をキャッシュと同じ辞書の形式に揃える（タグはリストに変換される）"""
+    return [prompt if isinstance(prompt, dict) else prompt.to_dict() for prompt in prompts]
+
+async def _prompt_list_response(db: AsyncSession, response: Response, prompts: List, current_user: Optional[User]):
+    """
+    プロンプトの一覧をレスポンスにする
+    いいね済みかどうかと作成者は、それぞれ1回のクエリでページ分をまとめて読み込む
+    """
+    prompts = await _mark_liked(db, _as_dicts(prompts), current_user)
+    await Loaders(db).include(prompts, PROMPT_AUTHOR)
+    return list_response(response, PromptListResponse, prompts)
+
+async def _prompt_response(db: AsyncSession, prompt) -> dict:
+    """
+    作成・更新したプロンプトをレスポンスにする
+    タグをリストに変換し、公開状態（is_published）をスキーマの is_public として返す
+    """
+    data = prompt.to_dict()
+    data["is_public"] = prompt.is_published
+    await Loaders(db).include([data], PROMPT_AUTHOR)
+    return data
+
 @router.post("/", response_model=PromptResponse)
 async def create_prompt(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     prompt_in: PromptCreate,
     current_user: User = Depends(get_current_user)
 ):
     """新しいプロンプトを作成する"""
-    prompt = prompt_crud.create_with_owner(
-        db=db, obj_in=prompt_in, owner_id=current_user.id
-    )
-    return prompt
+    prompt = await PromptService(db).create_prompt(prompt_in, current_user.id)
+    return await _prompt_response(db, prompt)
 
 @router.get("/", response_model=List[PromptListResponse])
 async def list_prompts(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     skip: int = 0,
     limit: int = 10,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    language: Optional[str] = None,
     category: Optional[str] = None,
     tags: Optional[List[str]] = Query(None),
+    tag_mode: str = Query("all", regex="^(all|any)$"),
+    current_user: Optional[User] = Depends(get_current_user)
+):
+    """
+    プロンプトの一覧を取得する
+    searchが指定された場合は検索インデックスを使用し、関連度順に返す
+    tagsが指定された場合はタグインデックスで絞り込み、新しい順（ID降順）に返す
+    （tag_mode=allは全てのタグを含むもの、anyはいずれかのタグを含むもの）
+    それ以外は新しい順に返す
+    次ページがある場合はX-Next-Cursorヘッダーにカーソルを設定する
+    skipによるOFFSETページングは互換性のために残している（非推奨）
+    一覧はコンパイル済みのエンコーダーで直接JSONに変換する（response_modelはドキュメント用）
+    """
+    if search:
+        prompts, next_cursor = await PromptService(db).search_prompts(
+            search, limit=limit, cursor=cursor, language=language
+        )
+        set_next_cursor(response, next_cursor)
+        return await _prompt_list_response(db, response, prompts, current_user)
+
+    if skip:
+        tags = normalize_tags(tags)
+        prompts = await PromptRepository(db).list_prompts(
+            skip=skip,
+            limit=limit,
+            category=category,
+            is_published=True,
+            tag_clause=TagService(db).tag_filter_clause(tags, tag_mode) if tags else None
+        )
+        return await _prompt_list_response(db, response, prompts, current_user)
+
+    # 一覧はキャッシュから返す（いいね数などは最大 CACHE_LIST_TTL 秒遅れる）
+    # キャッシュに保存する値はレプリカの遅延の影響を受けないようプライマリから読む
+    # （セッションはクエリを実行するまで接続しないため、キャッシュにあればプライマリには接続しない）
+    async with get_db_context(read_only=True) as primary_db:
+        page = await PromptService(primary_db).get_prompt_list_data(
+            limit=limit,
+            filters={
+                "category": category,
+                "tags": tags,
+                "tag_mode": tag_mode,
+                "is_published": True
+            },
+            cursor=cursor
+        )
+    set_next_cursor(response, page["next_cursor"])
+    return await _prompt_list_response(db, response, page["items"], current_user)
+
+@router.get("/trending", response_model=List[PromptListResponse])
+async def list_trending_prompts(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    window: str = Query("24h", regex="^(1h|24h|7d)$"),
+    limit: int = Query(10, ge=1, le=100),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    """プロンプトの一覧を取得する"""
-    prompts = prompt_crud.get_multi(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=search,
-        category=category,
-        tags=tags
-    )
-    return prompts
+    """
+    トレンドのプロンプトを取得する
+    いいね・閲覧・コメント・共有を時間減衰させたスコアの順に返す
+    """
+    prompts = await TrendingService(db).get_trending_prompts(window=window, limit=limit)
+    return await _prompt_list_response(db, response, prompts, current_user)
 
 @router.get("/{prompt_id}", response_model=PromptResponse)
 async def get_prompt(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    """特定のプロンプトを取得する"""
-    prompt = prompt_crud.get(db=db, id=prompt_id)
+    """
+    特定のプロンプトを取得する（キャッシュ付き）
+    ETagを返し、If-None-Matchが一致する場合は本文を生成せずに304を返す
+    キャッシュにバージョンスタンプがあればプロンプトを読み込まずに判定する
+    """
+    liked = False
+    if current_user is not None:
+        liked = await LikeService(db).is_liked(prompt_id, current_user.id)
+
+    cache = get_cache()
+    stamp = await cache.get_stamp("prompt", prompt_id)
+    if stamp is not None:
+        etag = compute_etag(stamp, liked)
+        if etag_matches(if_none_match, etag):
+            get_view_counter().record(prompt_id)
+            record_event(prompt_id, "view")
+            return not_modified(etag)
+    else:
+        # スタンプがない場合は他のワーカーで無効化された可能性があり、プロセス内のキャッシュの本文は使わない
+        await cache.discard_local("prompt", prompt_id)
+
+    # キャッシュに保存する値はプライマリから読む（キャッシュにあればプライマリには接続しない）
+    async with get_db_context(read_only=True) as primary_db:
+        service = PromptService(primary_db)
+        prompt = await service.get_prompt_data(prompt_id)
+        if prompt and stamp is not None and prompt_stamp(prompt) != stamp:
+            # プロセス内のキャッシュの本文がスタンプより古い（他のワーカーで更新された）
+            await cache.discard_local("prompt", prompt_id)
+            prompt = await service.get_prompt_data(prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
+    current_stamp = prompt_stamp(prompt)
+    if current_stamp != stamp:
+        await cache.set_stamp("prompt", prompt_id, current_stamp)
+    etag = compute_etag(current_stamp, liked)
+    get_view_counter().record(prompt_id)
+    record_event(prompt_id, "view")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    prompt["is_liked_by_current_user"] = liked
+    await Loaders(db).include([prompt], PROMPT_AUTHOR)
+    set_etag(response, etag)
     return prompt
 
 @router.put("/{prompt_id}", response_model=PromptResponse)
 async def update_prompt(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     prompt_id: int,
     prompt_in: PromptUpdate,
     current_user: User = Depends(get_current_user)
 ):
     """プロンプトを更新する"""
-    prompt = prompt_crud.get(db=db, id=prompt_id)
+    prompt = await PromptRepository(db).get(prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    if prompt.owner_id != current_user.id:
+    if prompt.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    prompt = prompt_crud.update(db=db, db_obj=prompt, obj_in=prompt_in)
-    return prompt
+    prompt = await PromptService(db).update_prompt(prompt_id, prompt_in, current_user.id)
+    return await _prompt_response(db, prompt)
 
 @router.delete("/{prompt_id}")
 async def delete_prompt(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     prompt_id: int,
     current_user: User = Depends(get_current_user)
 ):
     """プロンプトを削除する"""
-    prompt = prompt_crud.get(db=db, id=prompt_id)
+    prompt = await PromptRepository(db).get(prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    if prompt.owner_id != current_user.id:
+    if prompt.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    prompt = prompt_crud.remove(db=db, id=prompt_id)
+    await PromptService(db).delete_prompt(prompt_id, current_user.id)
     return {"message": "Prompt deleted successfully"}
 
 @router.post("/{prompt_id}/like")
 async def like_prompt(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     prompt_id: int,
     current_user: User = Depends(get_current_user)
 ):
     """プロンプトにいいねをする"""
-    prompt = prompt_crud.like(db=db, prompt_id=prompt_id, user_id=current_user.id)
+    if not await PromptRepository(db).exists(prompt_id):
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    await LikeService(db).like(prompt_id, current_user.id)
     return {"message": "Prompt liked successfully"}
 
+@router.delete("/{prompt_id}/like")
+async def unlike_prompt(
+    *,
+    db: AsyncSession = Depends(get_db),
+    prompt_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """プロンプトのいいねを取り消す"""
+    await LikeService(db).unlike(prompt_id, current_user.id)
+    return {"message": "Prompt unliked successfully"}
+
 @router.post("/{prompt_id}/share")
 async def share_prompt(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     prompt_id: int,
     current_user: User = Depends(get_current_user)
 ):
     """プロンプトを共有する"""
-    prompt = prompt_crud.get(db=db, id=prompt_id)
-    if not prompt:
+    if not await PromptService(db).share_prompt(prompt_id):
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return {"message": "Prompt shared successfully"}
+
+@router.post("/{prompt_id}/ratings", response_model=RatingResponse)
+async def rate_prompt(
+    *,
+    db: AsyncSession = Depends(get_db),
+    prompt_id: int,
+    rating_in: RatingCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """プロンプトを評価する（評価済みの場合は評価を変更する）"""
+    if not await PromptRepository(db).exists(prompt_id):
         raise HTTPException(status_code=404, detail="Prompt not found")
-    # 共有処理を実装（例：共有カウントの増加）
-    return {"message": "Prompt shared successfully"}
\ No newline at end of file
+    return await RatingService(db).rate(prompt_id, current_user.id, rating_in.value)
+
+@router.delete("/{prompt_id}/ratings")
+async def delete_prompt_rating(
+    *,
+    db: AsyncSession = Depends(get_db),
+    prompt_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """プロンプトの評価を削除する"""
+    if not await RatingService(db).delete_rating(prompt_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Rating not found")
+    return {"message": "Rating deleted successfully"}
+
+@router.get("/{prompt_id}/ratings/distribution", response_model=RatingDistribution)
+async def get_rating_distribution(
+    prompt_id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """プロンプトの平均評価と評価ごとの件数を取得する"""
+    return await RatingService(db).get_distribution(prompt_id)
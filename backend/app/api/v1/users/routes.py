@@ -1,39 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from app.core.security import get_current_active_user, get_password_hash, verify_password
-from app.core.database import get_db
+from app.core.database import get_db, get_db_context, get_read_db
+from app.core.cache import get_cache, invalidate
+from app.core.etag import compute_etag, etag_matches, not_modified, set_etag
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserInDB
 from app.models.user import User
-from app.crud.user import (
-    create_user,
-    get_user_by_email,
-    get_user_by_id,
-    get_users,
-    update_user,
-    delete_user,
-    get_user_prompts
-)
+from app.repositories.prompt_repository import PromptRepository
+from app.repositories.user_repository import UserRepository
+from app.services.user_service import UserService
 
 router = APIRouter()
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """新規ユーザーを登録する"""
     # メールアドレスの重複チェック
-    db_user = get_user_by_email(db, email=user_in.email)
+    users = UserRepository(db)
+    db_user = await users.get_by_email(user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="このメールアドレスは既に登録されています"
         )
     
-    return create_user(db=db, user=user_in)
+    return await users.create(user_in.dict())
 
 @router.get("/me", response_model=UserResponse)
 async def read_current_user(
@@ -46,30 +43,59 @@ async def read_current_user(
 async def update_current_user(
     user_in: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """現在のユーザー情報を更新する"""
-    return update_user(db=db, user_id=current_user.id, user=user_in)
+    users = UserRepository(db)
+    user = await users.get(current_user.id)
+    user = await users.update(user, user_in.dict(exclude_unset=True))
+    await invalidate("user", current_user.id)
+    return user
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def read_user(
     user_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
 ):
-    """指定されたIDのユーザー情報を取得する"""
-    user = get_user_by_id(db, user_id=user_id)
+    """
+    指定されたIDのユーザー情報を取得する（キャッシュ付き）
+    ETagを返し、If-None-Matchが一致する場合はユーザーを読み込まずに304を返す
+    """
+    cache = get_cache()
+    stamp = await cache.get_stamp("user", user_id)
+    if stamp is not None and etag_matches(if_none_match, stamp):
+        return not_modified(stamp)
+    if stamp is None:
+        # スタンプがない場合は他のワーカーで無効化された可能性があり、プロセス内のキャッシュの値は使わない
+        await cache.discard_local("user", user_id)
+
+    # キャッシュに保存する値はプライマリから読む（キャッシュにあればプライマリには接続しない）
+    async with get_db_context(read_only=True) as primary_db:
+        service = UserService(primary_db)
+        user = await service.get_user_data(user_id)
+        if user and stamp is not None and compute_etag(*sorted(user.items())) != stamp:
+            # プロセス内のキャッシュの値がスタンプより古い（他のワーカーで更新された）
+            await cache.discard_local("user", user_id)
+            user = await service.get_user_data(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="ユーザーが見つかりません"
         )
+    etag = compute_etag(*sorted(user.items()))
+    if etag != stamp:
+        await cache.set_stamp("user", user_id, etag)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return user
 
 @router.get("/", response_model=List[UserResponse])
 async def read_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """ユーザー一覧を取得する（管理者のみ）"""
@@ -78,12 +104,12 @@ async def read_users(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="この操作には管理者権限が必要です"
         )
-    return get_users(db, skip=skip, limit=limit)
+    return await UserRepository(db).list_users(skip=skip, limit=limit)
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """指定されたユーザーを削除する（管理者のみ）"""
@@ -93,27 +119,28 @@ async def delete_user_by_id(
             detail="この操作には管理者権限が必要です"
         )
     
-    user = get_user_by_id(db, user_id=user_id)
+    users = UserRepository(db)
+    user = await users.get(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="ユーザーが見つかりません"
         )
     
-    delete_user(db=db, user_id=user_id)
+    await users.delete(user)
+    await invalidate("user", user_id)
 
 @router.get("/{user_id}/prompts", response_model=List[UserResponse])
 async def read_user_prompts(
     user_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """指定されたユーザーのプロンプト一覧を取得する"""
-    user = get_user_by_id(db, user_id=user_id)
-    if not user:
+    if not await UserRepository(db).exists(user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="ユーザーが見つかりません"
         )
-    return get_user_prompts(db=db, user_id=user_id, skip=skip, limit=limit)
\ No newline at end of file
+    return await PromptRepository(db).list_prompts(skip=skip, limit=limit, user_id=user_id)
\ No newline at end of file
@@ -0,0 +1,462 @@
+"""
+アプリケーション全体で使用するキャッシュ
+
+プロセス内のLRUキャッシュ（TTL付き）と、ワーカー間で共有するキャッシュ（Redis）の2層構成。
+値はJSONに変換して保持するため、キャッシュから取り出した値を変更してもキャッシュには影響しない。
+共有キャッシュは CACHE_BACKEND で切り替える（redis / memory / none）。
+memory はテストや単一プロセスでの動作確認用の代替実装。
+
+使用例:
+    @cached("prompt", key=lambda self, prompt_id: prompt_id)
+    async def get_prompt_data(self, prompt_id: int) -> Optional[Dict]:
+        ...
+
+    await get_cache().delete("prompt", prompt_id)
+"""
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+CACHE_HITS = Counter('cache_hits_total', 'Cache hits', ['namespace', 'tier'])
+CACHE_MISSES = Counter('cache_misses_total', 'Cache misses', ['namespace'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Local cache evictions', ['reason'])
+CACHE_ERRORS = Counter('cache_errors_total', 'Shared cache errors', ['operation'])
+
+# キャッシュキーに含める引数の型（self や db などのオブジェクトは含めない）
+_KEY_TYPES = (str, int, float, bool, type(None))
+
+# 定期的な処理のロックの有効期間（実行間隔に対する比率）
+JOB_LOCK_TTL_RATIO = 0.9
+
+class LocalLRUCache:
+    """
+    プロセス内のLRUキャッシュ（TTL付き）
+    最大件数を超えた場合は最も長く使われていないエントリから削除する
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS.labels(reason="expired").inc()
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.labels(reason="size").inc()
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+class SharedCacheBackend(ABC):
+    """
+    ワーカー間で共有するキャッシュのインターフェース
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """値を取得する（存在しない場合はNone）"""
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """値を保存する"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """値を削除する"""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """整数値を1増やし、増やした後の値を返す"""
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        """値が存在しない場合のみ保存する（保存した場合はTrue）"""
+
+    async def close(self) -> None:
+        """接続を閉じる"""
+
+class InMemorySharedCache(SharedCacheBackend):
+    """
+    共有キャッシュのメモリ上の代替実装（テスト・単一プロセス用）
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Optional[float], str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        self._entries[key] = (None, str(value))
+        return value
+
+    async def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+class RedisSharedCache(SharedCacheBackend):
+    """
+    Redisを使用した共有キャッシュ
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._client.set(key, value, ex=max(int(ttl), 1))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    async def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self._client.set(key, value, ex=max(int(ttl), 1), nx=True))
+
+    async def close(self) -> None:
+        await self._client.close()
+
+class Cache:
+    """
+    2層キャッシュ
+    プロセス内のLRUを先に参照し、なければ共有キャッシュを参照する。
+    共有キャッシュの障害時はキャッシュなしとして動作する
+
+    キーは「名前空間:世代:キー」で構成し、invalidate_namespace で世代を進めると
+    名前空間内の全てのエントリが参照されなくなる（一覧のキャッシュの無効化に使用する）。
+    世代は共有キャッシュから読むため、他のワーカーのLRUに残った古い世代のエントリも参照されない
+
+    エントリごとに小さなバージョンスタンプ（ETagなど）を保持でき、エントリの削除時に合わせて削除される。
+    スタンプは共有キャッシュにのみ保持するため、他のワーカーでの削除がすぐに見える。
+    delete は他のワーカーのLRUには届かないため、LRUの値が古い可能性がある場合は
+    スタンプと比較し、一致しなければ discard_local で破棄して読み直す
+
+    ワーカーごとに保持するデータ（タグインデックスなど）の変更を他のワーカーに知らせるため、
+    共有キャッシュ上のバージョン番号を bump_version で進め、get_version で読み取れる
+    （プロセス内のLRUを経由しないため、他のワーカーの変更がすぐに見える）
+    """
+
+    def __init__(
+        self,
+        local: LocalLRUCache,
+        shared: Optional[SharedCacheBackend] = None,
+        default_ttl: float = 3600,
+        enabled: bool = True
+    ):
+        self.local = local
+        self.shared = shared
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        # 共有キャッシュがない場合のバージョン番号（プロセス内のみ）
+        self._versions: Dict[str, int] = {}
+
+    async def _generation(self, namespace: str) -> str:
+        # 世代は共有キャッシュから毎回読み、他のワーカーの invalidate_namespace がすぐに反映されるようにする
+        # （共有キャッシュの障害時は最後に読んだ世代を使う）
+        key = f"__generation__:{namespace}"
+        if self.shared is not None:
+            try:
+                generation = await self.shared.get(key) or "0"
+                self.local.set(key, generation)
+                return generation
+            except Exception as e:
+                CACHE_ERRORS.labels(operation="get").inc()
+                logger.warning(f"Failed to read shared cache generation: {str(e)}")
+        return self.local.get(key) or "0"
+
+    async def _key(self, namespace: str, key: Any) -> str:
+        return f"{namespace}:{await self._generation(namespace)}:{key}"
+
+    async def get(self, namespace: str, key: Any) -> Optional[Any]:
+        """キャッシュから値を取得する（存在しない場合はNone）"""
+        if not self.enabled:
+            return None
+        full_key = await self._key(namespace, key)
+        value = self.local.get(full_key)
+        if value is not None:
+            CACHE_HITS.labels(namespace=namespace, tier="local").inc()
+            return json.loads(value)
+        value = await self._shared_get(full_key)
+        if value is not None:
+            CACHE_HITS.labels(namespace=namespace, tier="shared").inc()
+            self.local.set(full_key, value)
+            return json.loads(value)
+        CACHE_MISSES.labels(namespace=namespace).inc()
+        return None
+
+    async def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """キャッシュに値を保存する（値はJSONに変換できる必要がある）"""
+        if not self.enabled or value is None:
+            return
+        ttl = ttl or self.default_ttl
+        full_key = await self._key(namespace, key)
+        encoded = json.dumps(value, default=str, separators=(",", ":"))
+        self.local.set(full_key, encoded, ttl)
+        if self.shared is not None:
+            try:
+                await self.shared.set(full_key, encoded, ttl)
+            except Exception as e:
+                CACHE_ERRORS.labels(operation="set").inc()
+                logger.warning(f"Failed to write shared cache: {str(e)}")
+
+    async def delete(self, namespace: str, key: Any) -> None:
+        """キャッシュから値（とバージョンスタンプ）を削除する"""
+        if not self.enabled:
+            return
+        full_key = await self._key(namespace, key)
+        for target in (full_key, f"{full_key}#stamp"):
+            self.local.delete(target)
+            if self.shared is not None:
+                try:
+                    await self.shared.delete(target)
+                except Exception as e:
+                    CACHE_ERRORS.labels(operation="delete").inc()
+                    logger.warning(f"Failed to delete shared cache: {str(e)}")
+
+    async def get_stamp(self, namespace: str, key: Any) -> Optional[str]:
+        """
+        エントリのバージョンスタンプを取得する（存在しない場合はNone）
+        共有キャッシュがある場合はプロセス内のLRUを経由せず、他のワーカーでの削除がすぐに見えるようにする
+        """
+        if not self.enabled:
+            return None
+        stamp_key = f"{await self._key(namespace, key)}#stamp"
+        if self.shared is None:
+            return self.local.get(stamp_key)
+        return await self._shared_get(stamp_key)
+
+    async def set_stamp(self, namespace: str, key: Any, stamp: str, ttl: Optional[float] = None) -> None:
+        """エントリのバージョンスタンプを保存する（共有キャッシュがある場合は共有キャッシュにのみ保存する）"""
+        if not self.enabled:
+            return
+        ttl = ttl or self.default_ttl
+        stamp_key = f"{await self._key(namespace, key)}#stamp"
+        if self.shared is None:
+            self.local.set(stamp_key, stamp, ttl)
+            return
+        try:
+            await self.shared.set(stamp_key, stamp, ttl)
+        except Exception as e:
+            CACHE_ERRORS.labels(operation="set").inc()
+            logger.warning(f"Failed to write shared cache: {str(e)}")
+
+    async def discard_local(self, namespace: str, key: Any) -> None:
+        """
+        プロセス内のLRUからエントリを削除する（共有キャッシュのエントリは残す）
+        他のワーカーで削除・更新されたエントリがLRUに残っている場合に、スタンプとの比較から呼び出す
+        """
+        if not self.enabled:
+            return
+        self.local.delete(await self._key(namespace, key))
+
+    async def invalidate_namespace(self, namespace: str) -> None:
+        """名前空間内の全てのエントリを無効にする"""
+        if not self.enabled:
+            return
+        key = f"__generation__:{namespace}"
+        generation = int(self.local.get(key) or 0) + 1
+        if self.shared is not None:
+            try:
+                generation = await self.shared.incr(key)
+            except Exception as e:
+                CACHE_ERRORS.labels(operation="incr").inc()
+                logger.warning(f"Failed to invalidate shared cache namespace: {str(e)}")
+        self.local.set(key, str(generation))
+
+    async def get_version(self, name: str) -> Optional[int]:
+        """
+        ワーカー間で共有するバージョン番号を取得する
+
+        Returns:
+            Optional[int]: バージョン番号（共有キャッシュの障害時はNone）
+        """
+        if self.shared is None:
+            return self._versions.get(name, 0)
+        key = f"__version__:{name}"
+        try:
+            return int(await self.shared.get(key) or 0)
+        except Exception as e:
+            CACHE_ERRORS.labels(operation="get").inc()
+            logger.warning(f"Failed to read shared version: {str(e)}")
+            return None
+
+    async def bump_version(self, name: str) -> Optional[int]:
+        """
+        ワーカー間で共有するバージョン番号を1進める
+
+        Returns:
+            Optional[int]: 進めた後のバージョン番号（共有キャッシュの障害時はNone）
+        """
+        if self.shared is None:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+        try:
+            return await self.shared.incr(f"__version__:{name}")
+        except Exception as e:
+            CACHE_ERRORS.labels(operation="incr").inc()
+            logger.warning(f"Failed to bump shared version: {str(e)}")
+            return None
+
+    async def acquire_lock(self, name: str, ttl: float) -> bool:
+        """
+        ワーカー間で1つだけが取得できるロックを取得する（ttl 秒後に自動的に解放される）
+        共有キャッシュがない場合（単一ワーカー）と共有キャッシュの障害時は常に取得できる
+
+        Returns:
+            bool: 取得した場合は True（他のワーカーが保持している場合は False）
+        """
+        if self.shared is None:
+            return True
+        try:
+            return await self.shared.set_if_absent(f"__lock__:{name}", "1", ttl)
+        except Exception as e:
+            CACHE_ERRORS.labels(operation="lock").inc()
+            logger.warning(f"Failed to acquire shared lock: {str(e)}")
+            return True
+
+    async def _shared_get(self, key: str) -> Optional[str]:
+        if self.shared is None:
+            return None
+        try:
+            return await self.shared.get(key)
+        except Exception as e:
+            CACHE_ERRORS.labels(operation="get").inc()
+            logger.warning(f"Failed to read shared cache: {str(e)}")
+            return None
+
+    def clear_local(self) -> None:
+        """プロセス内のキャッシュを空にする"""
+        self.local.clear()
+
+    async def close(self) -> None:
+        """共有キャッシュの接続を閉じる"""
+        if self.shared is not None:
+            await self.shared.close()
+
+def _build_shared_cache() -> Optional[SharedCacheBackend]:
+    backend = settings.CACHE_BACKEND
+    if backend == "redis" and settings.REDIS_URL:
+        try:
+            return RedisSharedCache(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis is not installed, the shared cache tier is disabled")
+            return None
+    if backend == "memory":
+        return InMemorySharedCache()
+    return None
+
+@lru_cache()
+def get_cache() -> Cache:
+    """プロセス内のキャッシュのシングルトンを取得する"""
+    return Cache(
+        local=LocalLRUCache(settings.CACHE_LOCAL_MAX_SIZE, settings.CACHE_LOCAL_TTL),
+        shared=_build_shared_cache(),
+        default_ttl=settings.CACHE_TIMEOUT,
+        enabled=settings.CACHE_ENABLED
+    )
+
+def _default_key(args: tuple, kwargs: dict) -> str:
+    parts = [repr(arg) for arg in args if isinstance(arg, _KEY_TYPES)]
+    parts += [f"{name}={value!r}" for name, value in sorted(kwargs.items()) if isinstance(value, _KEY_TYPES)]
+    return ":".join(parts)
+
+def cached(namespace: str, ttl: Optional[float] = None, key: Optional[Callable[..., Any]] = None) -> Callable:
+    """
+    非同期関数の戻り値をキャッシュするデコレーター
+    戻り値はJSONに変換できる値（辞書・リストなど）である必要があり、Noneはキャッシュしない
+
+    Args:
+        namespace (str): キャッシュの名前空間（無効化の単位）
+        ttl (Optional[float]): 有効期間（秒）。省略時は CACHE_TIMEOUT
+        key (Optional[Callable]): 関数と同じ引数を受け取りキーを返す関数。
+            省略時は文字列・数値などの引数からキーを作る（self や db は含めない）
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if not cache.enabled:
+                return await func(*args, **kwargs)
+            cache_key = key(*args, **kwargs) if key else _default_key(args, kwargs)
+            value = await cache.get(namespace, cache_key)
+            if value is not None:
+                return value
+            value = await func(*args, **kwargs)
+            await cache.set(namespace, cache_key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorator
+
+async def invalidate(namespace: str, key: Any) -> None:
+    """キャッシュのエントリを無効にする"""
+    await get_cache().delete(namespace, key)
+
+async def invalidate_namespace(namespace: str) -> None:
+    """名前空間内の全てのキャッシュを無効にする"""
+    await get_cache().invalidate_namespace(namespace)
+
+async def claim_periodic_job(name: str, interval: float) -> bool:
+    """
+    定期的な処理を実行するワーカーを1つに絞る
+    ロックの有効期間を間隔より少し短くし、次の実行時には解放されているようにする
+
+    Returns:
+        bool: このワーカーが実行する場合は True（直近の間隔内に他のワーカーが実行した場合は False）
+    """
+    return await get_cache().acquire_lock(f"job:{name}", interval * JOB_LOCK_TTL_RATIO)
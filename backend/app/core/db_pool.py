@@ -0,0 +1,240 @@
+"""
+DB接続プールの計測と適応的なサイズ調整
+
+- 計測: プールのイベント（checkout / checkin）で使用中の接続数を数え、接続の取得にかかった時間と
+  タイムアウトを InstrumentedAsyncQueuePool で記録する。超過接続数と上限はスクレイプ時にプールから読む
+- 適応的なサイズ調整（DB_POOL_ADAPTIVE）: 一定間隔で区間内の接続待ち時間を確認し、
+  目標を超えていれば上限（pool_size + max_overflow）を増やし、使用中の接続数が上限を十分に下回っていれば減らす。
+  上限は max_overflow だけで調整する（常に保持する接続数 pool_size は変えない）
+"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 接続の取得は通常ミリ秒未満のため、短い待ち時間の境界を加える
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025) + Histogram.DEFAULT_BUCKETS
+
+# メトリクス定義
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections checked out from the pool', ['pool'])
+DB_POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections opened beyond pool_size', ['pool'])
+DB_POOL_LIMIT = Gauge('db_pool_max_connections', 'Current connection limit (pool_size + max_overflow)', ['pool'])
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time to obtain a connection from the pool',
+    ['pool'],
+    buckets=WAIT_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Pool checkout timeouts', ['pool'])
+
+@dataclass
+class PoolStats:
+    """
+    プールの区間ごとの統計（適応的なサイズ調整に使用する）
+
+    Attributes:
+        checked_out (int): 使用中の接続数
+        peak (int): 区間内の使用中の接続数の最大値
+        waits (List[float]): 区間内の接続の取得にかかった時間（秒）
+        timeouts (int): 区間内のタイムアウトの回数
+    """
+    checked_out: int = 0
+    peak: int = 0
+    waits: List[float] = field(default_factory=list)
+    timeouts: int = 0
+
+    def reset(self) -> None:
+        """区間を終了し、次の区間の統計を開始する"""
+        self.peak = self.checked_out
+        self.waits = []
+        self.timeouts = 0
+
+# プールのラベルごとの統計（engine.dispose() でプールが作り直されても引き継ぐ）
+_stats: Dict[str, PoolStats] = {}
+
+def pool_stats(label: str) -> PoolStats:
+    """ラベルのプールの統計を取得する"""
+    return _stats.setdefault(label, PoolStats())
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    接続の取得にかかった時間とタイムアウトを記録する AsyncAdaptedQueuePool
+    取得時間には、空きがなく待った時間と、新しい接続を開いた時間が含まれる
+    """
+    label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(pool=self.label).inc()
+            pool_stats(self.label).timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_WAIT.labels(pool=self.label).observe(waited)
+            pool_stats(self.label).waits.append(waited)
+
+    def recreate(self) -> "InstrumentedAsyncQueuePool":
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+def connection_limit(pool: AsyncAdaptedQueuePool) -> int:
+    """プールが同時に開ける接続数（超過接続が無制限の場合は -1）"""
+    if pool._max_overflow < 0:
+        return -1
+    return pool.size() + pool._max_overflow
+
+def worker_connection_budget() -> Optional[int]:
+    """全ワーカーの接続数の上限（DB_MAX_CONNECTIONS）から求めた、ワーカーあたりの上限"""
+    if settings.DB_MAX_CONNECTIONS <= 0:
+        return None
+    return max(1, settings.DB_MAX_CONNECTIONS // max(1, settings.WORKERS_COUNT))
+
+def instrument_engine(engine: AsyncEngine, label: str = "primary") -> None:
+    """
+    エンジンのプールにメトリクスを設定する
+
+    Args:
+        engine (AsyncEngine): InstrumentedAsyncQueuePool を使用するエンジン
+        label (str): メトリクスの pool ラベル
+    """
+    engine.pool.label = label
+    stats = pool_stats(label)
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checked_out += 1
+        stats.peak = max(stats.peak, stats.checked_out)
+        DB_POOL_CHECKED_OUT.labels(pool=label).set(stats.checked_out)
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.checked_out = max(0, stats.checked_out - 1)
+        DB_POOL_CHECKED_OUT.labels(pool=label).set(stats.checked_out)
+
+    # 超過接続数と上限はプールの状態をスクレイプ時に読む（作り直された場合は新しいプールを読む）
+    DB_POOL_OVERFLOW.labels(pool=label).set_function(lambda: max(0, engine.pool.overflow()))
+    DB_POOL_LIMIT.labels(pool=label).set_function(lambda: connection_limit(engine.pool))
+
+def percentile(values: List[float], fraction: float) -> float:
+    """値のパーセンタイル（最近傍法、空の場合は0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+class PoolAutoscaler:
+    """
+    接続待ち時間に応じてプールの上限を増減するクラス
+    区間内の待ち時間の95パーセンタイルが目標を超えるか、タイムアウトがあれば上限を1.5倍にし、
+    使用中の接続数の最大値が上限より増分以上少なければ上限を1つ減らす
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        min_connections: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        interval: Optional[float] = None,
+        target_wait: Optional[float] = None,
+        label: str = "primary"
+    ):
+        """
+        Args:
+            engine (AsyncEngine): 対象のエンジン
+            min_connections (Optional[int]): 上限の下限（pool_size より小さくはしない）
+            max_connections (Optional[int]): 上限の上限（ワーカーあたりの接続数の上限も超えない）
+            interval (Optional[float]): 調整する間隔（秒）
+            target_wait (Optional[float]): 接続待ち時間の目標（秒）
+            label (str): 対象のプールのラベル
+        """
+        self.engine = engine
+        self.label = label
+        self.interval = interval or settings.DB_POOL_ADAPT_INTERVAL
+        self.target_wait = settings.DB_POOL_TARGET_WAIT if target_wait is None else target_wait
+        self.min_connections = min_connections or settings.DB_POOL_MIN_CONNECTIONS
+        self.max_connections = max_connections or settings.DB_POOL_MAX_CONNECTIONS
+        budget = worker_connection_budget()
+        if budget is not None:
+            self.max_connections = min(self.max_connections, budget)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """定期的な調整を開始する"""
+        if self._task is None or self._task.done():
+            pool_stats(self.label).reset()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的な調整を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.error(f"Failed to adjust connection pool size: {str(e)}")
+
+    def adjust(self) -> int:
+        """
+        直近の区間の統計から上限を決め、プールの max_overflow に反映する
+        上限を下げた場合、超えている分の接続は返却時に閉じられる
+
+        Returns:
+            int: 調整後の上限
+        """
+        pool = self.engine.pool
+        stats = pool_stats(self.label)
+        limit = connection_limit(pool)
+        if limit < 0:
+            return limit
+        lower = max(self.min_connections, pool.size())
+        upper = max(self.max_connections, lower)
+
+        wait = percentile(stats.waits, 0.95)
+        peak = stats.peak
+        step = max(1, limit // 2)
+        if stats.timeouts or wait > self.target_wait:
+            new_limit = min(limit + step, upper)
+        elif peak + step < limit:
+            new_limit = max(limit - 1, lower)
+        else:
+            new_limit = min(max(limit, lower), upper)
+        stats.reset()
+
+        if new_limit != limit:
+            pool._max_overflow = new_limit - pool.size()
+            logger.info(
+                f"Connection pool '{self.label}' limit {limit} -> {new_limit} "
+                f"(p95 wait {wait * 1000:.1f}ms, peak {peak})"
+            )
+        return new_limit
+
+@lru_cache()
+def get_pool_autoscaler() -> PoolAutoscaler:
+    """プライマリのプールのサイズ調整のシングルトンを取得する"""
+    from app.core.database import engine
+    return PoolAutoscaler(engine)
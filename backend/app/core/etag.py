@@ -0,0 +1,49 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Response
+
+# 条件付きGETのレスポンスに付けるヘッダー（毎回ETagで再検証させる）
+CACHE_CONTROL = "private, no-cache"
+
+def compute_etag(*parts: Any) -> str:
+    """
+    値の組み合わせから弱いETagを生成する
+
+    Args:
+        *parts: ETagに反映する値（ID・更新日時・件数など）
+
+    Returns:
+        str: W/"..." 形式のETag
+    """
+    digest = hashlib.blake2b(
+        "\x1f".join(str(part) for part in parts).encode("utf-8"),
+        digest_size=8
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match ヘッダーがETagに一致するかを返す（弱い比較）
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def set_etag(response: Response, etag: str) -> None:
+    """レスポンスにETagを設定する"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+def not_modified(etag: str) -> Response:
+    """304 Not Modified のレスポンスを返す（本文は生成しない）"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
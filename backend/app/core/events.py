@@ -0,0 +1,90 @@
+from typing import Callable
+
+from fastapi import FastAPI
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.database import close_db_connection
+from app.core.db_pool import get_pool_autoscaler
+from app.core.loop_monitor import get_loop_monitor
+from app.core.notification_hub import get_notification_hub
+from app.services.counter_service import get_counter_reconciler
+from app.services.notification_digest import get_notification_digest_scheduler
+from app.services.notification_outbox import get_notification_outbox_worker
+from app.services.notification_retention import get_notification_purger
+from app.services.search_service import build_search_index_on_startup
+from app.services.tag_service import rebuild_tag_index
+from app.services.trending_service import get_trending_engine, warm_up_trending
+from app.services.view_counter import get_view_counter
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def create_start_app_handler(app: FastAPI) -> Callable:
+    """
+    アプリケーション起動時に実行するハンドラーを生成する
+    """
+    async def start_app() -> None:
+        # イベントループの遅延の計測と停止の検出を開始する
+        get_loop_monitor().start()
+        # 検索インデックスを構築する（sqlite の場合はワーカー間で共有するファイルを1つのワーカーだけが再構築する）
+        try:
+            await build_search_index_on_startup()
+        except Exception as e:
+            logger.error(f"Failed to build search index on startup: {str(e)}")
+        # タグ絞り込み用のインデックスを構築する
+        try:
+            await rebuild_tag_index()
+        except Exception as e:
+            logger.error(f"Failed to build tag index on startup: {str(e)}")
+        # トレンドのランキングを直近のプロンプトで初期化する
+        try:
+            await warm_up_trending()
+        except Exception as e:
+            logger.error(f"Failed to warm up trending rankings on startup: {str(e)}")
+        # トレンドのイベントの共有するランキングへの定期的な書き込みを開始する
+        get_trending_engine().start()
+        # 通知のストリームに配るイベントの受信を開始する
+        try:
+            await get_notification_hub().start()
+        except Exception as e:
+            logger.error(f"Failed to start notification hub: {str(e)}")
+        # 通知のアウトボックスの定期的な取り出しを開始する
+        get_notification_outbox_worker().start()
+        # 未読の通知のメールのダイジェストの定期的な送信を開始する（各回の送信は1つのワーカーのみ）
+        if settings.ENABLE_EMAIL_NOTIFICATIONS:
+            get_notification_digest_scheduler().start()
+        # 保持期間を過ぎた通知の定期的な削除を開始する（各回の削除は1つのワーカーのみ）
+        get_notification_purger().start()
+        # 閲覧数の定期的な書き込みを開始する
+        get_view_counter().start()
+        # 非正規化したカウンターの定期的な再集計を開始する（各回の実行は1つのワーカーのみ）
+        get_counter_reconciler().start()
+        # 接続待ち時間に応じたプールの上限の調整を開始する
+        if settings.DB_POOL_ADAPTIVE:
+            get_pool_autoscaler().start()
+
+    return start_app
+
+def create_stop_app_handler(app: FastAPI) -> Callable:
+    """
+    アプリケーション終了時に実行するハンドラーを生成する
+    """
+    async def stop_app() -> None:
+        # 登録待ちの通知をDB接続を閉じる前に登録する
+        await get_notification_outbox_worker().stop()
+        await get_notification_digest_scheduler().stop()
+        await get_notification_purger().stop()
+        # 通知のストリームを閉じる（開いたままの接続があるとサーバーが終了できない）
+        await get_notification_hub().stop()
+        await get_pool_autoscaler().stop()
+        await get_counter_reconciler().stop()
+        # バッファに残っているトレンドのイベントを共有するランキングに書き込む
+        await get_trending_engine().stop()
+        # バッファに残っている閲覧数をDB接続を閉じる前に書き込む
+        await get_view_counter().stop()
+        await close_db_connection()
+        await get_cache().close()
+        await get_loop_monitor().stop()
+
+    return stop_app
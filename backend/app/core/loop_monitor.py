@@ -0,0 +1,243 @@
+"""
+イベントループの遅延の監視
+
+async のルートの中で同期の処理（DBアクセス・bcrypt のパスワード検証・bleach のサニタイズなど）を
+呼び出すと、その間イベントループが止まり、同じワーカーの他のリクエストが全て待たされる。
+ここではワーカーごとに次の方法でループの停止を計測する。
+
+- 遅延の計測: 一定間隔で sleep し、予定より遅れて再開した時間を遅延として記録する
+- 停止の検出: 別スレッドのウォッチドッグが、ループが閾値より長く応答しない場合に
+  ループのスレッドのスタックと、スタックに含まれるルート（エンドポイント）を記録する
+- デバッグモード（LOOP_MONITOR_DEBUG）: コルーチンの1ステップ（コールバック1回の実行）が
+  閾値より長くループを占有した場合にログに出力する（標準の asyncio のループのみ。uvloop では無効）
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Deque, Iterable, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# REQUEST_LATENCY（main.py）の既定のバケットと比較できるよう、同じ境界に短い遅延の境界を加える
+LAG_BUCKETS = (0.001, 0.0025) + Histogram.DEFAULT_BUCKETS
+
+# メトリクス定義
+EVENT_LOOP_LAG = Histogram('event_loop_lag_seconds', 'Event loop scheduling lag', buckets=LAG_BUCKETS)
+EVENT_LOOP_STALLS = Histogram(
+    'event_loop_stall_duration_seconds',
+    'Duration of event loop stalls longer than the threshold',
+    ['route'],
+    buckets=LAG_BUCKETS
+)
+EVENT_LOOP_SLOW_STEPS = Counter(
+    'event_loop_slow_steps_total',
+    'Coroutine steps holding the event loop longer than the threshold',
+    ['route']
+)
+
+# ルートのモジュールのディレクトリ（スタックからエンドポイントを特定する）
+_API_DIR = os.path.join("app", "api", "")
+# ログに出力するスタックの深さ
+STACK_DEPTH = 15
+
+@dataclass
+class Stall:
+    """
+    検出したイベントループの停止
+
+    Attributes:
+        route (str): 停止させたルート（エンドポイントが特定できない場合は "other"）
+        stack (str): 検出時のループのスレッドのスタック
+        duration (float): 停止していた時間（秒、停止中は検出時点までの時間）
+    """
+    route: str
+    stack: str
+    duration: float
+
+def endpoint_label(frames: Iterable[Tuple[str, str]]) -> str:
+    """
+    フレームの一覧からルートのラベルを求める
+    内側から順に見て、最初に見つかった app/api のモジュールの関数を「モジュール:関数」で返す
+
+    Args:
+        frames (Iterable[Tuple[str, str]]): 内側から順の (ファイル名, 関数名)
+    """
+    for filename, function in frames:
+        index = filename.rfind(_API_DIR)
+        if index != -1:
+            module = filename[index + len(_API_DIR):].rsplit(".", 1)[0].replace(os.sep, ".")
+            return f"{module}:{function}"
+    return "other"
+
+def _frame_chain(frame) -> Iterable[Tuple[str, str]]:
+    while frame is not None:
+        yield frame.f_code.co_filename, frame.f_code.co_name
+        frame = frame.f_back
+
+def _coroutine_chain(coro) -> Iterable[Tuple[str, str]]:
+    """await している先のコルーチンまでたどり、内側から順に返す"""
+    chain = []
+    while coro is not None and hasattr(coro, "cr_code"):
+        chain.append((coro.cr_code.co_filename, coro.cr_code.co_name))
+        coro = coro.cr_await
+    return reversed(chain)
+
+def describe_handle(handle: asyncio.Handle) -> Tuple[str, str]:
+    """
+    ループのコールバックの説明とルートのラベルを返す
+    タスクのステップの場合はコルーチンの名前と、await している先にあるエンドポイントを使う
+    """
+    task = getattr(handle._callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        code = getattr(coro, "cr_code", None)
+        name = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})" if code else repr(coro)
+        return f"task {task.get_name()} {name}", endpoint_label(_coroutine_chain(coro))
+    return repr(handle), "other"
+
+class SlowStepLogger:
+    """
+    コルーチンの1ステップの実行時間を計測し、閾値を超えたものをログに出力する（デバッグ用）
+    asyncio.Handle._run を置き換えるため、全てのコールバックに計測のオーバーヘッドがかかる
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._original: Optional[Callable] = None
+
+    def install(self) -> None:
+        if self._original is not None:
+            return
+        original = self._original = asyncio.events.Handle._run
+        threshold = self.threshold
+
+        def _run(handle: asyncio.Handle) -> None:
+            started = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                elapsed = time.perf_counter() - started
+                if elapsed >= threshold:
+                    description, route = describe_handle(handle)
+                    EVENT_LOOP_SLOW_STEPS.labels(route=route).inc()
+                    logger.warning(f"Event loop step took {elapsed:.3f}s in {route}: {description}")
+
+        asyncio.events.Handle._run = _run
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            asyncio.events.Handle._run = self._original
+            self._original = None
+
+class LoopMonitor:
+    """
+    イベントループの遅延の計測と停止の検出を行うクラス
+    start() を呼び出したイベントループを監視する
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        stall_threshold: Optional[float] = None,
+        debug: Optional[bool] = None,
+        slow_step_threshold: Optional[float] = None
+    ):
+        """
+        Args:
+            interval (Optional[float]): 遅延を計測する間隔（秒、0で無効）
+            stall_threshold (Optional[float]): ループの停止とみなす時間（秒）
+            debug (Optional[bool]): コルーチンの遅いステップをログに出力するかどうか
+            slow_step_threshold (Optional[float]): 遅いステップとみなす時間（秒）
+        """
+        self.interval = settings.LOOP_MONITOR_INTERVAL if interval is None else interval
+        self.stall_threshold = stall_threshold or settings.LOOP_STALL_THRESHOLD
+        self.debug = settings.LOOP_MONITOR_DEBUG if debug is None else debug
+        self.slow_steps = SlowStepLogger(slow_step_threshold or settings.LOOP_SLOW_STEP_THRESHOLD)
+        # 直近に検出した停止（新しいものが後ろ）
+        self.stalls: Deque[Stall] = deque(maxlen=20)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+
+    def start(self) -> None:
+        """監視を開始する（間隔が0の場合は何もしない）"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._last_beat = time.monotonic()
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+            self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+            self._watchdog.start()
+            if self.debug:
+                self.slow_steps.install()
+
+    async def stop(self) -> None:
+        """監視を停止する"""
+        self.slow_steps.uninstall()
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - self.interval))
+            self._last_beat = time.monotonic()
+
+    def _watch(self) -> None:
+        """
+        ウォッチドッグのスレッド
+        ループの計測が予定より stall_threshold 以上遅れたらスタックを記録し、再開したら停止時間を記録する
+        """
+        stall: Optional[Stall] = None
+        beat = self._last_beat
+        while not self._stopping.wait(self.stall_threshold / 2):
+            if stall is not None:
+                if self._last_beat != beat:
+                    stall.duration = self._last_beat - beat - self.interval
+                    EVENT_LOOP_STALLS.labels(route=stall.route).observe(stall.duration)
+                    stall = None
+                continue
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked >= self.stall_threshold:
+                stall = self.capture(blocked)
+
+    def capture(self, blocked: float) -> Stall:
+        """ループのスレッドのスタックを取得し、停止として記録する"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=STACK_DEPTH)) if frame is not None else ""
+        stall = Stall(route=endpoint_label(_frame_chain(frame)), stack=stack, duration=blocked)
+        self.stalls.append(stall)
+        logger.warning(f"Event loop blocked for {blocked:.3f}s in {stall.route}\n{stack}")
+        return stall
+
+@lru_cache()
+def get_loop_monitor() -> LoopMonitor:
+    """プロセス内のイベントループの監視のシングルトンを取得する"""
+    return LoopMonitor()
@@ -0,0 +1,42 @@
+"""
+メールの送信
+
+SMTP_HOST が設定されていない場合は送信できない（mail_enabled() が False になる）。
+smtplib はブロッキングの API のため、スレッドで実行してイベントループを止めないようにする。
+
+使用例:
+    if mail_enabled():
+        await send_email(user.email, "件名", "本文")
+"""
+import asyncio
+import smtplib
+from email.message import EmailMessage
+
+from app.core.config import settings
+
+DEFAULT_SENDER = "noreply@prompthub.com"
+
+def mail_enabled() -> bool:
+    """メールを送信できる設定かどうか"""
+    return bool(settings.SMTP_HOST)
+
+async def send_email(to: str, subject: str, body: str) -> None:
+    """
+    テキストのメールを送信する
+
+    Raises:
+        smtplib.SMTPException, OSError: 送信に失敗した場合
+    """
+    message = EmailMessage()
+    message["From"] = settings.SMTP_USER or DEFAULT_SENDER
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    await asyncio.to_thread(_send, message)
+
+def _send(message: EmailMessage) -> None:
+    with smtplib.SMTP(settings.SMTP_HOST, int(settings.SMTP_PORT or 587), timeout=30) as smtp:
+        smtp.starttls()
+        if settings.SMTP_USER and settings.SMTP_PASSWORD:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        smtp.send_message(message)
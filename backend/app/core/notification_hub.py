@@ -0,0 +1,317 @@
+"""
+通知のプッシュ配信（SSE）用のプロセス内 pub/sub ハブ
+
+クライアントは通知一覧と未読数をポーリングする代わりに /api/v1/notifications/stream に接続し、
+ハブから自分宛てのイベントを受け取る。ワーカーが複数ある場合、通知を作成したワーカーと
+クライアントが接続しているワーカーは異なるため、イベントはブローカーを経由して全てのワーカーのハブに配られる。
+ブローカーは NOTIFICATION_BROKER で切り替える（redis / memory）。memory は単一プロセス用の代替実装。
+
+接続ごとのキューは上限付きで、クライアントの読み取りが追いつかずキューがあふれた場合は
+その接続を閉じる（クライアントは Last-Event-ID を付けて再接続し、取りこぼした通知をDBから受け取る）。
+
+使用例:
+    await get_notification_hub().publish(user_id, "notification", data, event_id=notification.id)
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+STREAM_CONNECTIONS = Gauge('notification_stream_connections', 'Open notification stream connections in this worker')
+STREAM_EVENTS = Counter('notification_stream_events_total', 'Notification stream events delivered to connections', ['event'])
+STREAM_OVERFLOWS = Counter('notification_stream_overflows_total', 'Notification stream connections closed because their queue was full')
+
+CHANNEL = "notifications"
+
+# クライアントが接続が切れてから再接続するまでの待ち時間（ミリ秒、SSEの retry）
+RETRY_MILLISECONDS = 3000
+
+MessageHandler = Callable[[str], Awaitable[None]]
+# (SSEのイベントID, SSEのイベントの文字列)
+StreamEvent = Tuple[Optional[int], str]
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """SSEの1イベント分の文字列を返す"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+class NotificationBroker(ABC):
+    """
+    ワーカー間でイベントを配るブローカーのインターフェース
+    publish したメッセージは、自身を含む全てのワーカーの handler に届く
+    """
+
+    @abstractmethod
+    async def publish(self, message: str) -> None:
+        ...
+
+    @abstractmethod
+    async def start(self, handler: MessageHandler) -> None:
+        ...
+
+    @abstractmethod
+    async def stop(self) -> None:
+        ...
+
+class InMemoryBroker(NotificationBroker):
+    """
+    プロセス内のブローカー（単一プロセスやテスト用の代替実装）
+    """
+
+    def __init__(self):
+        self._handler: Optional[MessageHandler] = None
+
+    async def publish(self, message: str) -> None:
+        if self._handler is not None:
+            await self._handler(message)
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        self._handler = None
+
+class RedisBroker(NotificationBroker):
+    """
+    Redis の Pub/Sub を使用したブローカー
+    """
+
+    def __init__(self, url: str, channel: str = CHANNEL):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, message: str) -> None:
+        await self._client.publish(self.channel, message)
+
+    async def start(self, handler: MessageHandler) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: MessageHandler) -> None:
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            await handler(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 購読が切れた場合は少し待って再接続する（その間のイベントは再接続時の再送で補う）
+                logger.warning(f"Notification broker subscription failed: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._client.close()
+
+class Subscription:
+    """
+    1つのストリーム接続の購読
+    ハブから届いたイベント（イベントIDとSSEの文字列）を上限付きのキューに保持する
+    """
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[StreamEvent]" = asyncio.Queue(max_size)
+        # キューがあふれて閉じられたかどうか
+        self.overflowed = False
+        self._closed = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def offer(self, event: StreamEvent) -> bool:
+        """イベントをキューに入れる（キューがあふれた場合は購読を閉じてFalseを返す）"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self._closed.set()
+            return False
+
+    def close(self) -> None:
+        self._closed.set()
+
+    async def next(self, timeout: float) -> Optional[StreamEvent]:
+        """
+        次のイベントを待つ
+        timeout 秒以内にイベントが届かない場合（ハートビートを送る時）と、購読が閉じられた場合はNoneを返す
+        """
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        if self.closed:
+            return None
+        get = asyncio.ensure_future(self.queue.get())
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            done, _ = await asyncio.wait({get, closed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            if not get.done():
+                get.cancel()
+        if get in done and not get.cancelled():
+            return get.result()
+        return None
+
+class NotificationHub:
+    """
+    ユーザーごとのストリーム接続にイベントを配るハブ
+    """
+
+    def __init__(self, broker: NotificationBroker, queue_size: int = 100):
+        """
+        Args:
+            broker (NotificationBroker): ワーカー間でイベントを配るブローカー
+            queue_size (int): 接続ごとのキューの上限（これを超えると接続を閉じる）
+        """
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._started = False
+
+    async def start(self) -> None:
+        """ブローカーからのイベントの受信を開始する"""
+        if not self._started:
+            await self.broker.start(self.dispatch)
+            self._started = True
+
+    async def stop(self) -> None:
+        """受信を停止し、全ての接続を閉じる"""
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+                STREAM_CONNECTIONS.dec()
+        self._subscriptions.clear()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """ユーザー宛てのイベントの購読を開始する"""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        STREAM_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """購読を終了する"""
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        subscription.close()
+        STREAM_CONNECTIONS.dec()
+
+    async def publish(self, user_id: int, event: str, data: Any, event_id: Optional[int] = None) -> None:
+        """
+        ユーザー宛てのイベントを全てのワーカーに配信する
+        配信の失敗は通知の作成などの呼び出し元には伝えない（クライアントは再接続時にDBから受け取る）
+        """
+        message = json.dumps(
+            {"user_id": user_id, "event": event, "data": data, "id": event_id},
+            default=str,
+            separators=(",", ":")
+        )
+        try:
+            await self.broker.publish(message)
+        except Exception as e:
+            logger.warning(f"Failed to publish notification event: {str(e)}")
+
+    async def dispatch(self, message: str) -> None:
+        """ブローカーから届いたイベントを、このワーカーにある宛先ユーザーの接続に配る"""
+        payload = json.loads(message)
+        subscriptions = self._subscriptions.get(payload["user_id"])
+        if not subscriptions:
+            return
+        event_id = payload.get("id")
+        event = (event_id, format_sse(payload["event"], payload["data"], event_id))
+        for subscription in list(subscriptions):
+            if subscription.offer(event):
+                STREAM_EVENTS.labels(event=payload["event"]).inc()
+            elif subscription.overflowed:
+                STREAM_OVERFLOWS.inc()
+                logger.warning(f"Notification stream queue overflowed, closing connection of user {subscription.user_id}")
+                self.unsubscribe(subscription)
+
+async def event_stream(
+    hub: NotificationHub,
+    subscription: Subscription,
+    initial: List[StreamEvent],
+    heartbeat: float
+) -> AsyncIterator[str]:
+    """
+    SSEの応答本文を生成する
+    最初に initial（再接続時に再送する通知など）を送り、その後ハブから届いたイベントを送る。
+    イベントが heartbeat 秒届かない場合はコメント行を送り、プロキシに接続を切られないようにする。
+    購読は initial を求める前に開始しているため、initial と重複するイベント（ID が再送済みのID以下）は送らない
+
+    Args:
+        hub (NotificationHub): 購読を終了するハブ
+        subscription (Subscription): 接続の購読
+        initial (List[StreamEvent]): 最初に送るイベント（ID の昇順）
+        heartbeat (float): ハートビートの間隔（秒）
+    """
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        last_id = None
+        for event_id, event in initial:
+            if event_id is not None:
+                last_id = event_id
+            yield event
+        while True:
+            item = await subscription.next(heartbeat)
+            if item is None:
+                # 購読が閉じられた場合（キューのあふれ・終了時）はストリームを終え、クライアントに再接続させる
+                if subscription.closed:
+                    break
+                yield ": heartbeat\n\n"
+                continue
+            event_id, event = item
+            if event_id is not None and last_id is not None and event_id <= last_id:
+                continue
+            yield event
+    finally:
+        hub.unsubscribe(subscription)
+
+def _build_broker() -> NotificationBroker:
+    if settings.NOTIFICATION_BROKER == "redis" and settings.REDIS_URL:
+        try:
+            return RedisBroker(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis is not installed, notification events are delivered within this worker only")
+    return InMemoryBroker()
+
+@lru_cache()
+def get_notification_hub() -> NotificationHub:
+    """プロセス内の通知ハブのシングルトンを取得する"""
+    return NotificationHub(_build_broker(), queue_size=settings.NOTIFICATION_STREAM_QUEUE_SIZE)
@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from fastapi import Response
+from sqlalchemy import tuple_
+
+T = TypeVar("T")
+
+# 次ページのカーソルを返すレスポンスヘッダー
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursorError(ValueError):
+    """ページネーションカーソルが不正な場合に送出される例外"""
+
+def _encode_value(value: Any) -> list:
+    if isinstance(value, datetime):
+        return ["d", value.isoformat()]
+    if isinstance(value, (int, float)):
+        return ["n", value]
+    return ["s", str(value)]
+
+def _decode_value(item: list) -> Any:
+    kind, value = item
+    if kind == "d":
+        return datetime.fromisoformat(value)
+    if kind == "n":
+        return value
+    if kind == "s":
+        return str(value)
+    raise ValueError(f"Unknown cursor value type: {kind}")
+
+def _matches_type(value: Any, expected: Optional[Type]) -> bool:
+    """カーソルの値がソートキーの型に一致するかどうか（型が不明な場合は一致とみなす）"""
+    if expected is None:
+        return True
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+def _column_type(column) -> Optional[Type]:
+    """カラムの値のPythonの型を返す（求められない場合はNone）"""
+    try:
+        return column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+def encode_cursor(*values: Any) -> str:
+    """
+    キーセットの値（(created_at, id) や (score, id) など）を不透明なカーソル文字列に変換する
+
+    Args:
+        *values: ソートキーの値
+
+    Returns:
+        str: URLに含めて安全なカーソル文字列
+    """
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: Optional[int] = None, types: Optional[Sequence[Optional[Type]]] = None) -> Tuple:
+    """
+    カーソル文字列をキーセットの値に戻す
+    改ざんされたカーソルの値がそのままSQLに渡らないよう、types が指定された場合は値の型を検証する
+
+    Args:
+        cursor (str): encode_cursorで生成されたカーソル
+        size (Optional[int]): 期待するキーの数
+        types (Optional[Sequence[Optional[Type]]]): キーごとに期待する型（Noneのキーは検証しない）
+
+    Returns:
+        Tuple: ソートキーの値
+
+    Raises:
+        InvalidCursorError: カーソルが不正な場合
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = tuple(_decode_value(item) for item in json.loads(base64.urlsafe_b64decode(padded)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    if size is not None and len(values) != size:
+        raise InvalidCursorError("Invalid cursor")
+    if types is not None and (
+        len(values) != len(types)
+        or not all(_matches_type(value, expected) for value, expected in zip(values, types))
+    ):
+        raise InvalidCursorError("Invalid cursor")
+    return values
+
+def apply_keyset(query, columns: Sequence, cursor: Optional[str], limit: int, descending: bool = True):
+    """
+    クエリにキーセットページネーションの条件を適用する
+    OFFSETを使わずにインデックスの範囲検索で次ページを取得するため、深いページでも速度が変わらない
+    次ページの有無を判定するため、limitより1件多く取得する
+    カーソルの値の型がカラムの型と一致しない場合は InvalidCursorError を送出する（400として返される）
+
+    Args:
+        query: select() もしくは Query オブジェクト
+        columns (Sequence): ソートキーとなるカラム（最後は一意なカラムにすること）
+        cursor (Optional[str]): 前のページで返されたカーソル
+        limit (int): 1ページあたりの件数
+        descending (bool): 降順で並べる場合はTrue
+
+    Returns:
+        条件・並び順・件数を適用したクエリ
+    """
+    if cursor:
+        values = decode_cursor(cursor, size=len(columns), types=[_column_type(column) for column in columns])
+        key = tuple_(*columns)
+        query = query.where(key < tuple_(*values) if descending else key > tuple_(*values))
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order_by).limit(limit + 1)
+
+def keyset_page(rows: List[T], limit: int, key: Callable[[T], Tuple]) -> Tuple[List[T], Optional[str]]:
+    """
+    apply_keysetで取得した結果を1ページ分に切り詰め、次ページのカーソルを生成する
+
+    Args:
+        rows (List[T]): limit + 1 件まで取得した結果
+        limit (int): 1ページあたりの件数
+        key (Callable[[T], Tuple]): 行からソートキーの値を取り出す関数
+
+    Returns:
+        Tuple[List[T], Optional[str]]: ページの内容と次ページのカーソル（最終ページの場合はNone）
+    """
+    if len(rows) <= limit:
+        return list(rows), None
+    rows = list(rows[:limit])
+    return rows, encode_cursor(*key(rows[-1]))
+
+def created_at_key(row) -> Tuple:
+    """(created_at, id) のソートキーを返す"""
+    return row.created_at, row.id
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """次ページのカーソルをレスポンスヘッダーに設定する"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,94 @@
+"""
+最近書き込んだユーザーの記録（read-your-writes）
+
+レプリカは書き込みから少し遅れて反映されるため、書き込んだユーザーが直後に一覧などを読むと
+自分の変更が見えないことがある。書き込みをコミットしたユーザーを READ_YOUR_WRITES_WINDOW 秒だけ記録し、
+その間の読み取りをプライマリに固定する。
+
+記録はプロセス内のLRUと共有キャッシュ（Redis）の両方に保存し、別のワーカーに届いた読み取りにも反映する。
+ユーザーはルートの認証とは独立して、DBを読まずに判定できるよう Authorization ヘッダーのハッシュで識別する。
+"""
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Optional, Set
+
+from starlette.requests import HTTPConnection
+
+from app.core.cache import LocalLRUCache, SharedCacheBackend, get_cache
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "recent_write"
+
+def writer_key(connection: Optional[HTTPConnection]) -> Optional[str]:
+    """リクエストのユーザーを識別するキー（認証情報がない場合はNone）"""
+    if connection is None:
+        return None
+    authorization = connection.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+class RecentWrites:
+    """最近書き込んだユーザーを一定時間記録するクラス"""
+
+    def __init__(self, window: float, shared: Optional[SharedCacheBackend] = None, max_size: int = 10000):
+        """
+        Args:
+            window (float): 書き込み後に読み取りをプライマリに固定する時間（秒、0で無効）
+            shared (Optional[SharedCacheBackend]): ワーカー間で共有する記録先
+            max_size (int): プロセス内に保持するユーザー数の上限
+        """
+        self.window = window
+        self.shared = shared
+        self.local = LocalLRUCache(max_size, window)
+        self._pending: Set[asyncio.Task] = set()
+
+    def mark(self, key: str) -> None:
+        """
+        書き込みを記録する
+        コミットの直後（セッションのイベント）から呼び出すため同期で、共有キャッシュへの保存はタスクで行う
+        """
+        if self.window <= 0:
+            return
+        self.local.set(key, "1")
+        if self.shared is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._mark_shared(key))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _mark_shared(self, key: str) -> None:
+        try:
+            await self.shared.set(f"{KEY_PREFIX}:{key}", "1", self.window)
+        except Exception as e:
+            logger.warning(f"Failed to record recent write: {str(e)}")
+
+    async def is_recent(self, key: Optional[str]) -> bool:
+        """
+        ユーザーが直近 window 秒以内に書き込んだかどうか
+        共有キャッシュの障害時は、整合性を優先して書き込んだものとみなす
+        """
+        if key is None or self.window <= 0:
+            return False
+        if self.local.get(key) is not None:
+            return True
+        if self.shared is None:
+            return False
+        try:
+            return await self.shared.get(f"{KEY_PREFIX}:{key}") is not None
+        except Exception as e:
+            logger.warning(f"Failed to read recent writes: {str(e)}")
+            return True
+
+@lru_cache()
+def get_recent_writes() -> RecentWrites:
+    """最近書き込んだユーザーの記録のシングルトンを取得する"""
+    return RecentWrites(settings.READ_YOUR_WRITES_WINDOW, shared=get_cache().shared)
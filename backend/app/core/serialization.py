@@ -0,0 +1,174 @@
+"""
+レスポンスの高速なシリアライズ
+
+一覧のエンドポイントでは、ORMオブジェクトをpydanticのモデルで検証してから標準のjsonで変換すると
+ページ件数に比例してCPU時間がかかる。ここではスキーマごとに事前にコンパイルしたエンコーダーで
+ORMオブジェクト・辞書を直接JSONに変換できる値にし、orjsonで出力する。
+エンコーダーは値の検証を行わないため、DBやキャッシュから取得した信頼できるデータにのみ使用する。
+
+使用例:
+    return list_response(response, PromptListResponse, prompts)
+"""
+import datetime
+import decimal
+import enum
+import json
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from uuid import UUID
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson が無い環境では標準のjsonを使用する
+    orjson = None
+
+Encoder = Callable[[Any], Dict[str, Any]]
+
+# レスポンスに引き継がないヘッダー（本文に合わせて再計算される）
+_SKIPPED_HEADERS = {"content-length", "content-type"}
+
+def _default(value: Any) -> Any:
+    """orjson・json が標準で扱えない値を変換する"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json") if hasattr(value, "model_dump") else value.dict()
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, UUID):
+        return str(value)
+    return str(value)
+
+def dumps(content: Any) -> bytes:
+    """値をJSONのバイト列に変換する（orjson が無い場合は標準のjsonを使用する）"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson で本文を生成するJSONレスポンス
+    アプリケーションの default_response_class として使用する
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def _model_fields(schema: Type[BaseModel]) -> List[Tuple[str, Any, Any]]:
+    """スキーマのフィールドを (名前, 型, デフォルト値) の一覧で返す（pydantic v1/v2 両対応）"""
+    if hasattr(schema, "model_fields"):
+        return [
+            (name, field.annotation, None if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in schema.model_fields.items()
+        ]
+    return [
+        (name, field.outer_type_, None if field.required else field.get_default())
+        for name, field in schema.__fields__.items()
+    ]
+
+def _nested_schema(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """
+    型注釈に含まれる入れ子のスキーマを返す
+
+    Returns:
+        Tuple[Optional[Type[BaseModel]], bool]: 入れ子のスキーマ（無い場合はNone）とリストかどうか
+    """
+    is_list = False
+    while True:
+        origin = typing.get_origin(annotation)
+        if origin is typing.Union:
+            args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+            if len(args) != 1:
+                return None, False
+            annotation = args[0]
+        elif origin in (list, List, tuple, set):
+            args = typing.get_args(annotation)
+            if not args:
+                return None, False
+            annotation = args[0]
+            is_list = True
+        else:
+            break
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, is_list
+    return None, False
+
+@lru_cache(maxsize=None)
+def compile_encoder(schema: Type[BaseModel]) -> Encoder:
+    """
+    スキーマのエンコーダーをコンパイルする
+    フィールドの一覧・デフォルト値・入れ子のスキーマの解決はスキーマごとに1回だけ行い、
+    変換時は属性（辞書の場合はキー）を読み出すだけにする
+
+    Args:
+        schema (Type[BaseModel]): レスポンスのスキーマ
+
+    Returns:
+        Encoder: ORMオブジェクトもしくは辞書を、スキーマのフィールドだけを持つ辞書に変換する関数
+    """
+    plain: List[Tuple[str, Any]] = []
+    nested: List[Tuple[str, Any, Encoder, bool]] = []
+    for name, annotation, default in _model_fields(schema):
+        nested_schema, is_list = _nested_schema(annotation)
+        if nested_schema is None:
+            plain.append((name, default))
+        else:
+            # 自身を参照するスキーマ（返信など）でも無限に再帰しないよう、変換時に解決する
+            nested.append((name, default, nested_schema, is_list))
+
+    def encode(obj: Any) -> Dict[str, Any]:
+        if isinstance(obj, dict):
+            get = obj.get
+            data = {name: get(name, default) for name, default in plain}
+        else:
+            data = {name: getattr(obj, name, default) for name, default in plain}
+            get = None
+        for name, default, nested_schema, is_list in nested:
+            value = get(name, default) if get is not None else getattr(obj, name, default)
+            if value is not None:
+                encoder = compile_encoder(nested_schema)
+                value = [encoder(item) for item in value] if is_list else encoder(value)
+            data[name] = value
+        return data
+
+    encode.__name__ = f"encode_{schema.__name__}"
+    return encode
+
+def encode_many(schema: Type[BaseModel], items: Iterable[Any]) -> List[Dict[str, Any]]:
+    """一覧の各要素をスキーマのエンコーダーで変換する"""
+    encoder = compile_encoder(schema)
+    return [encoder(item) for item in items]
+
+def list_response(response: Response, schema: Type[BaseModel], items: Iterable[Any]) -> FastJSONResponse:
+    """
+    一覧をpydanticの検証を通さずにJSONレスポンスにする
+    ルートで設定したヘッダー（X-Next-Cursor・ETag など）は返すレスポンスに引き継ぐ
+
+    Args:
+        response (Response): ルートに注入されたレスポンス
+        schema (Type[BaseModel]): 一覧の要素のスキーマ
+        items (Iterable[Any]): ORMオブジェクトもしくは辞書の一覧
+
+    Returns:
+        FastJSONResponse: 一覧のJSONレスポンス
+    """
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key.lower() not in _SKIPPED_HEADERS
+    }
+    return FastJSONResponse(content=encode_many(schema, items), headers=headers)
@@ -19,10 +19,14 @@ from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.error_handler import ErrorHandlerMiddleware
 from app.core.events import create_start_app_handler, create_stop_app_handler
 from app.core.logging import setup_logging
+from app.core.pagination import InvalidCursorError, NEXT_CURSOR_HEADER
+from app.core.serialization import FastJSONResponse
 
 # メトリクス定義
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests')
 REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request duration')
+# イベントループの遅延・停止のヒストグラム（event_loop_lag_seconds など）は app.core.loop_monitor で定義し、
+# REQUEST_LATENCY と同じレジストリに同じ境界のバケットで出力する
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -40,7 +44,9 @@ def create_application() -> FastAPI:
         version=settings.VERSION,
         docs_url="/api/docs",
         redoc_url="/api/redoc",
-        openapi_url="/api/openapi.json"
+        openapi_url="/api/openapi.json",
+        # レスポンスの本文は orjson で生成する
+        default_response_class=FastJSONResponse
     )
 
     # セキュリティ設定
@@ -53,6 +59,7 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
     )
     app.add_middleware(HTTPSRedirectMiddleware)
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=settings.ALLOWED_HOSTS)
@@ -78,6 +85,13 @@ def create_application() -> FastAPI:
             content={"detail": exc.detail},
         )
 
+    @app.exception_handler(InvalidCursorError)
+    async def invalid_cursor_handler(request: Request, exc: InvalidCursorError) -> JSONResponse:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": str(exc)},
+        )
+
     # ルーターの登録
     app.include_router(
         api_router,
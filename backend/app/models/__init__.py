@@ -16,8 +16,11 @@ from .rating import Rating
 from .tag import Tag
 from .category import Category
 from .notification import Notification
+from .notification_outbox import NotificationOutbox
 from .activity import Activity
 from .prompt_tag import PromptTag
+from .like import Like
+from .comment_like import CommentLike
 from .user_following import UserFollowing
 
 # List of all models for easy access
@@ -29,8 +32,11 @@ __all__ = [
     'Tag',
     'Category',
     'Notification',
+    'NotificationOutbox',
     'Activity',
     'PromptTag',
+    'Like',
+    'CommentLike',
     'UserFollowing',
 ]
 
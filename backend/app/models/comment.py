@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Index
+from sqlalchemy.orm import backref, relationship
 from app.database import Base
 
 class Comment(Base):
@@ -9,6 +9,14 @@ class Comment(Base):
     プロンプトに対するユーザーのコメントを管理するモデル
     """
     __tablename__ = 'comments'
+    __table_args__ = (
+        # ユーザーごとのコメント一覧のキーセットページング用
+        Index('ix_comments_user_created_at_id', 'user_id', 'created_at', 'id'),
+        # スレッド（部分木）の範囲検索用
+        Index('ix_comments_prompt_id_path', 'prompt_id', 'path'),
+        # 返信の一覧のキーセットページング用
+        Index('ix_comments_parent_id_path', 'parent_id', 'path'),
+    )
 
     # 主キー
     id = Column(Integer, primary_key=True, index=True)
@@ -20,6 +28,14 @@ class Comment(Base):
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete='CASCADE'), nullable=False)
     parent_id = Column(Integer, ForeignKey('comments.id', ondelete='CASCADE'), nullable=True)
+
+    # スレッド構造（マテリアライズドパス）
+    # path は祖先から自身までのIDを固定長で連結した文字列（例: "0000000012/0000000034/"）で、
+    # 部分木は path の前方一致（インデックスの範囲検索）で取得できる
+    path = Column(String(255), nullable=True)
+    depth = Column(Integer, default=0, nullable=False)
+    # 直接の返信の数（返信の追加・削除時に更新する）
+    reply_count = Column(Integer, default=0, nullable=False)
     
     # タイムスタンプ
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -27,12 +43,15 @@ class Comment(Base):
     
     # 削除フラグ（論理削除用）
     is_deleted = Column(Boolean, default=False, nullable=False)
+
+    # いいね数（いいね・取り消し時に加減算する）
+    like_count = Column(Integer, default=0, nullable=False)
     
     # リレーションシップ
     user = relationship("User", back_populates="comments")
     prompt = relationship("Prompt", back_populates="comments")
     replies = relationship("Comment", 
-                         backref=relationship("Comment", remote_side=[id]),
+                         backref=backref("parent", remote_side=[id]),
                          cascade="all, delete-orphan")
     
     # いいね関連
@@ -48,19 +67,22 @@ class Comment(Base):
             'user_id': self.user_id,
             'prompt_id': self.prompt_id,
             'parent_id': self.parent_id,
+            'depth': self.depth,
+            'reply_count': self.reply_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'is_deleted': self.is_deleted,
             'user': self.user.to_dict() if self.user else None,
-            'likes_count': len(self.likes)
+            'likes_count': self.likes_count
         }
 
     @property
     def likes_count(self):
         """
         コメントに対するいいねの数を返すプロパティ
+        いいねの行は読み込まず、非正規化したカウンターを返す
         """
-        return len([like for like in self.likes if not like.is_deleted])
+        return self.like_count or 0
 
     def soft_delete(self):
         """
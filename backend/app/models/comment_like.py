@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Boolean, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class CommentLike(Base):
+    """
+    コメントのいいねモデル
+    ユーザーによるコメントへのいいねを1行ずつ管理する
+    """
+    __tablename__ = 'comment_likes'
+    __table_args__ = (
+        # 同じユーザーによる重複したいいねを防ぐ
+        Index('ix_comment_likes_user_id_comment_id', 'user_id', 'comment_id', unique=True),
+        # コメントごとのいいね数の一括集計用
+        Index('ix_comment_likes_comment_id', 'comment_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    comment_id = Column(Integer, ForeignKey('comments.id', ondelete='CASCADE'), nullable=False)
+    is_deleted = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # リレーションシップ
+    comment = relationship("Comment", back_populates="likes")
+
+    def __repr__(self):
+        return f'<CommentLike user_id={self.user_id} comment_id={self.comment_id}>'
@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Like(Base):
+    """
+    いいねモデル
+    ユーザーによるプロンプトへのいいねを1行ずつ管理する
+    """
+    __tablename__ = 'likes'
+    __table_args__ = (
+        # 同じユーザーによる重複したいいねを防ぎ、「自分がいいねしたか」の一括取得にも使用する
+        Index('ix_likes_user_id_prompt_id', 'user_id', 'prompt_id', unique=True),
+        Index('ix_likes_prompt_id', 'prompt_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete='CASCADE'), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # リレーションシップ
+    user = relationship("User", back_populates="likes")
+
+    def __repr__(self):
+        return f'<Like user_id={self.user_id} prompt_id={self.prompt_id}>'
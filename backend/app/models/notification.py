@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -9,6 +9,14 @@ class Notification(Base):
     ユーザーへの各種通知（コメント、いいね、フォローなど）を管理する
     """
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # ユーザーごとの新着順キーセットページング用
+        Index('ix_notifications_user_created_at_id', 'user_id', 'created_at', 'id'),
+        # まとめた通知の検索用（キーは受信者・タイプ・関連オブジェクト・時間帯から作る）
+        Index('ix_notifications_group_key', 'group_key', unique=True),
+        # 保持期間を過ぎた通知を古い順に削除する
+        Index('ix_notifications_created_at_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
@@ -17,6 +25,15 @@ class Notification(Base):
     content = Column(String(500), nullable=False)
     link = Column(String(255), nullable=True)  # 通知に関連するリンク
     is_read = Column(Boolean, default=False)
+    related_object_type = Column(String(50), nullable=True)  # 'prompt' など
+    related_object_id = Column(Integer, nullable=True)
+    # 同じ対象への同じ種類の通知を1件にまとめる場合のキー（まとめない通知はNone）
+    group_key = Column(String(255), nullable=True)
+    # まとめた通知の操作したユーザーの数と、新しい順の一部のユーザーのID
+    actor_count = Column(Integer, default=1, nullable=False)
+    actor_ids = Column(JSON, nullable=True)
+    # メールのダイジェストに含めた日時（その後にまとめた通知が更新された場合は再び含める）
+    digested_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -56,6 +73,10 @@ class Notification(Base):
             'content': self.content,
             'link': self.link,
             'is_read': self.is_read,
+            'related_object_type': self.related_object_type,
+            'related_object_id': self.related_object_id,
+            'actor_count': self.actor_count,
+            'actor_ids': self.actor_ids or [],
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
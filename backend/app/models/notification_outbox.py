@@ -0,0 +1,51 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
+from app.database import Base
+
+class NotificationOutbox(Base):
+    """
+    通知のアウトボックスモデル
+    通知のきっかけになった操作（コメントの作成など）と同じトランザクションで書き込み、
+    バックグラウンドのワーカーがまとめて notifications に登録する（登録した行は削除する）
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # ワーカーが登録待ちの行を古い順に取り出す
+        Index('ix_notification_outbox_status_available_at_id', 'status', 'available_at', 'id'),
+    )
+
+    # status の値
+    PENDING = 'pending'  # 登録待ち（available_at 以降に取り出す）
+    DEAD = 'dead'  # 再試行の上限に達した（デッドレター、原因の調査後に pending に戻すと再登録される）
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    sender_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    type = Column(String(50), nullable=False)
+    content = Column(String(500), nullable=False)
+    link = Column(String(255), nullable=True)
+    related_object_type = Column(String(50), nullable=True)
+    related_object_id = Column(Integer, nullable=True)
+    status = Column(String(20), default=PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def notification_values(self) -> dict:
+        """登録する通知の列の値（作成日時は操作が行われた日時にする）"""
+        return {
+            'user_id': self.user_id,
+            'sender_id': self.sender_id,
+            'type': self.type,
+            'content': self.content,
+            'link': self.link,
+            'related_object_type': self.related_object_type,
+            'related_object_id': self.related_object_id,
+            'is_read': False,
+            'created_at': self.created_at,
+            'updated_at': self.created_at,
+        }
+
+    def __repr__(self):
+        return f'<NotificationOutbox(id={self.id}, type={self.type}, user_id={self.user_id}, status={self.status})>'
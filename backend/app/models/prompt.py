@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from app.utils.slugify import slugify
@@ -10,6 +10,10 @@ class Prompt(Base):
     ユーザーが作成・共有するプロンプトの情報を管理します
     """
     __tablename__ = 'prompts'
+    __table_args__ = (
+        # 新着順のキーセットページング用
+        Index('ix_prompts_created_at_id', 'created_at', 'id'),
+    )
 
     # 基本情報
     id = Column(Integer, primary_key=True)
@@ -26,7 +30,18 @@ class Prompt(Base):
     # 統計情報
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
+    # コメント数（削除されていないコメント）・シェア数（作成・削除・シェア時に加減算する）
+    comment_count = Column(Integer, default=0, nullable=False)
+    share_count = Column(Integer, default=0, nullable=False)
     average_rating = Column(Float, default=0.0)
+    # 評価の集計値（評価の追加・変更・削除時に差分で更新する）
+    rating_sum = Column(Integer, default=0, nullable=False)
+    rating_count = Column(Integer, default=0, nullable=False)
+    rating_count_1 = Column(Integer, default=0, nullable=False)
+    rating_count_2 = Column(Integer, default=0, nullable=False)
+    rating_count_3 = Column(Integer, default=0, nullable=False)
+    rating_count_4 = Column(Integer, default=0, nullable=False)
+    rating_count_5 = Column(Integer, default=0, nullable=False)
     
     # ステータスと公開設定
     is_published = Column(Boolean, default=True)
@@ -73,6 +88,8 @@ class Prompt(Base):
             'language': self.language,
             'view_count': self.view_count,
             'like_count': self.like_count,
+            'comment_count': self.comment_count,
+            'share_count': self.share_count,
             'average_rating': self.average_rating,
             'is_published': self.is_published,
             'is_featured': self.is_featured,
@@ -85,16 +102,26 @@ class Prompt(Base):
     def increment_view_count(self):
         """
         閲覧数をインクリメント
+        行を直接更新せず、閲覧数の集約に記録してまとめてDBに書き込む
         """
-        self.view_count += 1
+        from app.services.view_counter import get_view_counter
+
+        get_view_counter().record(self.id)
+
+    @property
+    def rating_histogram(self):
+        """
+        評価ごとの件数を返す
+        """
+        return {value: getattr(self, f'rating_count_{value}') or 0 for value in range(1, 6)}
 
     def update_average_rating(self):
         """
         平均評価を更新
+        評価を読み込まずに集計値から計算する
         """
-        if self.ratings:
-            total_rating = sum(rating.value for rating in self.ratings)
-            self.average_rating = total_rating / len(self.ratings)
+        if self.rating_count:
+            self.average_rating = self.rating_sum / self.rating_count
         else:
             self.average_rating = 0.0
 
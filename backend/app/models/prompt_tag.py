@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from app.database import Base
+
+class PromptTag(Base):
+    """
+    プロンプトとタグの関連モデル
+    主キー (prompt_id, tag_id) に加え、タグからプロンプトを引くための逆向きのインデックスを持つ
+    """
+    __tablename__ = 'prompt_tags'
+    __table_args__ = (
+        Index('ix_prompt_tags_tag_id_prompt_id', 'tag_id', 'prompt_id'),
+    )
+
+    prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = Column(Integer, ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f'<PromptTag prompt_id={self.prompt_id} tag_id={self.tag_id}>'
@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, CheckConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Rating(Base):
+    """
+    評価モデル
+    ユーザーによるプロンプトへの評価（1〜5）を管理する
+    集計値は Prompt の rating_sum / rating_count / rating_count_1〜5 に保持する
+    """
+    __tablename__ = 'ratings'
+    __table_args__ = (
+        # 1ユーザーにつき1プロンプト1件の評価
+        Index('ix_ratings_user_id_prompt_id', 'user_id', 'prompt_id', unique=True),
+        # 集計の再計算用
+        Index('ix_ratings_prompt_id_value', 'prompt_id', 'value'),
+        CheckConstraint('value BETWEEN 1 AND 5', name='ck_ratings_value'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete='CASCADE'), nullable=False)
+    value = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # リレーションシップ
+    prompt = relationship('Prompt', back_populates='ratings')
+
+    def to_dict(self):
+        """評価オブジェクトを辞書形式に変換"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'prompt_id': self.prompt_id,
+            'value': self.value,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+        }
+
+    def __repr__(self):
+        return f'<Rating user_id={self.user_id} prompt_id={self.prompt_id} value={self.value}>'
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class Tag(Base):
+    """
+    タグモデル
+    プロンプトに付与されるタグを正規化して管理する
+    """
+    __tablename__ = 'tags'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)
+
+    def to_dict(self):
+        """タグオブジェクトを辞書形式に変換"""
+        return {
+            'id': self.id,
+            'name': self.name,
+        }
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
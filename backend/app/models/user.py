@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.database import Base
@@ -11,6 +11,10 @@ class User(Base):
     システムのユーザー情報を管理するためのモデルクラス
     """
     __tablename__ = 'users'
+    __table_args__ = (
+        # ユーザー一覧のキーセットページング用
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36), unique=True, default=lambda: str(uuid.uuid4()))
@@ -26,12 +30,14 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = Column(DateTime)
+    # 未読通知の数（通知の作成・既読・削除の際に差分で更新し、定期的な再集計でずれを修正する）
+    unread_notification_count = Column(Integer, default=0, nullable=False)
 
     # リレーションシップ
     prompts = relationship("Prompt", back_populates="user", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan")
     likes = relationship("Like", back_populates="user", cascade="all, delete-orphan")
-    notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
+    notifications = relationship("Notification", back_populates="user", foreign_keys="Notification.user_id", cascade="all, delete-orphan")
 
     def __init__(self, username, email, password, display_name=None):
         self.username = username
@@ -0,0 +1,18 @@
+"""
+データアクセス層（AsyncSession 上のリポジトリ）
+
+ルート・サービスからのDBアクセスは、同期の Session・Query API ではなくここのリポジトリを通して行う。
+"""
+from .base import BaseRepository
+from .comment_repository import CommentRepository
+from .notification_repository import NotificationRepository
+from .prompt_repository import PromptRepository
+from .user_repository import UserRepository
+
+__all__ = [
+    'BaseRepository',
+    'CommentRepository',
+    'NotificationRepository',
+    'PromptRepository',
+    'UserRepository',
+]
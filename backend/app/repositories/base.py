@@ -0,0 +1,120 @@
+"""
+AsyncSession 上のリポジトリの基底クラス
+
+ルートの async 関数から同期の Session・Query API を呼び出すと、DBの応答を待つ間イベントループが止まり、
+1つのワーカーがリクエストを1件ずつしか処理できなくなる。リポジトリのクエリは全て SQLAlchemy 2.0 の
+select() / update() / delete() で組み立て、AsyncSession で await して実行する。
+
+使用例:
+    prompt = await PromptRepository(db).get(prompt_id)
+"""
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Type, TypeVar
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ModelType = TypeVar("ModelType")
+
+class BaseRepository(Generic[ModelType]):
+    """
+    モデルごとの基本的な読み書きを提供するリポジトリ
+    書き込みのメソッドは commit=False を指定するとコミットせずにフラッシュのみを行う
+    （サービスで複数の更新を1つのトランザクションにまとめる場合に使用する）
+    """
+
+    model: Type[ModelType]
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, id: Any) -> Optional[ModelType]:
+        """主キーで1件取得する（存在しない場合はNone）"""
+        return await self.db.get(self.model, id)
+
+    async def get_many(self, ids: Iterable[Any]) -> List[ModelType]:
+        """主キーの一覧で取得する（並び順は保証しない）"""
+        ids = list(ids)
+        if not ids:
+            return []
+        result = await self.db.execute(select(self.model).where(self.model.id.in_(ids)))
+        return list(result.scalars().all())
+
+    async def exists(self, id: Any) -> bool:
+        """主キーの行が存在するかを返す（行は読み込まない）"""
+        result = await self.db.execute(select(self.model.id).where(self.model.id == id))
+        return result.scalar_one_or_none() is not None
+
+    async def list(
+        self,
+        *criteria: Any,
+        skip: int = 0,
+        limit: int = 100,
+        order_by: Optional[Sequence[Any]] = None
+    ) -> List[ModelType]:
+        """
+        条件に一致する行を取得する（OFFSETによるページング）
+        深いページではキーセットページング（app.core.pagination）を使用すること
+
+        Args:
+            *criteria: WHERE の条件
+            skip (int): 読み飛ばす件数
+            limit (int): 取得する最大件数
+            order_by (Optional[Sequence]): 並び順（省略時は主キーの降順）
+        """
+        query = select(self.model).where(*criteria)
+        query = query.order_by(*(order_by or [self.model.id.desc()]))
+        result = await self.db.execute(query.offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def count(self, *criteria: Any) -> int:
+        """条件に一致する行数を返す"""
+        result = await self.db.execute(
+            select(func.count()).select_from(self.model).where(*criteria)
+        )
+        return result.scalar_one()
+
+    async def add(self, obj: ModelType, commit: bool = True) -> ModelType:
+        """行を追加する"""
+        self.db.add(obj)
+        await self._save(obj, commit)
+        return obj
+
+    async def update(self, obj: ModelType, values: Dict[str, Any], commit: bool = True) -> ModelType:
+        """属性を更新する"""
+        for field, value in values.items():
+            setattr(obj, field, value)
+        await self._save(obj, commit)
+        return obj
+
+    async def delete(self, obj: ModelType, commit: bool = True) -> None:
+        """行を削除する"""
+        await self.db.delete(obj)
+        if commit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
+
+    async def delete_by_id(self, id: Any, commit: bool = True) -> bool:
+        """
+        主キーで行を削除する（行は読み込まない）
+
+        Returns:
+            bool: 行を削除した場合はTrue
+        """
+        result = await self.db.execute(
+            delete(self.model)
+            .where(self.model.id == id)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return False
+        if commit:
+            await self.db.commit()
+        return True
+
+    async def _save(self, obj: ModelType, commit: bool) -> None:
+        if commit:
+            await self.db.commit()
+            await self.db.refresh(obj)
+        else:
+            await self.db.flush()
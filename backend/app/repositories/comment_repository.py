@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List
+
+from app.models.comment import Comment
+from app.repositories.base import BaseRepository
+
+class CommentRepository(BaseRepository[Comment]):
+    """コメントのリポジトリ"""
+
+    model = Comment
+
+    async def list_by_prompt(self, prompt_id: int, skip: int = 0, limit: int = 100) -> List[Comment]:
+        """プロンプトのコメントを新しい順に取得する（OFFSETによるページング）"""
+        return await self.list(
+            Comment.prompt_id == prompt_id,
+            skip=skip,
+            limit=limit,
+            order_by=[Comment.created_at.desc(), Comment.id.desc()]
+        )
+
+    async def list_by_user(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Comment]:
+        """ユーザーのコメントを新しい順に取得する（OFFSETによるページング）"""
+        return await self.list(
+            Comment.user_id == user_id,
+            skip=skip,
+            limit=limit,
+            order_by=[Comment.created_at.desc(), Comment.id.desc()]
+        )
+
+    async def update_content(self, comment: Comment, content: str, commit: bool = True) -> Comment:
+        """コメントの本文を更新する"""
+        return await self.update(
+            comment,
+            {"content": content, "updated_at": datetime.utcnow()},
+            commit=commit
+        )
@@ -0,0 +1,218 @@
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, update
+
+from app.core.pagination import apply_keyset, created_at_key, keyset_page
+from app.models.notification import Notification
+from app.models.user import User
+from app.repositories.base import BaseRepository
+
+class NotificationRepository(BaseRepository[Notification]):
+    """通知のリポジトリ"""
+
+    model = Notification
+
+    def _user_query(self, user_id: int, unread_only: bool, since: Optional[datetime] = None):
+        query = select(Notification).where(Notification.user_id == user_id)
+        if unread_only:
+            query = query.where(Notification.is_read == False)
+        if since is not None:
+            query = query.where(Notification.created_at >= since)
+        return query
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        unread_only: bool = False,
+        since: Optional[datetime] = None
+    ) -> List[Notification]:
+        """ユーザーの通知を新しい順に取得する（OFFSETによるページング、since を指定した場合はそれ以降の通知のみ）"""
+        query = (
+            self._user_query(user_id, unread_only, since)
+            .order_by(Notification.created_at.desc(), Notification.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def page_for_user(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        unread_only: bool = False,
+        since: Optional[datetime] = None
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """
+        ユーザーの通知を新しい順に取得する
+        (created_at, id) のキーセットでページングし、次ページ取得用のカーソルを返す
+        since を指定した場合はそれ以降の通知のみを対象にし、インデックスを読む範囲を直近に限る
+        """
+        query = apply_keyset(
+            self._user_query(user_id, unread_only, since),
+            [Notification.created_at, Notification.id],
+            cursor,
+            limit
+        )
+        result = await self.db.execute(query)
+        return keyset_page(result.scalars().all(), limit, created_at_key)
+
+    async def add_many(self, values: Sequence[dict]) -> List[Notification]:
+        """
+        通知をまとめて登録する（複数行の INSERT ... RETURNING を1回実行する、コミットはしない）
+
+        Returns:
+            List[Notification]: 登録した通知
+        """
+        if not values:
+            return []
+        result = await self.db.scalars(insert(Notification).returning(Notification), list(values))
+        return list(result.all())
+
+    async def get_by_group_key(self, group_key: str) -> Optional[Notification]:
+        """まとめた通知をキーで取得する（更新するため行をロックする）"""
+        result = await self.db.execute(
+            select(Notification).where(Notification.group_key == group_key).with_for_update()
+        )
+        return result.scalar_one_or_none()
+
+    async def list_after(self, user_id: int, after_id: int, limit: int = 100) -> List[Notification]:
+        """
+        ユーザーの通知のうち、IDが after_id より大きいものを古い順に取得する
+        （ストリームの再接続時に、Last-Event-ID 以降に作成された通知を再送するために使用する）
+        """
+        result = await self.db.execute(
+            select(Notification)
+            .where(Notification.user_id == user_id, Notification.id > after_id)
+            .order_by(Notification.id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def mark_read(self, notification: Notification, commit: bool = True) -> Notification:
+        """通知を既読にする"""
+        return await self.update(notification, {"is_read": True}, commit=commit)
+
+    def _selection(
+        self,
+        user_id: int,
+        ids: Optional[Sequence[int]] = None,
+        before: Optional[datetime] = None
+    ) -> list:
+        """一括操作の対象の条件（ユーザーの通知のうち、IDのリストか指定日時より前のもの）"""
+        criteria = [Notification.user_id == user_id]
+        if ids is not None:
+            criteria.append(Notification.id.in_(ids))
+        if before is not None:
+            criteria.append(Notification.created_at < before)
+        return criteria
+
+    async def set_read_many(
+        self,
+        user_id: int,
+        ids: Optional[Sequence[int]] = None,
+        before: Optional[datetime] = None,
+        is_read: bool = True,
+        commit: bool = True
+    ) -> int:
+        """
+        ユーザーの通知をまとめて既読（または未読）にする（1回のUPDATE、通知は読み込まない）
+        ids と before を省略した場合はユーザーの全ての通知が対象になる
+        既に同じ状態の通知は更新しないため、戻り値はそのまま未読数の増減になる
+
+        Returns:
+            int: 状態を変更した通知の数
+        """
+        result = await self.db.execute(
+            update(Notification)
+            .where(*self._selection(user_id, ids, before))
+            .where(Notification.is_read == (not is_read))
+            .values(is_read=is_read, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            await self.db.commit()
+        return result.rowcount
+
+    async def mark_all_read(self, user_id: int, commit: bool = True) -> int:
+        """
+        ユーザーの未読の通知を全て既読にする（通知は読み込まない）
+
+        Returns:
+            int: 既読にした通知の数
+        """
+        return await self.set_read_many(user_id, commit=commit)
+
+    async def delete_many(
+        self,
+        user_id: int,
+        ids: Optional[Sequence[int]] = None,
+        before: Optional[datetime] = None,
+        commit: bool = True
+    ) -> Tuple[int, int]:
+        """
+        ユーザーの通知をまとめて削除する（1回のDELETE、削除した行の既読状態を RETURNING で受け取る）
+
+        Returns:
+            Tuple[int, int]: 削除した通知の数と、そのうち未読だった通知の数
+        """
+        result = await self.db.execute(
+            delete(Notification)
+            .where(*self._selection(user_id, ids, before))
+            .returning(Notification.is_read)
+            .execution_options(synchronize_session=False)
+        )
+        states = result.scalars().all()
+        if commit:
+            await self.db.commit()
+        return len(states), sum(1 for is_read in states if not is_read)
+
+    async def add_unread_count(self, user_id: int, delta: int) -> int:
+        """
+        ユーザーの未読数に差分を加算し、加算後の値を返す（1回のUPDATE ... RETURNING）
+        未読数の更新で updated_at（ユーザー情報の編集日時）が変わらないようにする
+        """
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                unread_notification_count=User.unread_notification_count + delta,
+                updated_at=User.updated_at
+            )
+            .returning(User.unread_notification_count)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def purge_batch(self, *criteria, limit: int = 1000) -> List[Tuple[int, bool]]:
+        """
+        条件に一致する通知を古い順に limit 件まで削除する（コミットはしない）
+        削除する行を (created_at, id) の順に選んでから ID で削除し、1回の文でロックする行数を抑える
+
+        Returns:
+            List[Tuple[int, bool]]: 削除した通知の (user_id, is_read)
+        """
+        result = await self.db.execute(
+            select(Notification.id)
+            .where(*criteria)
+            .order_by(Notification.created_at, Notification.id)
+            .limit(limit)
+        )
+        ids = list(result.scalars().all())
+        if not ids:
+            return []
+        result = await self.db.execute(
+            delete(Notification)
+            .where(Notification.id.in_(ids))
+            .returning(Notification.user_id, Notification.is_read)
+            .execution_options(synchronize_session=False)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def count_unread(self, user_id: int) -> int:
+        """ユーザーの未読の通知の数を返す"""
+        return await self.count(Notification.user_id == user_id, Notification.is_read == False)
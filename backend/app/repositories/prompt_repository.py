@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.models.prompt import Prompt
+from app.repositories.base import BaseRepository
+
+class PromptRepository(BaseRepository[Prompt]):
+    """プロンプトのリポジトリ"""
+
+    model = Prompt
+
+    async def create_with_owner(self, values: Dict[str, Any], user_id: int, commit: bool = True) -> Prompt:
+        """
+        作成者を指定してプロンプトを作成する
+
+        Args:
+            values (Dict[str, Any]): プロンプトの属性（タグは TagService で設定するため含めない）
+            user_id (int): 作成者のユーザーID
+            commit (bool): コミットするかどうか（Falseの場合はフラッシュのみ）
+        """
+        return await self.add(Prompt(**values, user_id=user_id), commit=commit)
+
+    async def list_prompts(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        category: Optional[str] = None,
+        user_id: Optional[int] = None,
+        is_published: Optional[bool] = None,
+        tag_clause: Any = None
+    ) -> List[Prompt]:
+        """
+        プロンプトの一覧を新しい順に取得する（OFFSETによるページング）
+
+        Args:
+            skip (int): 読み飛ばす件数
+            limit (int): 取得する最大件数
+            category (Optional[str]): カテゴリー
+            user_id (Optional[int]): 作成者のユーザーID
+            is_published (Optional[bool]): 公開状態
+            tag_clause: タグの絞り込み条件（TagService.tag_filter_clause）
+        """
+        criteria = []
+        if category:
+            criteria.append(Prompt.category == category)
+        if user_id is not None:
+            criteria.append(Prompt.user_id == user_id)
+        if is_published is not None:
+            criteria.append(Prompt.is_published == is_published)
+        if tag_clause is not None:
+            criteria.append(tag_clause)
+        return await self.list(
+            *criteria,
+            skip=skip,
+            limit=limit,
+            order_by=[Prompt.created_at.desc(), Prompt.id.desc()]
+        )
+
+    async def get_owner_id(self, prompt_id: int) -> Optional[int]:
+        """プロンプトの作成者のユーザーIDを返す（プロンプトが存在しない場合はNone）"""
+        result = await self.db.execute(
+            select(Prompt.user_id).where(Prompt.id == prompt_id)
+        )
+        return result.scalar_one_or_none()
@@ -0,0 +1,62 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_, select
+
+from app.models.user import User
+from app.repositories.base import BaseRepository
+
+class UserRepository(BaseRepository[User]):
+    """ユーザーのリポジトリ"""
+
+    model = User
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        """メールアドレスでユーザーを取得する"""
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalar_one_or_none()
+
+    async def get_by_username(self, username: str) -> Optional[User]:
+        """ユーザー名でユーザーを取得する"""
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalar_one_or_none()
+
+    async def create(self, values: Dict[str, Any], commit: bool = True) -> User:
+        """
+        ユーザーを作成する（パスワードはハッシュ化して保存する）
+
+        Args:
+            values (Dict[str, Any]): UserCreate の値（username・email・password を含む）
+            commit (bool): コミットするかどうか（Falseの場合はフラッシュのみ）
+        """
+        values = dict(values)
+        user = User(
+            username=values.pop("username"),
+            email=values.pop("email"),
+            password=values.pop("password"),
+            display_name=values.pop("display_name", None)
+        )
+        for field, value in values.items():
+            setattr(user, field, value)
+        return await self.add(user, commit=commit)
+
+    async def authenticate(self, email: str, password: str) -> Optional[User]:
+        """メールアドレスとパスワードでユーザーを認証する（失敗した場合はNone）"""
+        user = await self.get_by_email(email)
+        if user is None or not user.check_password(password):
+            return None
+        return user
+
+    async def list_users(self, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> List[User]:
+        """ユーザーの一覧を新しい順に取得する（OFFSETによるページング）"""
+        criteria = []
+        if search:
+            criteria.append(or_(
+                User.username.ilike(f"%{search}%"),
+                User.email.ilike(f"%{search}%")
+            ))
+        return await self.list(
+            *criteria,
+            skip=skip,
+            limit=limit,
+            order_by=[User.created_at.desc(), User.id.desc()]
+        )
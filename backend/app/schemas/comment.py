@@ -9,7 +9,7 @@ class CommentBase(BaseModel):
 
 class CommentCreate(CommentBase):
     """コメント作成用スキーマ"""
-    pass
+    parent_id: Optional[int] = Field(None, description="返信先のコメントのID（返信の場合）")
 
 class CommentUpdate(BaseModel):
     """コメント更新用スキーマ"""
@@ -41,8 +41,14 @@ class CommentResponse(CommentInDB):
 
 class CommentWithReplies(CommentResponse):
     """返信を含むコメントスキーマ"""
-    replies: list["CommentResponse"] = Field(default_list, description="コメントへの返信一覧")
+    replies: list["CommentWithReplies"] = Field(default_factory=list, description="コメントへの返信一覧")
     parent_id: Optional[int] = Field(None, description="親コメントのID（返信の場合）")
+    depth: int = Field(default=0, description="スレッド内の深さ（最上位のコメントは0）")
+    reply_count: int = Field(default=0, description="直接の返信の数")
+    has_more_replies: bool = Field(
+        default=False,
+        description="replies に含まれていない返信があるかどうか（返信の一覧APIで続きを取得する）"
+    )
 
     class Config:
         orm_mode = True
\ No newline at end of file
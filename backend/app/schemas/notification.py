@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
 
 class NotificationType(str, Enum):
@@ -48,6 +48,8 @@ class NotificationResponse(NotificationInDB):
     """API応答用の通知スキーマ"""
     sender_name: Optional[str] = None
     sender_avatar: Optional[str] = None
+    actor_count: int = 1  # まとめた通知の操作したユーザーの数
+    actor_ids: Optional[List[int]] = None  # 操作したユーザーの一部（新しい順）
 
     class Config:
         orm_mode = True
@@ -56,7 +58,29 @@ class NotificationCount(BaseModel):
     """未読通知カウント用スキーマ"""
     unread_count: int
 
-class NotificationBulkUpdate(BaseModel):
+class NotificationBulkSelection(BaseModel):
+    """
+    一括操作の対象の通知の指定
+    IDのリストか、指定日時より前の全ての通知のいずれかを指定する（どちらもログイン中のユーザーの通知に限る）
+    """
+    notification_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def exactly_one_target(self):
+        """notification_ids と before のどちらか一方だけが指定されていることを検証"""
+        if (self.notification_ids is None) == (self.before is None):
+            raise ValueError('notification_ids と before のどちらか一方を指定してください')
+        return self
+
+class NotificationBulkUpdate(NotificationBulkSelection):
     """複数通知の一括更新用スキーマ"""
-    notification_ids: list[int]
-    is_read: bool = True
\ No newline at end of file
+    is_read: bool = True
+
+class NotificationBulkDelete(NotificationBulkSelection):
+    """複数通知の一括削除用スキーマ"""
+
+class NotificationBulkResult(BaseModel):
+    """一括操作の結果"""
+    affected: int  # 更新・削除した通知の数
+    unread_count: int  # 操作後の未読通知の数
\ No newline at end of file
@@ -45,6 +45,34 @@ class PromptResponse(PromptInDB):
     is_liked_by_current_user: bool = False
     share_url: Optional[HttpUrl] = None
 
+class PromptListResponse(BaseModel):
+    """一覧用プロンプトスキーマ（Prompt.to_dict の項目に対応）"""
+    id: int
+    title: str
+    slug: Optional[str] = None
+    content: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    tags: List[str] = Field(default=[], description="プロンプトに関連するタグのリスト")
+    language: Optional[str] = None
+    view_count: int = Field(default=0, description="閲覧回数")
+    like_count: int = Field(default=0, description="いいね数")
+    comment_count: int = Field(default=0, description="コメント数")
+    share_count: int = Field(default=0, description="シェア数")
+    average_rating: float = Field(default=0.0, description="平均評価")
+    is_published: bool = True
+    is_featured: bool = False
+    is_approved: bool = True
+    created_at: datetime
+    updated_at: datetime
+    user_id: int
+    author_name: Optional[str] = None
+    author_avatar: Optional[str] = None
+    is_liked_by_current_user: bool = False
+
+    class Config:
+        orm_mode = True
+
 class PromptSearch(BaseModel):
     """プロンプト検索用スキーマ"""
     keyword: Optional[str] = None
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Dict
+from pydantic import BaseModel, Field
+
+class RatingCreate(BaseModel):
+    """評価作成・更新用スキーマ"""
+    value: int = Field(..., ge=1, le=5, description="評価（1〜5）")
+
+class RatingResponse(RatingCreate):
+    """APIレスポンス用の評価スキーマ"""
+    id: int
+    user_id: int
+    prompt_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class RatingDistribution(BaseModel):
+    """プロンプトの評価の分布"""
+    prompt_id: int
+    average: float = Field(default=0.0, description="平均評価")
+    count: int = Field(default=0, description="評価数")
+    histogram: Dict[int, int] = Field(default_factory=dict, description="評価ごとの件数")
@@ -3,6 +3,7 @@ Services layer initialization file.
 This module provides the initialization for all service-related modules in the application.
 """
 
+from app.core.config import settings
 from .auth_service import AuthService
 from .prompt_service import PromptService
 from .comment_service import CommentService
@@ -34,11 +35,11 @@ __all__ = [
 # Service layer configuration
 DEFAULT_PAGE_SIZE = 20
 MAX_PAGE_SIZE = 100
-CACHE_TIMEOUT = 3600  # 1 hour in seconds
+CACHE_TIMEOUT = settings.CACHE_TIMEOUT  # app.core.cache の共有キャッシュの有効期間
 
 # Initialize service configurations
 service_config = {
-    'enable_caching': True,
+    'enable_caching': settings.CACHE_ENABLED,
     'enable_logging': True,
     'default_language': 'en',
     'supported_languages': ['en', 'ja', 'es', 'fr'],
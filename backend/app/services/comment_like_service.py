@@ -0,0 +1,78 @@
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import invalidate
+from app.models.comment import Comment
+from app.models.comment_like import CommentLike
+
+class CommentLikeService:
+    """
+    コメントへのいいねを管理するクラス
+    いいねは comment_likes の (user_id, comment_id) の一意制約で重複を防ぎ、取り消しは論理削除で行う。
+    Comment.like_count は行の状態が実際に変わった場合だけ UPDATE 文の中で加減算する
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def like(self, comment_id: int, user_id: int) -> bool:
+        """
+        コメントにいいねする（取り消したいいねは復活させる）
+
+        Returns:
+            bool: 新たにいいねした場合はTrue（既にいいね済みの場合はFalse）
+        """
+        try:
+            async with self.db.begin_nested():
+                self.db.add(CommentLike(user_id=user_id, comment_id=comment_id))
+        except IntegrityError:
+            # 取り消し済みの行があれば復活させる（いいね済みの場合は更新されない）
+            result = await self.db.execute(
+                update(CommentLike)
+                .where(CommentLike.user_id == user_id)
+                .where(CommentLike.comment_id == comment_id)
+                .where(CommentLike.is_deleted == True)
+                .values(is_deleted=False)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                return False
+
+        await self._add_like_count(comment_id, 1)
+        return True
+
+    async def unlike(self, comment_id: int, user_id: int) -> bool:
+        """
+        コメントのいいねを取り消す
+
+        Returns:
+            bool: いいねを取り消した場合はTrue（いいねしていなかった場合はFalse）
+        """
+        result = await self.db.execute(
+            update(CommentLike)
+            .where(CommentLike.user_id == user_id)
+            .where(CommentLike.comment_id == comment_id)
+            .where(CommentLike.is_deleted == False)
+            .values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return False
+
+        await self._add_like_count(comment_id, -1)
+        return True
+
+    async def _add_like_count(self, comment_id: int, delta: int) -> None:
+        # いいね数の更新で updated_at（コメントの編集日時）が変わらないようにする
+        result = await self.db.execute(
+            update(Comment)
+            .where(Comment.id == comment_id)
+            .values(like_count=Comment.like_count + delta, updated_at=Comment.updated_at)
+            .returning(Comment.prompt_id)
+            .execution_options(synchronize_session=False)
+        )
+        prompt_id = result.scalar_one_or_none()
+        await self.db.commit()
+        if prompt_id is not None:
+            await invalidate("comment_list", prompt_id)
@@ -1,15 +1,98 @@
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.comment import Comment
-from app.models.user import User
 from app.models.prompt import Prompt
+from app.repositories.comment_repository import CommentRepository
 from app.schemas.comment import CommentCreate, CommentUpdate
+from app.services.notification_outbox import get_notification_outbox_worker
 from app.services.notification_service import NotificationService
+from app.services.trending_service import record_event
+from app.core.cache import invalidate
+from app.core.etag import compute_etag
+from app.core.exceptions import NotFoundException
+from app.core.pagination import apply_keyset, created_at_key, keyset_page
+
+# マテリアライズドパスの1階層分の桁数（IDを0埋めし、文字列の順序とIDの順序を一致させる）
+PATH_SEGMENT_WIDTH = 10
+PATH_SEPARATOR = "/"
+# スレッドの最大の深さ（path の長さの上限から決まる）。これより深い返信は最も深い祖先への返信にする
+MAX_THREAD_DEPTH = 20
+
+def build_comment_path(parent_path: Optional[str], comment_id: int) -> str:
+    """親のパスにコメントIDを連結したパスを返す"""
+    return f"{parent_path or ''}{comment_id:0{PATH_SEGMENT_WIDTH}d}{PATH_SEPARATOR}"
+
+def path_ids(path: str) -> List[int]:
+    """パスに含まれるID（最上位の祖先から自身まで）を返す"""
+    return [int(segment) for segment in path.split(PATH_SEPARATOR) if segment]
+
+def subtree_upper_bound(path: str) -> str:
+    """
+    部分木の範囲検索の上限（この値未満が子孫）を返す
+    区切り文字 "/" の次の文字は "0" なので、末尾の区切り文字を置き換えると子孫より大きい最小の値になる
+    """
+    return path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+
+def path_key(row) -> Tuple:
+    """(path,) のソートキーを返す"""
+    return (row.path,)
+
+def thread_node(comment: Comment) -> Dict[str, Any]:
+    """スレッドのレスポンス（CommentWithReplies）の1件分の辞書を返す（返信は含まない）"""
+    return {
+        "id": comment.id,
+        "content": comment.content,
+        "prompt_id": comment.prompt_id,
+        "user_id": comment.user_id,
+        "parent_id": comment.parent_id,
+        "depth": comment.depth,
+        "reply_count": comment.reply_count,
+        "created_at": comment.created_at,
+        "updated_at": comment.updated_at,
+        "is_deleted": comment.is_deleted,
+        "likes_count": comment.like_count or 0,
+        "replies": [],
+        "has_more_replies": comment.reply_count > 0,
+    }
+
+def build_thread(roots: List[Comment], descendants: List[Comment], reply_limit: int) -> List[Dict[str, Any]]:
+    """
+    最上位のコメントと、親が子より先に並んだ子孫からスレッドの木を組み立てる
+    各コメントの返信は古い順に reply_limit 件までとし、残りは has_more_replies で示す
+
+    Args:
+        roots (List[Comment]): 最上位のコメント（この順序で返す）
+        descendants (List[Comment]): 子孫のコメント（path の昇順、または深さごとに path の昇順）
+        reply_limit (int): 1つのコメントに含める返信の最大数
+
+    Returns:
+        List[Dict[str, Any]]: 返信を含むコメントの一覧
+    """
+    nodes = {comment.id: thread_node(comment) for comment in roots}
+    for comment in descendants:
+        parent = nodes.get(comment.parent_id)
+        if parent is None or len(parent["replies"]) >= reply_limit:
+            continue
+        node = thread_node(comment)
+        parent["replies"].append(node)
+        nodes[comment.id] = node
+    for node in nodes.values():
+        node["has_more_replies"] = node["reply_count"] > len(node["replies"])
+    return [nodes[comment.id] for comment in roots]
+
+def walk_thread(nodes: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """スレッドの全てのコメント（返信を含む）を順に返す"""
+    for node in nodes:
+        yield node
+        yield from walk_thread(node["replies"])
 
 class CommentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
+        self.comments = CommentRepository(db)
         self.notification_service = NotificationService(db)
 
     async def create_comment(
@@ -20,6 +103,8 @@ class CommentService:
     ) -> Comment:
         """
         新しいコメントを作成する
+        返信の場合は親のパスを引き継ぎ、親の返信数を加算する
+        プロンプトのコメント数の加算とプロンプト作成者への通知のアウトボックスへの追加も同じトランザクションで行う
         
         Args:
             prompt_id: プロンプトID
@@ -28,32 +113,230 @@ class CommentService:
             
         Returns:
             作成されたコメントオブジェクト
+
+        Raises:
+            NotFoundException: 返信先のコメントが存在しない場合
         """
+        parent = None
+        if comment_data.parent_id is not None:
+            parent = await self._get_reply_parent(prompt_id, comment_data.parent_id)
+
         comment = Comment(
             content=comment_data.content,
             prompt_id=prompt_id,
             user_id=user_id,
+            parent_id=parent.id if parent else None,
+            depth=parent.depth + 1 if parent else 0,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
         
         self.db.add(comment)
-        self.db.commit()
-        self.db.refresh(comment)
-        
-        # プロンプト作成者に通知を送信
-        prompt = self.db.query(Prompt).filter(Prompt.id == prompt_id).first()
-        if prompt and prompt.user_id != user_id:
-            await self.notification_service.create_comment_notification(
-                prompt.user_id,
+        # IDを確定させてからパスを決める
+        await self.db.flush()
+        comment.path = build_comment_path(parent.path if parent else None, comment.id)
+        if parent is not None:
+            await self._add_reply_count(parent.id, 1)
+        await self._add_prompt_comment_count(prompt_id, 1)
+        # プロンプト作成者への通知はコメントと同じトランザクションでアウトボックスに追加する
+        result = await self.db.execute(select(Prompt.user_id).where(Prompt.id == prompt_id))
+        owner_id = result.scalar_one_or_none()
+        if owner_id is not None and owner_id != user_id:
+            self.notification_service.enqueue_comment_notification(
+                owner_id,
                 user_id,
                 prompt_id,
                 comment.id
             )
+        await self.db.commit()
+        await self.db.refresh(comment)
+        record_event(prompt_id, "comment")
+        await invalidate("comment_list", prompt_id)
+        await invalidate("prompt", prompt_id)
+        if owner_id is not None and owner_id != user_id:
+            get_notification_outbox_worker().wake()
         
         return comment
 
-    def get_comment(self, comment_id: int) -> Optional[Comment]:
+    async def _get_reply_parent(self, prompt_id: int, parent_id: int) -> Comment:
+        """
+        返信先のコメントを返す
+        最大の深さに達している場合は、最大の深さにある祖先を返信先にする
+        """
+        parent = await self.db.get(Comment, parent_id)
+        if parent is None or parent.prompt_id != prompt_id:
+            raise NotFoundException("Parent comment not found")
+        if parent.depth >= MAX_THREAD_DEPTH:
+            ancestor_id = path_ids(parent.path)[MAX_THREAD_DEPTH - 1]
+            parent = await self.db.get(Comment, ancestor_id)
+        return parent
+
+    async def _add_reply_count(self, comment_id: int, delta: int) -> None:
+        # 返信数の更新で updated_at（コメントの編集日時）が変わらないようにする
+        await self.db.execute(
+            update(Comment)
+            .where(Comment.id == comment_id)
+            .values(reply_count=Comment.reply_count + delta, updated_at=Comment.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _add_prompt_comment_count(self, prompt_id: int, delta: int) -> None:
+        # コメント数の更新で updated_at（プロンプトの編集日時）が変わらないようにする
+        await self.db.execute(
+            update(Prompt)
+            .where(Prompt.id == prompt_id)
+            .values(comment_count=Prompt.comment_count + delta, updated_at=Prompt.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def soft_delete_comment(self, comment_id: int) -> bool:
+        """
+        コメントを論理削除し、プロンプトのコメント数を減算する
+        返信はスレッドに残すため、親の返信数は変更しない
+
+        Returns:
+            bool: 削除した場合はTrue（既に削除済みの場合はFalse）
+        """
+        # 削除済みでない行だけを更新し、同時に削除されても二重に減算しない
+        result = await self.db.execute(
+            update(Comment)
+            .where(Comment.id == comment_id)
+            .where(Comment.is_deleted == False)
+            .values(is_deleted=True, content="[削除されたコメント]")
+            .returning(Comment.prompt_id)
+            .execution_options(synchronize_session=False)
+        )
+        prompt_id = result.scalar_one_or_none()
+        if prompt_id is None:
+            return False
+        await self._add_prompt_comment_count(prompt_id, -1)
+        await self.db.commit()
+        await invalidate("comment_list", prompt_id)
+        await invalidate("prompt", prompt_id)
+        return True
+
+    async def delete_comment_tree(self, comment: Comment) -> None:
+        """
+        コメントを返信を含めて物理削除し、親の返信数とプロンプトのコメント数を減算する
+        子孫も合わせて削除されるため、削除前に部分木の論理削除されていないコメントを数え、
+        同じトランザクションでその数をプロンプトのコメント数から減算する
+        """
+        live_count = await self._count_live_subtree(comment)
+        await self.comments.delete(comment, commit=False)
+        if comment.parent_id is not None:
+            await self._add_reply_count(comment.parent_id, -1)
+        if live_count:
+            await self._add_prompt_comment_count(comment.prompt_id, -live_count)
+        await self.db.commit()
+        await invalidate("comment_list", comment.prompt_id)
+        await invalidate("prompt", comment.prompt_id)
+
+    async def _count_live_subtree(self, comment: Comment) -> int:
+        """コメントと子孫のうち論理削除されていないものの数を返す"""
+        if comment.path is None:
+            return 0 if comment.is_deleted else 1
+        return await self.db.scalar(
+            select(func.count())
+            .select_from(Comment)
+            .where(Comment.prompt_id == comment.prompt_id)
+            .where(Comment.path >= comment.path)
+            .where(Comment.path < subtree_upper_bound(comment.path))
+            .where(Comment.is_deleted == False)
+        )
+
+    async def get_thread(
+        self,
+        prompt_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        reply_limit: int = 3,
+        max_depth: int = 3
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        プロンプトのコメントをスレッド（返信を含む木）として新しい順に取得する
+        最上位のコメント1ページ分を取得した後、深さごとに1回のクエリで返信を取得する。
+        各クエリは親ごとの順位（row_number）で reply_limit 件までに絞るため、
+        読み込む行数は返信の総数ではなく返す件数で決まる
+
+        Args:
+            prompt_id: プロンプトID
+            limit: 最上位のコメントの件数
+            cursor: 前のページで返されたカーソル
+            reply_limit: 1つのコメントに含める返信の最大数（残りは get_replies で取得する）
+            max_depth: 含める返信の深さ
+
+        Returns:
+            返信を含むコメントの一覧と次ページのカーソル
+        """
+        query = apply_keyset(
+            select(Comment)
+            .where(Comment.prompt_id == prompt_id)
+            .where(Comment.parent_id.is_(None)),
+            [Comment.path],
+            cursor,
+            limit
+        )
+        result = await self.db.execute(query)
+        roots, next_cursor = keyset_page(result.scalars().all(), limit, path_key)
+        if not roots:
+            return [], next_cursor
+
+        descendants: List[Comment] = []
+        parents = [root for root in roots if root.reply_count]
+        for _ in range(max_depth):
+            if not parents:
+                break
+            replies = await self._first_replies([parent.id for parent in parents], reply_limit)
+            descendants.extend(replies)
+            parents = [reply for reply in replies if reply.reply_count]
+        return build_thread(roots, descendants, reply_limit), next_cursor
+
+    async def _first_replies(self, parent_ids: List[int], limit: int) -> List[Comment]:
+        """各コメントへの返信を古い順に limit 件ずつ取得する（ix_comments_parent_id_path を使用する）"""
+        ranked = (
+            select(
+                Comment,
+                func.row_number().over(partition_by=Comment.parent_id, order_by=Comment.path).label("reply_rank")
+            )
+            .where(Comment.parent_id.in_(parent_ids))
+            .subquery()
+        )
+        replies = aliased(Comment, ranked)
+        result = await self.db.execute(
+            select(replies).where(ranked.c.reply_rank <= limit).order_by(ranked.c.path)
+        )
+        return result.scalars().all()
+
+    async def get_replies(
+        self,
+        comment_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        コメントへの直接の返信を古い順に取得する（「返信をさらに表示」用）
+        各返信の reply_count と has_more_replies で、さらに下の階層の有無を示す
+
+        Args:
+            comment_id: 返信先のコメントID
+            limit: 取得する最大件数
+            cursor: 前のページで返されたカーソル
+
+        Returns:
+            返信の一覧と次ページのカーソル
+        """
+        query = apply_keyset(
+            select(Comment).where(Comment.parent_id == comment_id),
+            [Comment.path],
+            cursor,
+            limit,
+            descending=False
+        )
+        result = await self.db.execute(query)
+        replies, next_cursor = keyset_page(result.scalars().all(), limit, path_key)
+        return [thread_node(reply) for reply in replies], next_cursor
+
+    async def get_comment(self, comment_id: int) -> Optional[Comment]:
         """
         指定されたIDのコメントを取得する
         
@@ -63,26 +346,62 @@ class CommentService:
         Returns:
             コメントオブジェクト。存在しない場合はNone
         """
-        return self.db.query(Comment).filter(Comment.id == comment_id).first()
+        return await self.comments.get(comment_id)
 
-    def get_comments_by_prompt(self, prompt_id: int) -> List[Comment]:
+    async def get_comments_by_prompt(self, prompt_id: int, skip: int = 0, limit: int = 100) -> List[Comment]:
         """
-        指定されたプロンプトに対するすべてのコメントを取得する
+        指定されたプロンプトに対するコメントを新しい順に取得する
         
         Args:
             prompt_id: プロンプトID
+            skip: 読み飛ばす件数
+            limit: 取得する最大件数
             
         Returns:
             コメントオブジェクトのリスト
         """
-        return (
-            self.db.query(Comment)
-            .filter(Comment.prompt_id == prompt_id)
-            .order_by(Comment.created_at.desc())
-            .all()
+        return await self.comments.list_by_prompt(prompt_id, skip=skip, limit=limit)
+
+    async def get_comments_by_user(
+        self,
+        user_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Comment], Optional[str]]:
+        """
+        指定されたユーザーのコメントを新しい順に取得する
+        
+        Args:
+            user_id: ユーザーID
+            limit: 取得する最大件数
+            cursor: 前のページで返されたカーソル
+            
+        Returns:
+            コメントオブジェクトのリストと次ページのカーソル
+        """
+        query = apply_keyset(
+            select(Comment).where(Comment.user_id == user_id),
+            [Comment.created_at, Comment.id],
+            cursor,
+            limit
+        )
+        result = await self.db.execute(query)
+        return keyset_page(result.scalars().all(), limit, created_at_key)
+
+    async def get_comment_list_stamp(self, prompt_id: int) -> str:
+        """
+        プロンプトのコメント一覧のバージョンスタンプを返す
+        コメントを読み込まず、件数・最終更新日時・いいね数の合計の集計だけで求める
+        （いいね数の更新では updated_at を変えないため、合計を含める）
+        """
+        result = await self.db.execute(
+            select(func.count(Comment.id), func.max(Comment.updated_at), func.sum(Comment.like_count))
+            .where(Comment.prompt_id == prompt_id)
         )
+        count, last_updated_at, like_total = result.one()
+        return compute_etag(prompt_id, count, last_updated_at, like_total)
 
-    def update_comment(
+    async def update_comment(
         self, 
         comment_id: int, 
         user_id: int, 
@@ -99,20 +418,17 @@ class CommentService:
         Returns:
             更新されたコメントオブジェクト。更新権限がない場合はNone
         """
-        comment = self.get_comment(comment_id)
+        comment = await self.get_comment(comment_id)
         if not comment or comment.user_id != user_id:
             return None
 
-        comment.content = comment_data.content
-        comment.updated_at = datetime.utcnow()
-        
-        self.db.commit()
-        self.db.refresh(comment)
+        await self.comments.update_content(comment, comment_data.content)
+        await invalidate("comment_list", comment.prompt_id)
         return comment
 
-    def delete_comment(self, comment_id: int, user_id: int) -> bool:
+    async def delete_comment(self, comment_id: int, user_id: int) -> bool:
         """
-        コメントを削除する
+        コメントを削除する（返信を含めて物理削除）
         
         Args:
             comment_id: 削除対象のコメントID
@@ -121,15 +437,14 @@ class CommentService:
         Returns:
             削除が成功した場合はTrue、失敗した場合はFalse
         """
-        comment = self.get_comment(comment_id)
+        comment = await self.get_comment(comment_id)
         if not comment or comment.user_id != user_id:
             return False
 
-        self.db.delete(comment)
-        self.db.commit()
+        await self.delete_comment_tree(comment)
         return True
 
-    def is_comment_owner(self, comment_id: int, user_id: int) -> bool:
+    async def is_comment_owner(self, comment_id: int, user_id: int) -> bool:
         """
         指定されたユーザーがコメントの所有者かどうかを確認する
         
@@ -140,5 +455,5 @@ class CommentService:
         Returns:
             所有者である場合はTrue、そうでない場合はFalse
         """
-        comment = self.get_comment(comment_id)
+        comment = await self.get_comment(comment_id)
         return comment is not None and comment.user_id == user_id
\ No newline at end of file
@@ -0,0 +1,211 @@
+import asyncio
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import Counter
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import claim_periodic_job, invalidate
+from app.core.config import settings
+from app.models.comment import Comment
+from app.models.comment_like import CommentLike
+from app.models.like import Like
+from app.models.notification import Notification
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+COUNTER_DRIFT_REPAIRED = Counter('counter_drift_repaired_total', 'Denormalized counters repaired', ['counter'])
+
+@dataclass(frozen=True)
+class CounterSpec:
+    """
+    子テーブルの行数から再計算できる非正規化カウンターの定義
+
+    Attributes:
+        name (str): カウンターの名前（メトリクス・ログ用）
+        model: カウンターを持つモデル
+        column (str): カウンターの列名
+        child_key: 子テーブルの親を指す列
+        child_filters (tuple): 数える子の行の条件
+        cache_namespace (Optional[str]): 修正した行のキャッシュを無効化する名前空間（キーは行のID）
+    """
+    name: str
+    model: type
+    column: str
+    child_key: object
+    child_filters: tuple = ()
+    cache_namespace: Optional[str] = None
+
+    def count_query(self, ids: List[int]):
+        """親ごとの子の行数を求めるクエリ"""
+        return (
+            select(self.child_key, func.count())
+            .where(self.child_key.in_(ids))
+            .where(*self.child_filters)
+            .group_by(self.child_key)
+        )
+
+# シェア数は子の行を持たないため再集計の対象外
+COUNTERS = (
+    CounterSpec("prompt_comment_count", Prompt, "comment_count", Comment.prompt_id, (Comment.is_deleted == False,)),
+    CounterSpec("prompt_like_count", Prompt, "like_count", Like.prompt_id),
+    CounterSpec("comment_like_count", Comment, "like_count", CommentLike.comment_id, (CommentLike.is_deleted == False,)),
+    CounterSpec(
+        "user_unread_notification_count", User, "unread_notification_count", Notification.user_id,
+        (Notification.is_read == False,), cache_namespace="unread_count"
+    ),
+)
+
+class CounterService:
+    """
+    非正規化したカウンター（プロンプトのコメント数・いいね数、コメントのいいね数、ユーザーの未読通知数）の再集計を行うクラス
+    カウンターは作成・削除・いいね・既読の際に差分で更新しているが、
+    物理削除のカスケードや障害でずれた値を子テーブルの行数から修正する
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def reconcile(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        全てのカウンターを再集計し、ずれている行を修正する
+
+        Returns:
+            Dict[str, int]: カウンターごとの修正した行数
+        """
+        batch_size = batch_size or settings.COUNTER_RECONCILE_BATCH_SIZE
+        repaired = {}
+        for spec in COUNTERS:
+            repaired[spec.name] = await self.reconcile_counter(spec, batch_size)
+        logger.info(f"Denormalized counters reconciled: {repaired}")
+        return repaired
+
+    async def reconcile_counter(self, spec: CounterSpec, batch_size: int) -> int:
+        """
+        1つのカウンターを再集計する
+        IDのキーセットでバッチごとに行をロックして比較・修正し、バッチごとにコミットする
+        キャッシュの名前空間が指定されている場合は、コミット後に修正した行のキャッシュを無効化する
+
+        Returns:
+            int: 修正した行数
+        """
+        model = spec.model
+        column = getattr(model, spec.column)
+        repaired = 0
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(model.id, column)
+                .where(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                # 集計中にカウンターが更新されてずれが誤検出されないように行をロックする
+                .with_for_update()
+            )
+            rows = result.all()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+
+            result = await self.db.execute(spec.count_query(ids))
+            expected = dict(result.all())
+            drifted = []
+            for row_id, actual in rows:
+                count = expected.get(row_id, 0)
+                if (actual or 0) != count:
+                    # カウンターの修正で updated_at（編集日時）が変わらないようにする
+                    await self.db.execute(
+                        update(model)
+                        .where(model.id == row_id)
+                        .values({spec.column: count, "updated_at": model.updated_at})
+                        .execution_options(synchronize_session=False)
+                    )
+                    drifted.append(row_id)
+            await self.db.commit()
+            if spec.cache_namespace:
+                for row_id in drifted:
+                    await invalidate(spec.cache_namespace, row_id)
+            repaired += len(drifted)
+            last_id = ids[-1]
+
+        if repaired:
+            COUNTER_DRIFT_REPAIRED.labels(counter=spec.name).inc(repaired)
+            logger.warning(f"Repaired {repaired} drifted rows of {spec.name}")
+        return repaired
+
+class CounterReconciler:
+    """
+    カウンターの再集計を定期的に実行するクラス
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, interval: Optional[float] = None):
+        self._session_factory = session_factory
+        self.interval = settings.COUNTER_RECONCILE_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        """再集計を1回実行する"""
+        session_factory = self._session_factory or _default_session_factory()
+        async with session_factory() as db:
+            return await CounterService(db).reconcile()
+
+    async def run_scheduled(self) -> Optional[Dict[str, int]]:
+        """
+        定期実行の1回分の再集計を行う
+        全ての行を走査するため、直近の間隔内に他のワーカーが実行していれば何もしない
+
+        Returns:
+            Optional[Dict[str, int]]: 再集計の結果（他のワーカーが実行した場合は None）
+        """
+        if not await claim_periodic_job("counter_reconcile", self.interval):
+            return None
+        return await self.run_once()
+
+    def start(self) -> None:
+        """定期的な再集計を開始する（間隔が0以下の場合は何もしない）"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的な再集計を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_scheduled()
+            except Exception as e:
+                logger.error(f"Failed to reconcile counters: {str(e)}")
+
+def _default_session_factory() -> Callable:
+    from app.core.database import get_db_context
+
+    return get_db_context
+
+@lru_cache()
+def get_counter_reconciler() -> CounterReconciler:
+    """プロセス内のカウンター再集計のシングルトンを取得する"""
+    return CounterReconciler()
+
+if __name__ == "__main__":
+    # 使用例: python -m app.services.counter_service reconcile
+    if len(sys.argv) != 2 or sys.argv[1] != "reconcile":
+        print("Usage: python -m app.services.counter_service reconcile")
+        sys.exit(1)
+    print(f"Repaired counters: {asyncio.run(CounterReconciler().run_once())}")
@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import invalidate
+from app.models.like import Like
+from app.models.prompt import Prompt
+from app.services.notification_outbox import get_notification_outbox_worker
+from app.services.notification_service import NotificationService
+from app.services.trending_service import record_event
+
+class LikeService:
+    """
+    プロンプトへのいいねを管理するクラス
+    いいねは likes テーブルの (user_id, prompt_id) の一意制約で重複を防ぎ、
+    Prompt.like_count は UPDATE 文の中で加減算することで同時実行時もずれないようにする
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def like(self, prompt_id: int, user_id: int) -> bool:
+        """
+        プロンプトにいいねする
+
+        Returns:
+            bool: 新たにいいねした場合はTrue（既にいいね済みの場合はFalse）
+        """
+        try:
+            async with self.db.begin_nested():
+                self.db.add(Like(user_id=user_id, prompt_id=prompt_id))
+        except IntegrityError:
+            # 既にいいね済み（同時に実行されたリクエストを含む）
+            return False
+
+        owner_id = await self._add_like_count(prompt_id, 1)
+        # プロンプト作成者への通知はいいねと同じトランザクションでアウトボックスに追加する（登録時にまとめる）
+        notify = owner_id is not None and owner_id != user_id
+        if notify:
+            NotificationService(self.db).enqueue_like_notification(owner_id, user_id, prompt_id)
+        await self.db.commit()
+        await invalidate("prompt", prompt_id)
+        record_event(prompt_id, "like")
+        if notify:
+            get_notification_outbox_worker().wake()
+        return True
+
+    async def unlike(self, prompt_id: int, user_id: int) -> bool:
+        """
+        プロンプトのいいねを取り消す
+
+        Returns:
+            bool: いいねを取り消した場合はTrue（いいねしていなかった場合はFalse）
+        """
+        result = await self.db.execute(
+            delete(Like)
+            .where(Like.user_id == user_id)
+            .where(Like.prompt_id == prompt_id)
+        )
+        if result.rowcount == 0:
+            return False
+
+        await self._add_like_count(prompt_id, -1)
+        await self.db.commit()
+        await invalidate("prompt", prompt_id)
+        record_event(prompt_id, "like", -1)
+        return True
+
+    async def _add_like_count(self, prompt_id: int, delta: int) -> Optional[int]:
+        """いいね数を加減算し、プロンプトの作成者のIDを返す"""
+        # いいね数の更新で updated_at（プロンプトの編集日時）が変わらないようにする
+        result = await self.db.execute(
+            update(Prompt)
+            .where(Prompt.id == prompt_id)
+            .values(like_count=Prompt.like_count + delta, updated_at=Prompt.updated_at)
+            .returning(Prompt.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar_one_or_none()
+
+    async def is_liked(self, prompt_id: int, user_id: int) -> bool:
+        """ユーザーがプロンプトにいいねしているかを返す"""
+        return prompt_id in await self.get_liked_prompt_ids(user_id, [prompt_id])
+
+    async def get_liked_prompt_ids(self, user_id: int, prompt_ids: Iterable[int]) -> Set[int]:
+        """
+        指定したプロンプトのうち、ユーザーがいいねしているもののIDを返す
+        一覧ページの件数分を1回のクエリ（(user_id, prompt_id) のインデックス）で取得する
+        """
+        prompt_ids = list(set(prompt_ids))
+        if not prompt_ids:
+            return set()
+        result = await self.db.execute(
+            select(Like.prompt_id)
+            .where(Like.user_id == user_id)
+            .where(Like.prompt_id.in_(prompt_ids))
+        )
+        return set(result.scalars().all())
+
+    async def mark_liked_by_user(self, prompts: List[Union[Prompt, Dict]], user_id: int) -> List[Union[Prompt, Dict]]:
+        """
+        プロンプトの一覧に is_liked_by_current_user を設定する
+        キャッシュから取得した辞書のプロンプトにも対応する
+
+        Args:
+            prompts (List[Union[Prompt, Dict]]): プロンプトの一覧
+            user_id (int): 現在のユーザーのID
+
+        Returns:
+            List[Union[Prompt, Dict]]: 設定済みのプロンプトの一覧
+        """
+        ids = [prompt["id"] if isinstance(prompt, dict) else prompt.id for prompt in prompts]
+        liked = await self.get_liked_prompt_ids(user_id, ids)
+        for prompt, prompt_id in zip(prompts, ids):
+            if isinstance(prompt, dict):
+                prompt["is_liked_by_current_user"] = prompt_id in liked
+            else:
+                prompt.is_liked_by_current_user = prompt_id in liked
+        return prompts
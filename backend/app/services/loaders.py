@@ -0,0 +1,178 @@
+"""
+関連データの一括読み込み（DataLoader）
+
+一覧の各行で作成者や送信者を遅延読み込みすると、1ページで行数分のクエリが発行される（N+1）。
+ここではリクエストごとに Loaders を作成し、ページ内で必要になったIDを集めてから
+関連ごとに1回の IN (...) クエリで読み込む。
+
+ルートやサービスは、行に追加する項目を Include で宣言して読み込む:
+
+    loaders = Loaders(db)
+    await loaders.include(prompts, PROMPT_AUTHOR)
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Mapping, Optional, TypeVar, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchFunction = Callable[[List[K]], Awaitable[Mapping[K, V]]]
+
+class BatchLoader(Generic[K, V]):
+    """
+    キーごとの読み込みをまとめて1回のバッチ関数の呼び出しにするローダー
+    同じイベントループの周回で要求されたキーを集めてから読み込み、結果はローダーの生存期間中キャッシュする
+    （ローダーはリクエストごとに作成すること）
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFunction,
+        default: Any = None,
+        max_batch_size: int = 500,
+        lock: Optional[asyncio.Lock] = None
+    ):
+        """
+        Args:
+            batch_fn (BatchFunction): キーの一覧を受け取り、キーと値の辞書を返す関数
+            default (Any): バッチ関数の結果に含まれないキーの値
+            max_batch_size (int): 1回のバッチ関数の呼び出しに渡すキーの最大数
+            lock (Optional[asyncio.Lock]): バッチ関数の同時実行を防ぐロック
+                （同じセッションを共有するローダー間で同じロックを使う）
+        """
+        self.batch_fn = batch_fn
+        self.default = default
+        self.max_batch_size = max_batch_size
+        self._lock = lock or asyncio.Lock()
+        self._futures: Dict[K, asyncio.Future] = {}
+        self._queue: List[K] = []
+
+    async def load(self, key: Optional[K]) -> Any:
+        """キーの値を読み込む（キーがNoneの場合はデフォルト値）"""
+        if key is None:
+            return self.default
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # 同じ周回で要求されるキーを待ってから読み込む
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return await future
+
+    async def load_many(self, keys: Iterable[Optional[K]]) -> List[Any]:
+        """複数のキーの値を読み込む（1回のバッチにまとめられる）"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: K, value: Any) -> None:
+        """既に分かっている値をキャッシュに登録する"""
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            try:
+                async with self._lock:
+                    values = await self.batch_fn(chunk)
+            except Exception as e:
+                for key in chunk:
+                    # 失敗したキーは次回の読み込みで再試行する
+                    self._futures.pop(key).set_exception(e)
+                continue
+            for key in chunk:
+                self._futures[key].set_result(values.get(key, self.default))
+
+@dataclass(frozen=True)
+class Include:
+    """
+    一覧の行に追加する関連データの宣言
+
+    Attributes:
+        loader (str): 使用するローダー（Loaders の属性名）
+        key (str): ローダーに渡すキーを持つ行の項目
+        fields (Dict[str, Union[str, Callable]]): 追加する項目と、読み込んだ値から取り出す属性名もしくは関数
+    """
+    loader: str
+    key: str
+    fields: Mapping[str, Union[str, Callable[[Any], Any]]]
+
+def _get(row: Any, name: str) -> Any:
+    return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+def _set(row: Any, name: str, value: Any) -> None:
+    if isinstance(row, dict):
+        row[name] = value
+    else:
+        setattr(row, name, value)
+
+def user_display_name(user: Any) -> Optional[str]:
+    """ユーザーの表示名（未設定の場合はユーザー名）"""
+    if user is None:
+        return None
+    return user.display_name or user.username
+
+# プロンプトの作成者
+PROMPT_AUTHOR = Include("users", "user_id", {"author_name": user_display_name, "author_avatar": "avatar_url"})
+# コメントの投稿者
+COMMENT_USER = Include("users", "user_id", {"user_name": user_display_name, "user_avatar": "avatar_url"})
+# 通知の送信者
+NOTIFICATION_SENDER = Include("users", "sender_id", {"sender_name": user_display_name, "sender_avatar": "avatar_url"})
+
+class Loaders:
+    """
+    リクエスト単位のローダーの集まり
+    ローダーは同じセッションを使うため、クエリが同時に実行されないよう1つのロックを共有する
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._lock = asyncio.Lock()
+        self.users: BatchLoader[int, Any] = BatchLoader(self._load_users, lock=self._lock)
+
+    async def _load_users(self, ids: List[int]) -> Dict[int, Any]:
+        # 一覧の表示に必要な列だけを読み込む
+        result = await self.db.execute(
+            select(User.id, User.username, User.display_name, User.avatar_url)
+            .where(User.id.in_(ids))
+        )
+        return {row.id: row for row in result.all()}
+
+    async def include(self, rows: List[Any], *includes: Include) -> List[Any]:
+        """
+        宣言された関連データを読み込み、各行に項目を追加する
+        行は辞書・オブジェクトのどちらでもよく、ローダーごとに1回のクエリで読み込む
+
+        Args:
+            rows (List[Any]): 一覧の行
+            *includes (Include): 追加する関連データ
+
+        Returns:
+            List[Any]: 項目を追加した行（渡した一覧と同じオブジェクト）
+        """
+        if not rows or not includes:
+            return rows
+        results = await asyncio.gather(*(
+            getattr(self, spec.loader).load_many([_get(row, spec.key) for row in rows])
+            for spec in includes
+        ))
+        for spec, values in zip(includes, results):
+            for row, value in zip(rows, values):
+                for name, source in spec.fields.items():
+                    if callable(source):
+                        field_value = source(value)
+                    else:
+                        field_value = getattr(value, source, None) if value is not None else None
+                    _set(row, name, field_value)
+        return rows
@@ -0,0 +1,236 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Awaitable, Callable, List, Optional
+
+from prometheus_client import Counter
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import claim_periodic_job
+from app.core.config import settings
+from app.core.mail import mail_enabled, send_email
+from app.models.notification import Notification
+from app.models.user import User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+DIGESTS_SENT = Counter('notification_digests_sent_total', 'Notification digest emails sent')
+DIGEST_FAILURES = Counter('notification_digest_failures_total', 'Notification digest emails that failed to send')
+
+# ダイジェストに含める通知: 未読で、まだ含めていないか、含めた後にまとめた通知が更新されたもの
+PENDING = and_(
+    Notification.is_read == False,
+    or_(Notification.digested_at.is_(None), Notification.updated_at > Notification.digested_at)
+)
+
+Sender = Callable[[str, str, str], Awaitable[None]]
+
+@dataclass
+class NotificationDigest:
+    """
+    1人のユーザーに送るダイジェスト
+
+    Attributes:
+        user_id (int): ユーザーID
+        email (str): 送信先
+        notification_ids (List[int]): 送信後にダイジェストに含めたことを記録する通知のID
+        lines (List[str]): 本文に載せる通知の内容（新しい順、NOTIFICATION_DIGEST_MAX_ITEMS 件まで）
+    """
+    user_id: int
+    email: str
+    notification_ids: List[int] = field(default_factory=list)
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def subject(self) -> str:
+        return f"未読の通知が{len(self.notification_ids)}件あります"
+
+    @property
+    def body(self) -> str:
+        body = "\n".join(f"・{line}" for line in self.lines)
+        rest = len(self.notification_ids) - len(self.lines)
+        if rest > 0:
+            body += f"\n他{rest}件の通知があります"
+        return body
+
+class NotificationDigestService:
+    """
+    未読の通知のメールのダイジェストを作成するクラス
+    いいねなどは登録時に1件にまとめているため、ダイジェストにはまとめた通知（「〜さんと他N人が…」）がそのまま載る
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def build_digests(self, after_user_id: int = 0, limit: Optional[int] = None) -> List[NotificationDigest]:
+        """
+        ダイジェストに含める通知があるユーザーのダイジェストを、ユーザーIDの順に limit 人分作成する
+
+        Args:
+            after_user_id (int): このIDより後のユーザーから作成する（キーセット）
+            limit (Optional[int]): 作成するユーザー数。省略時は NOTIFICATION_DIGEST_BATCH_SIZE
+        """
+        limit = limit or settings.NOTIFICATION_DIGEST_BATCH_SIZE
+        result = await self.db.execute(
+            select(Notification.user_id)
+            .where(PENDING, Notification.user_id > after_user_id)
+            .group_by(Notification.user_id)
+            .order_by(Notification.user_id)
+            .limit(limit)
+        )
+        user_ids = list(result.scalars().all())
+        if not user_ids:
+            return []
+
+        result = await self.db.execute(
+            select(Notification.id, Notification.user_id, Notification.content, User.email)
+            .join(User, User.id == Notification.user_id)
+            .where(PENDING, Notification.user_id.in_(user_ids))
+            .order_by(Notification.user_id, Notification.created_at.desc(), Notification.id.desc())
+        )
+        digests = {}
+        for notification_id, user_id, content, email in result.all():
+            digest = digests.get(user_id)
+            if digest is None:
+                digest = digests[user_id] = NotificationDigest(user_id=user_id, email=email)
+            digest.notification_ids.append(notification_id)
+            if len(digest.lines) < settings.NOTIFICATION_DIGEST_MAX_ITEMS:
+                digest.lines.append(content)
+        return list(digests.values())
+
+    async def claim(self, digest: NotificationDigest, digested_at: datetime) -> bool:
+        """
+        ダイジェストに含める通知に送信日時を記録する（updated_at は変更しない）
+        全ての通知を記録できた場合のみ確定する。一部でも他のワーカーが記録済み（または既読）の場合は
+        記録を取り消し、重なるダイジェストを二重に送信しない（残りの通知は次回のダイジェストに含める）
+
+        Returns:
+            bool: 記録した場合はTrue（他のワーカーが記録済みの通知を含む場合はFalse）
+        """
+        result = await self.db.execute(
+            update(Notification)
+            .where(Notification.id.in_(digest.notification_ids), PENDING)
+            .values(digested_at=digested_at, updated_at=Notification.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(digest.notification_ids):
+            await self.db.rollback()
+            return False
+        await self.db.commit()
+        return True
+
+    async def release(self, digest: NotificationDigest, digested_at: datetime) -> None:
+        """送信に失敗したダイジェストの記録を取り消し、次回の送信に含める"""
+        await self.db.execute(
+            update(Notification)
+            .where(Notification.id.in_(digest.notification_ids), Notification.digested_at == digested_at)
+            .values(digested_at=None, updated_at=Notification.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+class NotificationDigestScheduler:
+    """
+    未読の通知のダイジェストを定期的に送信するクラス
+    送信前に通知に送信日時を記録し（ワーカー間で二重に送信しない）、送信に失敗した場合は記録を取り消して次回に再び含める
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        interval: Optional[float] = None,
+        sender: Optional[Sender] = None
+    ):
+        self._session_factory = session_factory
+        self.interval = settings.NOTIFICATION_DIGEST_INTERVAL if interval is None else interval
+        self._sender = sender
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        """
+        ダイジェストを1回送信する
+
+        Returns:
+            int: 送信したダイジェストの数
+        """
+        sender = self._sender
+        if sender is None:
+            if not mail_enabled():
+                logger.info("SMTP is not configured, skipping notification digests")
+                return 0
+            sender = send_email
+        sent = 0
+        last_user_id = 0
+        session_factory = self._session_factory or _default_session_factory()
+        async with session_factory() as db:
+            service = NotificationDigestService(db)
+            while True:
+                digests = await service.build_digests(after_user_id=last_user_id)
+                if not digests:
+                    break
+                for digest in digests:
+                    digested_at = datetime.utcnow()
+                    if not await service.claim(digest, digested_at):
+                        continue
+                    try:
+                        await sender(digest.email, digest.subject, digest.body)
+                    except Exception as e:
+                        DIGEST_FAILURES.inc()
+                        logger.error(f"Failed to send notification digest to user {digest.user_id}: {str(e)}")
+                        await service.release(digest, digested_at)
+                        continue
+                    DIGESTS_SENT.inc()
+                    sent += 1
+                last_user_id = digests[-1].user_id
+        logger.info(f"Sent {sent} notification digests")
+        return sent
+
+    async def run_scheduled(self) -> Optional[int]:
+        """
+        定期実行の1回分の送信を行う（直近の間隔内に他のワーカーが実行していれば何もしない）
+
+        Returns:
+            Optional[int]: 送信したダイジェストの数（他のワーカーが実行した場合は None）
+        """
+        if not await claim_periodic_job("notification_digest", self.interval):
+            return None
+        return await self.run_once()
+
+    def start(self) -> None:
+        """定期的な送信を開始する（間隔が0以下の場合は何もしない）"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的な送信を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_scheduled()
+            except Exception as e:
+                logger.error(f"Failed to send notification digests: {str(e)}")
+
+def _default_session_factory() -> Callable:
+    from app.core.database import get_db_context
+
+    return get_db_context
+
+@lru_cache()
+def get_notification_digest_scheduler() -> NotificationDigestScheduler:
+    """プロセス内の通知のダイジェスト送信のシングルトンを取得する"""
+    return NotificationDigestScheduler()
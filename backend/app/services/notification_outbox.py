@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.models.notification_outbox import NotificationOutbox
+from app.services.notification_service import NotificationService
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+OUTBOX_DELIVERED = Counter('notification_outbox_delivered_total', 'Notifications created from the outbox')
+OUTBOX_FAILURES = Counter('notification_outbox_failures_total', 'Outbox entries that failed and were scheduled for retry')
+OUTBOX_DEAD = Counter('notification_outbox_dead_total', 'Outbox entries moved to the dead letter state')
+OUTBOX_LAG = Gauge('notification_outbox_lag_seconds', 'Age of the oldest entry in the last drained outbox batch')
+
+class NotificationOutboxWorker:
+    """
+    通知のアウトボックスを定期的に取り出し、notifications にまとめて登録するクラス
+
+    1バッチ分の行を複数行の INSERT で通知として登録し、未読数の加算・アウトボックスの行の削除と
+    同じトランザクションでコミットする（行は登録と同時に消えるため、同じ通知が二重に登録されない）。
+    コミット後に通知をストリーム接続に配信する。
+    バッチの登録に失敗した場合は1行ずつ登録し直し、失敗した行だけを指数的に間隔を空けて再試行する。
+    再試行の上限に達した行はデッドレター（status='dead'）として残す
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ):
+        self._session_factory = session_factory
+        self.interval = settings.NOTIFICATION_OUTBOX_INTERVAL if interval is None else interval
+        self.batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+        self.max_attempts = max_attempts or settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+        self.retry_delay = settings.NOTIFICATION_OUTBOX_RETRY_DELAY if retry_delay is None else retry_delay
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        """アウトボックスに行を追加した後に呼び出し、次の取り出しを待たずに開始させる"""
+        self._wakeup.set()
+
+    async def run_once(self) -> int:
+        """
+        登録待ちの行がなくなるまでバッチごとに取り出して登録する
+
+        Returns:
+            int: 登録した通知の数
+        """
+        delivered = 0
+        async with self._lock:
+            session_factory = self._session_factory or _default_session_factory()
+            async with session_factory() as db:
+                while True:
+                    claimed, count = await self._drain_batch(db)
+                    delivered += count
+                    if claimed < self.batch_size:
+                        break
+        return delivered
+
+    async def _drain_batch(self, db) -> tuple:
+        """
+        1バッチ分を登録する
+
+        Returns:
+            tuple: (取り出した行数, 登録した通知の数)
+        """
+        result = await db.execute(
+            select(NotificationOutbox)
+            .where(NotificationOutbox.status == NotificationOutbox.PENDING)
+            .where(NotificationOutbox.available_at <= datetime.utcnow())
+            .order_by(NotificationOutbox.id)
+            .limit(self.batch_size)
+            # 複数のワーカーが同時に取り出す場合は、他のワーカーが処理中の行を読み飛ばす
+            .with_for_update(skip_locked=True)
+        )
+        entries = list(result.scalars().all())
+        if not entries:
+            await db.commit()
+            return 0, 0
+        OUTBOX_LAG.set((datetime.utcnow() - min(entry.created_at for entry in entries)).total_seconds())
+        ids = [entry.id for entry in entries]
+        try:
+            delivered = await self._deliver(db, entries)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.warning(f"Failed to create notifications from outbox batch, retrying one by one: {str(e)}")
+            delivered = 0
+            for entry_id in ids:
+                delivered += await self._deliver_one(db, entry_id)
+        return len(ids), delivered
+
+    async def _deliver(self, db, entries: List[NotificationOutbox]) -> int:
+        service = NotificationService(db)
+        notifications, unread_counts = await service.create_from_outbox(entries)
+        await db.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.id.in_([entry.id for entry in entries]))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        OUTBOX_DELIVERED.inc(len(notifications))
+        await service.notify_created(notifications, unread_counts)
+        return len(notifications)
+
+    async def _deliver_one(self, db, entry_id: int) -> int:
+        result = await db.execute(
+            select(NotificationOutbox)
+            .where(NotificationOutbox.id == entry_id)
+            .where(NotificationOutbox.status == NotificationOutbox.PENDING)
+            .with_for_update(skip_locked=True)
+        )
+        entry = result.scalar_one_or_none()
+        if entry is None:
+            await db.commit()
+            return 0
+        attempts = entry.attempts + 1
+        try:
+            return await self._deliver(db, [entry])
+        except SQLAlchemyError as e:
+            await db.rollback()
+            await self._record_failure(db, entry_id, attempts, str(e))
+            return 0
+
+    async def _record_failure(self, db, entry_id: int, attempts: int, error: str) -> None:
+        """失敗した行を再試行待ちにする（上限に達した場合はデッドレターにする）"""
+        values = {"attempts": attempts, "last_error": error[:2000]}
+        if attempts >= self.max_attempts:
+            values["status"] = NotificationOutbox.DEAD
+            OUTBOX_DEAD.inc()
+            logger.error(f"Notification outbox entry {entry_id} moved to dead letter after {attempts} attempts: {error}")
+        else:
+            values["available_at"] = datetime.utcnow() + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+            OUTBOX_FAILURES.inc()
+        await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id == entry_id)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    def start(self) -> None:
+        """定期的な取り出しを開始する（間隔が0以下の場合は何もしない）"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的な取り出しを停止し、登録待ちの行を登録する"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Failed to drain notification outbox on shutdown: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Failed to drain notification outbox: {str(e)}")
+
+def _default_session_factory() -> Callable:
+    from app.core.database import get_db_context
+
+    return get_db_context
+
+@lru_cache()
+def get_notification_outbox_worker() -> NotificationOutboxWorker:
+    """プロセス内の通知アウトボックスのワーカーのシングルトンを取得する"""
+    return NotificationOutboxWorker()
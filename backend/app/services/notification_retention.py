@@ -0,0 +1,193 @@
+import asyncio
+import sys
+from collections import Counter as TallyCounter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import claim_periodic_job, invalidate
+from app.core.config import settings
+from app.models.notification import Notification
+from app.repositories.notification_repository import NotificationRepository
+from app.schemas.notification import NotificationType
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+NOTIFICATIONS_PURGED = Counter('notifications_purged_total', 'Notifications deleted by the retention policy', ['policy'])
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    通知のタイプごとの保持期間（作成日時からの日数、まとめた通知は最後に更新された日時から）
+
+    Attributes:
+        name (str): ポリシーの名前（メトリクス・ログ用）
+        notification_type (Optional[str]): 対象のタイプ（None は他のポリシーにない全てのタイプ）
+        read_days (int): 既読の通知を保持する日数
+        unread_days (int): 未読の通知を保持する日数
+    """
+    name: str
+    notification_type: Optional[str]
+    read_days: int
+    unread_days: int
+
+def retention_policies() -> Tuple[RetentionPolicy, ...]:
+    """保持期間のポリシーの一覧（タイプを指定したポリシーを先に、その他のタイプのポリシーを最後に並べる）"""
+    return (
+        RetentionPolicy(
+            "system",
+            NotificationType.SYSTEM.value,
+            settings.NOTIFICATION_RETENTION_SYSTEM_DAYS,
+            settings.NOTIFICATION_RETENTION_SYSTEM_DAYS
+        ),
+        RetentionPolicy(
+            "default",
+            None,
+            settings.NOTIFICATION_RETENTION_READ_DAYS,
+            settings.NOTIFICATION_RETENTION_UNREAD_DAYS
+        ),
+    )
+
+def retention_cutoff(now: Optional[datetime] = None) -> datetime:
+    """どのポリシーでも保持期間を過ぎている作成日時（一覧はこれ以降の通知だけを読む）"""
+    now = now or datetime.utcnow()
+    days = max(max(policy.read_days, policy.unread_days) for policy in retention_policies())
+    return now - timedelta(days=days)
+
+def _policy_criteria(policy: RetentionPolicy, is_read: bool, cutoff: datetime) -> tuple:
+    criteria = [Notification.created_at < cutoff, Notification.is_read == is_read]
+    if policy.notification_type is not None:
+        criteria.append(Notification.type == policy.notification_type)
+    else:
+        typed = [other.notification_type for other in retention_policies() if other.notification_type is not None]
+        criteria.append(Notification.type.notin_(typed))
+    return tuple(criteria)
+
+class NotificationRetentionService:
+    """
+    保持期間を過ぎた通知を削除するクラス
+    ロックを長く保持しないよう、一定件数ずつ削除してバッチごとにコミットする。
+    未読の通知を削除した場合は同じトランザクションでユーザーの未読数を減算し、コミット後にキャッシュを無効化する
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repository = NotificationRepository(db)
+
+    async def purge(self, batch_size: Optional[int] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        全てのポリシーで保持期間を過ぎた通知を削除する
+
+        Returns:
+            Dict[str, int]: ポリシーごとの削除した通知の数
+        """
+        batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+        now = now or datetime.utcnow()
+        purged = {}
+        for policy in retention_policies():
+            purged[policy.name] = await self.purge_policy(policy, batch_size, now)
+        logger.info(f"Expired notifications purged: {purged}")
+        return purged
+
+    async def purge_policy(self, policy: RetentionPolicy, batch_size: int, now: datetime) -> int:
+        """
+        1つのポリシーで保持期間を過ぎた通知（既読・未読それぞれ）を削除する
+
+        Returns:
+            int: 削除した通知の数
+        """
+        purged = 0
+        for is_read, days in ((True, policy.read_days), (False, policy.unread_days)):
+            criteria = _policy_criteria(policy, is_read, now - timedelta(days=days))
+            while True:
+                rows = await self.repository.purge_batch(*criteria, limit=batch_size)
+                unread = TallyCounter(user_id for user_id, row_is_read in rows if not row_is_read)
+                # ユーザーID順に更新し、他の更新との行ロックの取得順を揃える
+                for user_id in sorted(unread):
+                    await self.repository.add_unread_count(user_id, -unread[user_id])
+                await self.db.commit()
+                for user_id in unread:
+                    await invalidate("unread_count", user_id)
+                purged += len(rows)
+                if len(rows) < batch_size:
+                    break
+                # バッチの間にイベントループを他のタスクに譲る
+                await asyncio.sleep(0)
+        if purged:
+            NOTIFICATIONS_PURGED.labels(policy=policy.name).inc(purged)
+        return purged
+
+class NotificationPurger:
+    """
+    保持期間を過ぎた通知の削除を定期的に実行するクラス
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, interval: Optional[float] = None):
+        self._session_factory = session_factory
+        self.interval = settings.NOTIFICATION_PURGE_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        """削除を1回実行する"""
+        session_factory = self._session_factory or _default_session_factory()
+        async with session_factory() as db:
+            return await NotificationRetentionService(db).purge()
+
+    async def run_scheduled(self) -> Optional[Dict[str, int]]:
+        """
+        定期実行の1回分の削除を行う（直近の間隔内に他のワーカーが実行していれば何もしない）
+
+        Returns:
+            Optional[Dict[str, int]]: 削除の結果（他のワーカーが実行した場合は None）
+        """
+        if not await claim_periodic_job("notification_purge", self.interval):
+            return None
+        return await self.run_once()
+
+    def start(self) -> None:
+        """定期的な削除を開始する（間隔が0以下の場合は何もしない）"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的な削除を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_scheduled()
+            except Exception as e:
+                logger.error(f"Failed to purge expired notifications: {str(e)}")
+
+def _default_session_factory() -> Callable:
+    from app.core.database import get_db_context
+
+    return get_db_context
+
+@lru_cache()
+def get_notification_purger() -> NotificationPurger:
+    """プロセス内の通知の削除のシングルトンを取得する"""
+    return NotificationPurger()
+
+if __name__ == "__main__":
+    # 使用例: python -m app.services.notification_retention purge
+    if len(sys.argv) != 2 or sys.argv[1] != "purge":
+        print("Usage: python -m app.services.notification_retention purge")
+        sys.exit(1)
+    print(f"Purged notifications: {asyncio.run(NotificationPurger().run_once())}")
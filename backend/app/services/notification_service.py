@@ -1,22 +1,65 @@
-from typing import List, Optional
+from collections import Counter
 from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import cached, invalidate
+from app.core.config import settings
+from app.core.notification_hub import get_notification_hub
 from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
 from app.models.user import User
-from app.database import db
-from sqlalchemy.exc import SQLAlchemyError
+from app.repositories.notification_repository import NotificationRepository
+from app.services.notification_retention import retention_cutoff
+from app.schemas.notification import NotificationBulkDelete, NotificationBulkResult, NotificationBulkUpdate
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 同じ対象への通知を1件にまとめるタイプと、まとめた通知の内容（actor は最新のユーザー名）
+COALESCED_CONTENT = {
+    "like": ("{actor}さんがあなたのプロンプトにいいねしました", "{actor}さんと他{others}人があなたのプロンプトにいいねしました"),
+}
+EPOCH = datetime(1970, 1, 1)
+
+def coalesce_key(entry: NotificationOutbox, window: float) -> Optional[str]:
+    """
+    通知をまとめるキー（受信者・タイプ・関連オブジェクト・window 秒ごとの時間帯）を返す
+    まとめないタイプと、関連オブジェクトのない通知はNone
+    """
+    if entry.type not in COALESCED_CONTENT or entry.related_object_id is None or window <= 0:
+        return None
+    bucket = int((entry.created_at - EPOCH).total_seconds() // window)
+    return f"{entry.user_id}:{entry.type}:{entry.related_object_type}:{entry.related_object_id}:{bucket}"
+
+def coalesced_content(notification_type: str, actor: str, actor_count: int) -> str:
+    """まとめた通知の内容を返す"""
+    single, multiple = COALESCED_CONTENT[notification_type]
+    if actor_count <= 1:
+        return single.format(actor=actor)
+    return multiple.format(actor=actor, others=actor_count - 1)
+
 class NotificationService:
-    """通知関連のサービスを提供するクラス"""
+    """
+    通知関連のサービスを提供するクラス
+    ユーザーの未読数（users.unread_notification_count）は通知の作成・既読・削除と同じトランザクションで差分を加算し、
+    コミット後にキャッシュを無効化する（ずれは CounterReconciler の定期的な再集計で修正される）
+    作成した通知と変化した未読数は、コミット後に通知ハブ経由でユーザーのストリーム接続に配信する
+    他の操作をきっかけにした通知は、操作と同じトランザクションでアウトボックスに追加し、ワーカーがまとめて登録する
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repository = NotificationRepository(db)
 
-    @staticmethod
     async def create_notification(
+        self,
         user_id: int,
         notification_type: str,
         content: str,
-        related_id: Optional[int] = None
+        sender_id: Optional[int] = None,
+        link: Optional[str] = None
     ) -> Optional[Notification]:
         """
         新しい通知を作成する
@@ -25,61 +68,257 @@ class NotificationService:
             user_id (int): 通知を受け取るユーザーのID
             notification_type (str): 通知のタイプ（comment, like, follow など）
             content (str): 通知の内容
-            related_id (Optional[int]): 関連するコンテンツのID（プロンプトIDなど）
+            sender_id (Optional[int]): 通知を送信したユーザーのID
+            link (Optional[str]): 通知に関連するリンク
 
         Returns:
             Optional[Notification]: 作成された通知オブジェクト、失敗時はNone
         """
         try:
-            notification = Notification(
+            notification = await self.repository.add(Notification(
                 user_id=user_id,
                 type=notification_type,
                 content=content,
-                related_id=related_id,
-                created_at=datetime.utcnow(),
-                is_read=False
-            )
-            db.session.add(notification)
-            await db.session.commit()
-            return notification
+                sender_id=sender_id,
+                link=link
+            ), commit=False)
+            unread_count = await self.repository.add_unread_count(user_id, 1)
+            await self.db.commit()
+            await self.db.refresh(notification)
         except SQLAlchemyError as e:
             logger.error(f"Failed to create notification: {str(e)}")
-            await db.session.rollback()
+            await self.db.rollback()
             return None
+        await self.notify_created([notification], {user_id: unread_count})
+        return notification
+
+    def enqueue_notification(
+        self,
+        user_id: int,
+        notification_type: str,
+        content: str,
+        sender_id: Optional[int] = None,
+        link: Optional[str] = None,
+        related_object_type: Optional[str] = None,
+        related_object_id: Optional[int] = None
+    ) -> NotificationOutbox:
+        """
+        通知をアウトボックスに追加する（コミットはしない）
+        呼び出し元の操作と同じトランザクションでコミットし、通知の登録は NotificationOutboxWorker が行う
+
+        Args:
+            user_id (int): 通知を受け取るユーザーのID
+            notification_type (str): 通知のタイプ（comment, like, follow など）
+            content (str): 通知の内容（まとめる通知の場合は登録時に置き換える）
+            sender_id (Optional[int]): 通知を送信したユーザーのID
+            link (Optional[str]): 通知に関連するリンク
+            related_object_type (Optional[str]): 関連オブジェクトの種類（'prompt' など）
+            related_object_id (Optional[int]): 関連オブジェクトのID
+
+        Returns:
+            NotificationOutbox: 追加したアウトボックスの行
+        """
+        entry = NotificationOutbox(
+            user_id=user_id,
+            type=notification_type,
+            content=content,
+            sender_id=sender_id,
+            link=link,
+            related_object_type=related_object_type,
+            related_object_id=related_object_id
+        )
+        self.db.add(entry)
+        return entry
+
+    async def create_from_outbox(
+        self,
+        entries: Sequence[NotificationOutbox]
+    ) -> Tuple[List[Notification], Dict[int, int]]:
+        """
+        アウトボックスの行から通知をまとめて登録し、ユーザーごとの未読数を加算する（コミットはしない）
+        まとめるタイプの通知（いいねなど）は、同じキーの通知を1件にまとめる。
+        キーの通知が既にある場合はその行を更新し、既読だった場合だけ未読に戻して未読数を1加算する
+
+        Returns:
+            Tuple[List[Notification], Dict[int, int]]: 登録・更新した通知と、ユーザーごとの加算後の未読数
+        """
+        window = settings.NOTIFICATION_COALESCE_WINDOW
+        plain = []
+        groups: Dict[str, List[NotificationOutbox]] = {}
+        for entry in entries:
+            key = coalesce_key(entry, window)
+            if key is None:
+                plain.append(entry)
+            else:
+                groups.setdefault(key, []).append(entry)
+
+        notifications = await self.repository.add_many([entry.notification_values() for entry in plain])
+        deltas = Counter(notification.user_id for notification in notifications)
+        for key, group in groups.items():
+            notification, became_unread = await self._coalesce(key, group)
+            notifications.append(notification)
+            deltas[notification.user_id] += 1 if became_unread else 0
+
+        unread_counts = {}
+        # ユーザーID順に更新し、ワーカー間での行ロックの取得順を揃える
+        for user_id in sorted(deltas):
+            unread_counts[user_id] = await self.repository.add_unread_count(user_id, deltas[user_id])
+        return notifications, unread_counts
+
+    async def _coalesce(self, key: str, group: List[NotificationOutbox]) -> Tuple[Notification, bool]:
+        """
+        同じキーの通知（古い順）を1件の通知にまとめる
+        操作したユーザーの数は、保持している一部のユーザーに含まれないユーザーの数だけ増やす（概数）
+
+        Returns:
+            Tuple[Notification, bool]: まとめた通知と、未読の通知が増えたかどうか
+        """
+        latest = group[-1]
+        actors = []
+        for entry in reversed(group):
+            if entry.sender_id is not None and entry.sender_id not in actors:
+                actors.append(entry.sender_id)
+        sample_size = settings.NOTIFICATION_ACTOR_SAMPLE_SIZE
+        existing = await self.repository.get_by_group_key(key)
+
+        if existing is None:
+            actor_count = max(len(actors), 1)
+            values = latest.notification_values()
+            values.update(
+                group_key=key,
+                actor_count=actor_count,
+                actor_ids=actors[:sample_size],
+                content=coalesced_content(latest.type, await self._actor_name(latest.sender_id), actor_count)
+            )
+            (notification,) = await self.repository.add_many([values])
+            return notification, True
+
+        sample = list(existing.actor_ids or [])
+        new_actors = [actor for actor in actors if actor not in sample]
+        actor_count = existing.actor_count + len(new_actors)
+        became_unread = bool(existing.is_read)
+        notification = await self.repository.update(existing, {
+            "actor_count": actor_count,
+            "actor_ids": (actors + [actor for actor in sample if actor not in actors])[:sample_size],
+            "content": coalesced_content(latest.type, await self._actor_name(latest.sender_id), actor_count),
+            "sender_id": latest.sender_id,
+            "is_read": False,
+            # 最新の操作の日時にし、一覧の先頭に表示する
+            "created_at": latest.created_at,
+            "updated_at": datetime.utcnow()
+        }, commit=False)
+        return notification, became_unread
+
+    async def _actor_name(self, user_id: Optional[int]) -> str:
+        if user_id is None:
+            return "誰か"
+        result = await self.db.execute(select(User.username).where(User.id == user_id))
+        return result.scalar_one_or_none() or "誰か"
+
+    async def notify_created(self, notifications: Sequence[Notification], unread_counts: Dict[int, int]) -> None:
+        """
+        コミット後に、登録した通知を受信者のストリーム接続に配信し、未読数のキャッシュを無効化する
+        （まとめた通知が更新された場合は同じIDのイベントを再び配信し、クライアントは通知を置き換える）
+
+        Args:
+            notifications (Sequence[Notification]): 登録した通知
+            unread_counts (Dict[int, int]): ユーザーごとの登録後の未読数
+        """
+        for user_id in unread_counts:
+            await invalidate("unread_count", user_id)
+        hub = get_notification_hub()
+        for notification in notifications:
+            await hub.publish(
+                notification.user_id,
+                "notification",
+                {**notification.to_dict(), "unread_count": unread_counts.get(notification.user_id)},
+                event_id=notification.id
+            )
+
+    def enqueue_like_notification(self, recipient_id: int, sender_id: int, prompt_id: int) -> NotificationOutbox:
+        """
+        プロンプトへのいいねの通知をアウトボックスに追加する（いいねと同じトランザクションでコミットする）
+        同じプロンプトへのいいねの通知は、登録時に時間帯ごとに1件にまとめる
+
+        Args:
+            recipient_id (int): 通知を受け取るユーザー（プロンプトの作成者）のID
+            sender_id (int): いいねしたユーザーのID
+            prompt_id (int): プロンプトID
+
+        Returns:
+            NotificationOutbox: 追加したアウトボックスの行
+        """
+        return self.enqueue_notification(
+            recipient_id,
+            "like",
+            "あなたのプロンプトにいいねがつきました",
+            sender_id=sender_id,
+            link=f"/prompts/{prompt_id}",
+            related_object_type="prompt",
+            related_object_id=prompt_id
+        )
+
+    def enqueue_comment_notification(
+        self,
+        recipient_id: int,
+        sender_id: int,
+        prompt_id: int,
+        comment_id: int
+    ) -> NotificationOutbox:
+        """
+        プロンプトへのコメントの通知をアウトボックスに追加する（コメントと同じトランザクションでコミットする）
+
+        Args:
+            recipient_id (int): 通知を受け取るユーザー（プロンプトの作成者）のID
+            sender_id (int): コメントしたユーザーのID
+            prompt_id (int): プロンプトID
+            comment_id (int): コメントID
+
+        Returns:
+            NotificationOutbox: 追加したアウトボックスの行
+        """
+        return self.enqueue_notification(
+            recipient_id,
+            "comment",
+            "あなたのプロンプトに新しいコメントがつきました",
+            sender_id=sender_id,
+            link=f"/prompts/{prompt_id}#comment-{comment_id}",
+            related_object_type="prompt",
+            related_object_id=prompt_id
+        )
 
-    @staticmethod
     async def get_user_notifications(
+        self,
         user_id: int,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[Notification]:
+        cursor: Optional[str] = None,
+        unread_only: bool = False
+    ) -> Tuple[List[Notification], Optional[str]]:
         """
-        ユーザーの通知一覧を取得する
+        ユーザーの通知一覧を新しい順に取得する
+        保持期間を過ぎた（削除待ちの）通知は読まず、(user_id, created_at, id) のインデックスの直近の範囲だけを読む
 
         Args:
             user_id (int): ユーザーID
             limit (int): 取得する通知の最大数
-            offset (int): ページネーションのオフセット
+            cursor (Optional[str]): 前のページで返されたカーソル
+            unread_only (bool): 未読の通知のみを取得するかどうか
 
         Returns:
-            List[Notification]: 通知のリスト
+            Tuple[List[Notification], Optional[str]]: 通知のリストと次ページのカーソル
         """
         try:
-            notifications = await Notification.query\
-                .filter(Notification.user_id == user_id)\
-                .order_by(Notification.created_at.desc())\
-                .offset(offset)\
-                .limit(limit)\
-                .all()
-            return notifications
+            return await self.repository.page_for_user(
+                user_id, limit=limit, cursor=cursor, unread_only=unread_only, since=retention_cutoff()
+            )
         except SQLAlchemyError as e:
             logger.error(f"Failed to get notifications: {str(e)}")
-            return []
+            return [], None
 
-    @staticmethod
-    async def mark_as_read(notification_id: int) -> bool:
+    async def mark_as_read(self, notification_id: int) -> bool:
         """
         通知を既読にマークする
+        未読の行だけを更新するため、同時に既読にされても未読数を二重に減算しない
 
         Args:
             notification_id (int): 通知ID
@@ -88,20 +327,24 @@ class NotificationService:
             bool: 成功した場合はTrue、失敗した場合はFalse
         """
         try:
-            notification = await Notification.query.get(notification_id)
-            if notification:
-                notification.is_read = True
-                notification.read_at = datetime.utcnow()
-                await db.session.commit()
-                return True
-            return False
+            notification = await self.repository.get(notification_id)
+            if not notification:
+                return False
+            user_id = notification.user_id
+            affected = await self.repository.set_read_many(user_id, ids=[notification_id], commit=False)
+            if affected:
+                unread_count = await self.repository.add_unread_count(user_id, -affected)
+            await self.db.commit()
+            await self.db.refresh(notification)
         except SQLAlchemyError as e:
             logger.error(f"Failed to mark notification as read: {str(e)}")
-            await db.session.rollback()
+            await self.db.rollback()
             return False
+        if affected:
+            await self._unread_count_changed(user_id, unread_count)
+        return True
 
-    @staticmethod
-    async def mark_all_as_read(user_id: int) -> bool:
+    async def mark_all_as_read(self, user_id: int) -> bool:
         """
         ユーザーの全ての通知を既読にマークする
 
@@ -112,24 +355,74 @@ class NotificationService:
             bool: 成功した場合はTrue、失敗した場合はFalse
         """
         try:
-            await Notification.query\
-                .filter(Notification.user_id == user_id)\
-                .filter(Notification.is_read == False)\
-                .update({
-                    Notification.is_read: True,
-                    Notification.read_at: datetime.utcnow()
-                })
-            await db.session.commit()
-            return True
+            affected = await self.repository.mark_all_read(user_id, commit=False)
+            if affected:
+                unread_count = await self.repository.add_unread_count(user_id, -affected)
+            await self.db.commit()
         except SQLAlchemyError as e:
             logger.error(f"Failed to mark all notifications as read: {str(e)}")
-            await db.session.rollback()
+            await self.db.rollback()
             return False
+        if affected:
+            await self._unread_count_changed(user_id, unread_count)
+        return True
+
+    async def update_many(self, user_id: int, data: NotificationBulkUpdate) -> NotificationBulkResult:
+        """
+        ユーザーの通知をまとめて既読（または未読）にする
+        更新（1回のUPDATE）と未読数の加算を同じトランザクションで行い、加算後の未読数を返す
 
-    @staticmethod
-    async def delete_notification(notification_id: int) -> bool:
+        Args:
+            user_id (int): ユーザーID
+            data (NotificationBulkUpdate): 対象の通知（IDのリストか指定日時より前）と既読状態
+
+        Returns:
+            NotificationBulkResult: 状態を変更した通知の数と操作後の未読数
+        """
+        try:
+            affected = await self.repository.set_read_many(
+                user_id, ids=data.notification_ids, before=data.before, is_read=data.is_read, commit=False
+            )
+            unread_count = await self.repository.add_unread_count(user_id, -affected if data.is_read else affected)
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to update notifications: {str(e)}")
+            await self.db.rollback()
+            raise
+        if affected:
+            await self._unread_count_changed(user_id, unread_count)
+        return NotificationBulkResult(affected=affected, unread_count=unread_count)
+
+    async def delete_many(self, user_id: int, data: NotificationBulkDelete) -> NotificationBulkResult:
+        """
+        ユーザーの通知をまとめて削除する
+        削除（1回のDELETE）と、削除した未読の通知の分の未読数の減算を同じトランザクションで行う
+
+        Args:
+            user_id (int): ユーザーID
+            data (NotificationBulkDelete): 対象の通知（IDのリストか指定日時より前）
+
+        Returns:
+            NotificationBulkResult: 削除した通知の数と操作後の未読数
+        """
+        try:
+            affected, unread_deleted = await self.repository.delete_many(
+                user_id, ids=data.notification_ids, before=data.before, commit=False
+            )
+            unread_count = await self.repository.add_unread_count(user_id, -unread_deleted)
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to delete notifications: {str(e)}")
+            await self.db.rollback()
+            raise
+        if unread_deleted:
+            await self._unread_count_changed(user_id, unread_count)
+        return NotificationBulkResult(affected=affected, unread_count=unread_count)
+
+    async def delete_notification(self, notification_id: int) -> bool:
         """
         通知を削除する
+        未読の通知だった場合は同じトランザクションで未読数を減算する
 
         Args:
             notification_id (int): 通知ID
@@ -138,21 +431,28 @@ class NotificationService:
             bool: 成功した場合はTrue、失敗した場合はFalse
         """
         try:
-            notification = await Notification.query.get(notification_id)
-            if notification:
-                await db.session.delete(notification)
-                await db.session.commit()
-                return True
-            return False
+            notification = await self.repository.get(notification_id)
+            if not notification:
+                return False
+            user_id = notification.user_id
+            deleted, unread_deleted = await self.repository.delete_many(
+                user_id, ids=[notification_id], commit=False
+            )
+            if unread_deleted:
+                unread_count = await self.repository.add_unread_count(user_id, -unread_deleted)
+            await self.db.commit()
         except SQLAlchemyError as e:
             logger.error(f"Failed to delete notification: {str(e)}")
-            await db.session.rollback()
+            await self.db.rollback()
             return False
+        if unread_deleted:
+            await self._unread_count_changed(user_id, unread_count)
+        return deleted > 0
 
-    @staticmethod
-    async def get_unread_count(user_id: int) -> int:
+    async def get_unread_count(self, user_id: int) -> int:
         """
         未読通知の数を取得する
+        通知を数えずに、ユーザーの未読数の列をキャッシュ経由で読む
 
         Args:
             user_id (int): ユーザーID
@@ -161,11 +461,19 @@ class NotificationService:
             int: 未読通知の数
         """
         try:
-            count = await Notification.query\
-                .filter(Notification.user_id == user_id)\
-                .filter(Notification.is_read == False)\
-                .count()
-            return count
+            return await self._get_unread_count(user_id)
         except SQLAlchemyError as e:
             logger.error(f"Failed to get unread notification count: {str(e)}")
-            return 0
\ No newline at end of file
+            return 0
+
+    @cached("unread_count", ttl=settings.UNREAD_COUNT_CACHE_TTL, key=lambda self, user_id: user_id)
+    async def _get_unread_count(self, user_id: int) -> int:
+        result = await self.db.execute(
+            select(User.unread_notification_count).where(User.id == user_id)
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def _unread_count_changed(self, user_id: int, unread_count: int) -> None:
+        """コミット後に未読数のキャッシュを無効化し、ユーザーのストリーム接続に新しい未読数を配信する"""
+        await invalidate("unread_count", user_id)
+        await get_notification_hub().publish(user_id, "unread_count", {"unread_count": unread_count})
@@ -1,58 +1,197 @@
-from typing import List, Optional, Dict
+import json
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from itertools import islice
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.prompt import Prompt
-from app.models.user import User
+from app.repositories.prompt_repository import PromptRepository
 from app.schemas.prompt import PromptCreate, PromptUpdate
+from app.core.cache import cached, invalidate, invalidate_namespace
+from app.core.config import settings
+from app.core.etag import compute_etag
 from app.core.exceptions import NotFoundException, UnauthorizedException
+from app.core.pagination import apply_keyset, created_at_key, decode_cursor, encode_cursor, keyset_page
+from app.services.like_service import LikeService
+from app.services.search_service import SearchService
+from app.services.tag_service import TagService, normalize_tags
+from app.services.trending_service import TrendingService, get_trending_engine, record_event
+
+def prompt_stamp(prompt: Dict) -> str:
+    """プロンプトの辞書からバージョンスタンプ（ETagの元）を求める"""
+    return compute_etag(
+        prompt["id"],
+        prompt["updated_at"],
+        prompt["like_count"],
+        prompt.get("comment_count"),
+        prompt.get("share_count"),
+        prompt["view_count"],
+        prompt["average_rating"]
+    )
 
 class PromptService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
+        self.prompts = PromptRepository(db)
+        self.search_service = SearchService(db)
+        self.tag_service = TagService(db)
+        self.like_service = LikeService(db)
 
     async def create_prompt(self, prompt_data: PromptCreate, user_id: int) -> Prompt:
-        """新しいプロンプトを作成する"""
-        prompt = Prompt(
-            title=prompt_data.title,
-            content=prompt_data.content,
-            category=prompt_data.category,
-            tags=prompt_data.tags,
-            user_id=user_id,
-            is_public=prompt_data.is_public,
-            created_at=datetime.utcnow()
+        """
+        新しいプロンプトを作成する
+        スキーマの is_public（公開状態）は Prompt.is_published に保存する
+        """
+        prompt = await self.prompts.create_with_owner(
+            {
+                "title": prompt_data.title,
+                "content": prompt_data.content,
+                "category": prompt_data.category,
+                "language": prompt_data.language,
+                "is_published": prompt_data.is_public,
+                "created_at": datetime.utcnow()
+            },
+            user_id,
+            commit=False
         )
-        self.db.add(prompt)
+        await self.tag_service.set_prompt_tags(prompt, prompt_data.tags)
         await self.db.commit()
         await self.db.refresh(prompt)
+        await self.search_service.index_prompt(prompt)
+        await self.tag_service.index_prompt(prompt)
+        await invalidate_namespace("prompt_list")
         return prompt
 
     async def get_prompt(self, prompt_id: int) -> Optional[Prompt]:
         """指定されたIDのプロンプトを取得する"""
-        prompt = await self.db.query(Prompt).filter(Prompt.id == prompt_id).first()
+        prompt = await self.prompts.get(prompt_id)
         if not prompt:
             raise NotFoundException("Prompt not found")
         return prompt
 
+    @cached("prompt", key=lambda self, prompt_id: prompt_id)
+    async def get_prompt_data(self, prompt_id: int) -> Optional[Dict]:
+        """
+        プロンプトを辞書で取得する（キャッシュ付き）
+        """
+        result = await self.db.execute(select(Prompt).where(Prompt.id == prompt_id))
+        prompt = result.scalar_one_or_none()
+        return prompt.to_dict() if prompt else None
+
+    async def get_prompt_list_data(
+        self,
+        limit: int = 100,
+        filters: Dict = None,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        get_prompts の結果を辞書で取得する（キャッシュ付き）
+        プロンプトの作成・更新・削除時に名前空間ごと無効化する
+        タグインデックスで解決する一覧は、インデックスが反映している共有のバージョンをキーに含め、
+        他のワーカーの変更を取り込んでいないインデックスの結果が他のワーカーに読まれないようにする
+
+        Returns:
+            Dict: {"items": プロンプトの辞書のリスト, "next_cursor": 次ページのカーソル}
+        """
+        index_version = None
+        if self._uses_tag_index(filters or {}):
+            index_version = await self.tag_service.refresh_index()
+        return await self._get_prompt_list_data(limit, filters, cursor, index_version)
+
+    @cached(
+        "prompt_list",
+        ttl=settings.CACHE_LIST_TTL,
+        key=lambda self, limit, filters, cursor, index_version: json.dumps(
+            [limit, filters, cursor, index_version], sort_keys=True, default=str
+        )
+    )
+    async def _get_prompt_list_data(
+        self,
+        limit: int,
+        filters: Optional[Dict],
+        cursor: Optional[str],
+        index_version: Optional[int]
+    ) -> Dict:
+        prompts, next_cursor = await self.get_prompts(limit=limit, filters=filters, cursor=cursor)
+        return {"items": [prompt.to_dict() for prompt in prompts], "next_cursor": next_cursor}
+
+    @staticmethod
+    def _uses_tag_index(filters: Dict) -> bool:
+        """タグインデックスで解決する条件（公開中のプロンプトのタグ検索）かどうか"""
+        return bool(
+            normalize_tags(filters.get("tags"))
+            and filters.get("is_published") is True
+            and not filters.get("user_id")
+        )
+
     async def get_prompts(
         self,
-        skip: int = 0,
         limit: int = 100,
-        filters: Dict = None
-    ) -> List[Prompt]:
-        """プロンプトの一覧を取得する（フィルタリング付き）"""
-        query = self.db.query(Prompt)
+        filters: Dict = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Prompt], Optional[str]]:
+        """
+        プロンプトの一覧を新しい順に取得する（フィルタリング付き）
+        (created_at, id) のキーセットでページングし、次ページ取得用のカーソルを返す
+        公開プロンプトのタグ検索はタグインデックスで解決し、IDの降順で返す
+        """
+        filters = filters or {}
+        tags = normalize_tags(filters.get("tags"))
+        tag_mode = filters.get("tag_mode", "all")
+        if self._uses_tag_index(filters):
+            return await self._get_prompts_by_tag_index(
+                tags, tag_mode, filters.get("category"), limit, cursor
+            )
+
+        query = select(Prompt)
 
         if filters:
             if filters.get("category"):
-                query = query.filter(Prompt.category == filters["category"])
-            if filters.get("tags"):
-                query = query.filter(Prompt.tags.contains(filters["tags"]))
+                query = query.where(Prompt.category == filters["category"])
+            if tags:
+                query = query.where(self.tag_service.tag_filter_clause(tags, tag_mode))
             if filters.get("user_id"):
-                query = query.filter(Prompt.user_id == filters["user_id"])
-            if "is_public" in filters:
-                query = query.filter(Prompt.is_public == filters["is_public"])
+                query = query.where(Prompt.user_id == filters["user_id"])
+            if "is_published" in filters:
+                query = query.where(Prompt.is_published == filters["is_published"])
+
+        query = apply_keyset(query, [Prompt.created_at, Prompt.id], cursor, limit)
+        result = await self.db.execute(query)
+        return keyset_page(result.scalars().all(), limit, created_at_key)
+
+    async def _get_prompts_by_tag_index(
+        self,
+        tags: List[str],
+        tag_mode: str,
+        category: Optional[str],
+        limit: int,
+        cursor: Optional[str]
+    ) -> Tuple[List[Prompt], Optional[str]]:
+        """
+        タグインデックスで該当IDを求め、1ページ分だけをDBから取得する
+        ワーカーのインデックスは最大 TAG_INDEX_REFRESH_INTERVAL 秒古い場合があるため、
+        他のワーカーで非公開にされたプロンプトを返さないよう、取得時にも公開状態で絞り込む
+        """
+        if tag_mode == "any":
+            matched = self.tag_service.index.query(any_tags=tags, category=category)
+        else:
+            matched = self.tag_service.index.query(all_tags=tags, category=category)
+
+        below = decode_cursor(cursor, size=1, types=[int])[0] if cursor else None
+        ids = list(islice(matched.iter_desc(below=below), limit + 1))
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        if not ids:
+            return [], None
 
-        return await query.offset(skip).limit(limit).all()
+        result = await self.db.execute(
+            select(Prompt)
+            .where(Prompt.id.in_(ids))
+            .where(Prompt.is_published == True)
+            .order_by(Prompt.id.desc())
+        )
+        prompts = result.scalars().all()
+        return prompts, encode_cursor(ids[-1]) if has_more else None
 
     async def update_prompt(
         self,
@@ -60,18 +199,31 @@ class PromptService:
         prompt_data: PromptUpdate,
         user_id: int
     ) -> Prompt:
-        """プロンプトを更新する"""
+        """
+        プロンプトを更新する
+        スキーマの is_public（公開状態）は Prompt.is_published に保存する
+        """
         prompt = await self.get_prompt(prompt_id)
         
         if prompt.user_id != user_id:
             raise UnauthorizedException("Not authorized to update this prompt")
 
-        for field, value in prompt_data.dict(exclude_unset=True).items():
+        update_data = prompt_data.dict(exclude_unset=True)
+        tags = update_data.pop("tags", None)
+        if "is_public" in update_data:
+            update_data["is_published"] = update_data.pop("is_public")
+        for field, value in update_data.items():
             setattr(prompt, field, value)
+        if tags is not None:
+            await self.tag_service.set_prompt_tags(prompt, tags)
         
         prompt.updated_at = datetime.utcnow()
         await self.db.commit()
         await self.db.refresh(prompt)
+        await self.search_service.index_prompt(prompt)
+        await self.tag_service.index_prompt(prompt)
+        await invalidate("prompt", prompt_id)
+        await invalidate_namespace("prompt_list")
         return prompt
 
     async def delete_prompt(self, prompt_id: int, user_id: int) -> bool:
@@ -81,48 +233,75 @@ class PromptService:
         if prompt.user_id != user_id:
             raise UnauthorizedException("Not authorized to delete this prompt")
 
-        await self.db.delete(prompt)
-        await self.db.commit()
+        await self.prompts.delete(prompt)
+        await self.search_service.remove_prompt(prompt_id)
+        await self.tag_service.remove_prompt(prompt_id)
+        get_trending_engine().remove_prompt(prompt_id)
+        await invalidate("prompt", prompt_id)
+        await invalidate_namespace("prompt_list")
         return True
 
     async def add_like(self, prompt_id: int, user_id: int) -> bool:
         """プロンプトにいいねを追加する"""
-        prompt = await self.get_prompt(prompt_id)
-        if user_id not in prompt.likes:
-            prompt.likes.append(user_id)
-            prompt.like_count += 1
-            await self.db.commit()
+        await self.get_prompt(prompt_id)
+        await self.like_service.like(prompt_id, user_id)
         return True
 
     async def remove_like(self, prompt_id: int, user_id: int) -> bool:
         """プロンプトのいいねを削除する"""
-        prompt = await self.get_prompt(prompt_id)
-        if user_id in prompt.likes:
-            prompt.likes.remove(user_id)
-            prompt.like_count -= 1
-            await self.db.commit()
+        await self.like_service.unlike(prompt_id, user_id)
+        return True
+
+    async def share_prompt(self, prompt_id: int) -> bool:
+        """
+        プロンプトのシェア数を加算する
+
+        Returns:
+            bool: プロンプトが存在した場合はTrue
+        """
+        # シェア数の更新で updated_at（プロンプトの編集日時）が変わらないようにする
+        result = await self.db.execute(
+            update(Prompt)
+            .where(Prompt.id == prompt_id)
+            .values(share_count=Prompt.share_count + 1, updated_at=Prompt.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return False
+        await self.db.commit()
+        await invalidate("prompt", prompt_id)
+        record_event(prompt_id, "share")
         return True
 
     async def search_prompts(
         self,
         query: str,
-        skip: int = 0,
-        limit: int = 100
-    ) -> List[Prompt]:
-        """プロンプトを検索する"""
-        search_query = self.db.query(Prompt).filter(
-            Prompt.is_public == True
-        ).filter(
-            (Prompt.title.ilike(f"%{query}%")) |
-            (Prompt.content.ilike(f"%{query}%")) |
-            (Prompt.tags.contains([query]))
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> Tuple[List[Prompt], Optional[str]]:
+        """
+        検索インデックスを使用してプロンプトを検索する
+        関連度順に並んだプロンプトと、次ページ取得用のカーソルを返す
+        日本語のクエリはN-gramのインデックスで部分一致検索される
+        """
+        page = await self.search_service.search(
+            query, limit=limit, cursor=cursor, language=language
         )
-        return await search_query.offset(skip).limit(limit).all()
-
-    async def get_trending_prompts(self, limit: int = 10) -> List[Prompt]:
-        """トレンドのプロンプトを取得する"""
-        return await self.db.query(Prompt)\
-            .filter(Prompt.is_public == True)\
-            .order_by(Prompt.like_count.desc())\
-            .limit(limit)\
-            .all()
\ No newline at end of file
+        if not page.hits:
+            return [], None
+
+        ids = [hit.id for hit in page.hits]
+        result = await self.db.execute(
+            select(Prompt).where(Prompt.id.in_(ids)).where(Prompt.is_published == True)
+        )
+        prompts_by_id = {prompt.id: prompt for prompt in result.scalars().all()}
+        # インデックスの並び順（関連度順）を維持する
+        return [prompts_by_id[i] for i in ids if i in prompts_by_id], page.next_cursor
+
+    async def get_trending_prompts(self, limit: int = 10, window: str = "24h") -> List[Prompt]:
+        """
+        トレンドのプロンプトを取得する
+        いいね・閲覧・コメント・共有を時間減衰させたスコアの順に返す
+        """
+        return await TrendingService(self.db).get_trending_prompts(window=window, limit=limit)
\ No newline at end of file
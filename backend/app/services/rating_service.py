@@ -0,0 +1,237 @@
+import asyncio
+import sys
+from typing import Dict, List
+
+from sqlalchemy import Float, case, cast, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import invalidate
+from app.core.exceptions import NotFoundException
+from app.models.prompt import Prompt
+from app.models.rating import Rating
+from app.schemas.rating import RatingDistribution
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RATING_VALUES = range(1, 6)
+
+def _histogram_column(value: int):
+    return getattr(Prompt, f"rating_count_{value}")
+
+def rating_delta_values(sum_delta: int, count_delta: int, histogram_delta: Dict[int, int]) -> Dict:
+    """
+    評価の集計値を差分で更新するための UPDATE の値を返す
+    右辺は更新前の行の値を参照するため、同時に実行されても加減算が失われない
+    """
+    values = {
+        "rating_sum": Prompt.rating_sum + sum_delta,
+        "rating_count": Prompt.rating_count + count_delta,
+        "average_rating": case(
+            (
+                Prompt.rating_count + count_delta > 0,
+                cast(Prompt.rating_sum + sum_delta, Float) / (Prompt.rating_count + count_delta)
+            ),
+            else_=0.0
+        ),
+    }
+    for value, delta in histogram_delta.items():
+        if delta:
+            values[f"rating_count_{value}"] = _histogram_column(value) + delta
+    return values
+
+class RatingService:
+    """
+    プロンプトの評価を管理するクラス
+    評価の追加・変更・削除のたびに Prompt の集計値（合計・件数・評価ごとの件数）を差分で更新し、
+    平均評価と分布を全件の再集計なしで返せるようにする
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _apply_delta(self, prompt_id: int, sum_delta: int, count_delta: int, histogram_delta: Dict[int, int]) -> None:
+        # 評価の集計値の更新で updated_at（プロンプトの編集日時）が変わらないようにする
+        await self.db.execute(
+            update(Prompt)
+            .where(Prompt.id == prompt_id)
+            .values(**rating_delta_values(sum_delta, count_delta, histogram_delta), updated_at=Prompt.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def rate(self, prompt_id: int, user_id: int, value: int) -> Rating:
+        """
+        プロンプトを評価する（評価済みの場合は評価を変更する）
+
+        Args:
+            prompt_id (int): プロンプトID
+            user_id (int): ユーザーID
+            value (int): 評価（1〜5）
+
+        Returns:
+            Rating: 登録された評価
+        """
+        result = await self.db.execute(
+            select(Rating)
+            .where(Rating.user_id == user_id)
+            .where(Rating.prompt_id == prompt_id)
+            .with_for_update()
+        )
+        rating = result.scalar_one_or_none()
+
+        if rating is None:
+            try:
+                async with self.db.begin_nested():
+                    rating = Rating(user_id=user_id, prompt_id=prompt_id, value=value)
+                    self.db.add(rating)
+            except IntegrityError:
+                # 同時に別のリクエストが評価を登録した場合は変更として扱う
+                result = await self.db.execute(
+                    select(Rating)
+                    .where(Rating.user_id == user_id)
+                    .where(Rating.prompt_id == prompt_id)
+                    .with_for_update()
+                )
+                rating = result.scalar_one()
+            else:
+                await self._apply_delta(prompt_id, value, 1, {value: 1})
+                await self.db.commit()
+                await invalidate("prompt", prompt_id)
+                return rating
+
+        previous = rating.value
+        if previous != value:
+            rating.value = value
+            await self._apply_delta(prompt_id, value - previous, 0, {previous: -1, value: 1})
+        await self.db.commit()
+        await invalidate("prompt", prompt_id)
+        return rating
+
+    async def delete_rating(self, prompt_id: int, user_id: int) -> bool:
+        """
+        プロンプトの評価を削除する
+
+        Returns:
+            bool: 評価を削除した場合はTrue
+        """
+        result = await self.db.execute(
+            delete(Rating)
+            .where(Rating.user_id == user_id)
+            .where(Rating.prompt_id == prompt_id)
+            .returning(Rating.value)
+        )
+        value = result.scalar_one_or_none()
+        if value is None:
+            return False
+        await self._apply_delta(prompt_id, -value, -1, {value: -1})
+        await self.db.commit()
+        await invalidate("prompt", prompt_id)
+        return True
+
+    async def get_distribution(self, prompt_id: int) -> RatingDistribution:
+        """プロンプトの評価の分布を返す（プロンプトの1行のみを読み込む）"""
+        result = await self.db.execute(
+            select(
+                Prompt.average_rating,
+                Prompt.rating_count,
+                *[_histogram_column(value) for value in RATING_VALUES]
+            ).where(Prompt.id == prompt_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            raise NotFoundException("Prompt not found")
+        return RatingDistribution(
+            prompt_id=prompt_id,
+            average=row[0] or 0.0,
+            count=row[1] or 0,
+            histogram={value: row[1 + value] or 0 for value in RATING_VALUES}
+        )
+
+    async def reconcile(self, batch_size: int = 500) -> int:
+        """
+        評価テーブルから集計値を再計算し、ずれているプロンプトを修正する
+        IDのキーセットでバッチごとに処理・コミットする
+
+        Returns:
+            int: 修正したプロンプト数
+        """
+        repaired = 0
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(
+                    Prompt.id,
+                    Prompt.rating_sum,
+                    Prompt.rating_count,
+                    *[_histogram_column(value) for value in RATING_VALUES]
+                )
+                .where(Prompt.id > last_id)
+                .order_by(Prompt.id)
+                .limit(batch_size)
+                # 集計中に評価が更新されてずれが誤検出されないように行をロックする
+                .with_for_update()
+            )
+            rows = result.all()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+
+            counts: Dict[int, Dict[int, int]] = {}
+            result = await self.db.execute(
+                select(Rating.prompt_id, Rating.value, func.count())
+                .where(Rating.prompt_id.in_(ids))
+                .group_by(Rating.prompt_id, Rating.value)
+            )
+            for prompt_id, value, count in result.all():
+                counts.setdefault(prompt_id, {})[value] = count
+
+            for row in rows:
+                histogram = counts.get(row[0], {})
+                expected = self._aggregates(histogram)
+                actual = [row[1] or 0, row[2] or 0, *[count or 0 for count in row[3:]]]
+                if actual != expected:
+                    await self._overwrite(row[0], histogram)
+                    repaired += 1
+            await self.db.commit()
+            last_id = ids[-1]
+
+        logger.info(f"Rating aggregates reconciled ({repaired} prompts repaired)")
+        return repaired
+
+    @staticmethod
+    def _aggregates(histogram: Dict[int, int]) -> List[int]:
+        total = sum(value * count for value, count in histogram.items())
+        count = sum(histogram.values())
+        return [total, count, *[histogram.get(value, 0) for value in RATING_VALUES]]
+
+    async def _overwrite(self, prompt_id: int, histogram: Dict[int, int]) -> None:
+        total, count, *_ = self._aggregates(histogram)
+        values = {
+            "rating_sum": total,
+            "rating_count": count,
+            "average_rating": total / count if count else 0.0,
+        }
+        for value in RATING_VALUES:
+            values[f"rating_count_{value}"] = histogram.get(value, 0)
+        values["updated_at"] = Prompt.updated_at
+        await self.db.execute(
+            update(Prompt)
+            .where(Prompt.id == prompt_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+async def reconcile_ratings() -> int:
+    """評価の集計値を修正する（コマンドライン・定期実行から使用）"""
+    from app.core.database import get_db_context
+
+    async with get_db_context() as db:
+        return await RatingService(db).reconcile()
+
+if __name__ == "__main__":
+    # 使用例: python -m app.services.rating_service reconcile
+    if len(sys.argv) != 2 or sys.argv[1] != "reconcile":
+        print("Usage: python -m app.services.rating_service reconcile")
+        sys.exit(1)
+    print(f"Repaired rating aggregates for {asyncio.run(reconcile_ratings())} prompts")
@@ -0,0 +1,581 @@
+import asyncio
+import math
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.prompt import Prompt
+from app.utils.logger import get_logger
+from app.utils.search_utils import analyze, analyze_query_variants
+
+logger = get_logger(__name__)
+
+# フィールドごとの重み（タイトルやタグでの一致を本文より高く評価する）
+FIELD_WEIGHTS: Dict[str, float] = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 1.5,
+    "content": 1.0,
+}
+
+@dataclass
+class SearchDocument:
+    """インデックスに登録する検索用ドキュメント"""
+    id: int
+    fields: Dict[str, str]
+    language: Optional[str] = None
+
+@dataclass
+class SearchHit:
+    """検索結果の1件"""
+    id: int
+    score: float
+
+@dataclass
+class SearchPage:
+    """検索結果の1ページ分"""
+    hits: List[SearchHit] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+class InvertedIndex:
+    """
+    プロセス内で保持する転置インデックス
+    フィールド重み付きの語頻度を保持し、BM25でスコアリングする
+    ドキュメントはそれぞれの言語のアナライザで解析される
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, default_language: str = "en"):
+        self.k1 = k1
+        self.b = b
+        self.default_language = default_language
+        # term -> {doc_id: 重み付き語頻度}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        # doc_id -> {term: 重み付き語頻度}（更新・削除用）
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._doc_terms
+
+    def add(self, document: SearchDocument) -> None:
+        """ドキュメントを追加する（既に存在する場合は置き換える）"""
+        self.remove(document.id)
+
+        term_freqs: Dict[str, float] = {}
+        for field_name, text in document.fields.items():
+            if not text:
+                continue
+            weight = FIELD_WEIGHTS.get(field_name, 1.0)
+            for term, count in Counter(analyze(text, document.language)).items():
+                term = sys.intern(term)
+                term_freqs[term] = term_freqs.get(term, 0.0) + count * weight
+
+        if not term_freqs:
+            return
+
+        for term, freq in term_freqs.items():
+            self._postings.setdefault(term, {})[document.id] = freq
+        self._doc_terms[document.id] = term_freqs
+        length = sum(term_freqs.values())
+        self._doc_lengths[document.id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: int) -> None:
+        """ドキュメントをインデックスから削除する"""
+        term_freqs = self._doc_terms.pop(doc_id, None)
+        if term_freqs is None:
+            return
+        for term in term_freqs:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0.0)
+
+    def _score(self, terms: List[str]) -> Dict[int, float]:
+        """全ての検索語を含むドキュメントのBM25スコアを求める"""
+        postings_list = []
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                return {}
+            postings_list.append((term, postings))
+
+        # 件数の少ないポスティングから積集合を取る
+        postings_list.sort(key=lambda item: len(item[1]))
+        candidates = set(postings_list[0][1])
+        for _, postings in postings_list[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                return {}
+
+        doc_count = len(self._doc_terms)
+        avg_length = self._total_length / doc_count
+        idfs = {
+            term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in postings_list
+        }
+
+        scores = {}
+        for doc_id in candidates:
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+            score = 0.0
+            for term, postings in postings_list:
+                freq = postings[doc_id]
+                score += idfs[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores[doc_id] = round(score, 6)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        after: Optional[Tuple[float, int]] = None,
+        language: Optional[str] = None
+    ) -> List[SearchHit]:
+        """
+        全ての検索語を含むドキュメントをBM25スコア順に返す
+        言語を判別できないクエリは言語ごとに解析し、いずれかの解析結果の全ての検索語を含むものを返す
+
+        Args:
+            query (str): 検索クエリ
+            limit (int): 取得する最大件数
+            after (Optional[Tuple[float, int]]): 直前のページの最後の (score, id)
+            language (Optional[str]): クエリの言語（省略時は文字種から推定する）
+
+        Returns:
+            List[SearchHit]: スコアの降順、同点の場合はIDの昇順に並んだ検索結果
+        """
+        if not self._doc_terms:
+            return []
+        # 言語が判別できないクエリは言語ごとの候補のいずれかに一致すればよく、最も高いスコアを採用する
+        scores: Dict[int, float] = {}
+        for terms in analyze_query_variants(query, language, self.default_language):
+            for doc_id, score in self._score(terms).items():
+                scores[doc_id] = max(score, scores.get(doc_id, score))
+
+        hits = [SearchHit(id=doc_id, score=score) for doc_id, score in scores.items()]
+        hits.sort(key=lambda hit: (-hit.score, hit.id))
+        if after is not None:
+            after_key = (-after[0], after[1])
+            hits = [hit for hit in hits if (-hit.score, hit.id) > after_key]
+        return hits[:limit]
+
+async def _single_batch(documents: List[SearchDocument]) -> AsyncIterator[List[SearchDocument]]:
+    """ドキュメントのリストを1つのバッチとして返す"""
+    yield documents
+
+class SearchBackend(ABC):
+    """検索バックエンドの共通インターフェース"""
+
+    @abstractmethod
+    async def index(self, document: SearchDocument) -> None:
+        """ドキュメントを登録・更新する"""
+
+    @abstractmethod
+    async def delete(self, doc_id: int) -> None:
+        """ドキュメントを削除する"""
+
+    @abstractmethod
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> SearchPage:
+        """検索を実行する"""
+
+    async def rebuild(self, documents: Iterable[SearchDocument]) -> int:
+        """
+        インデックスを再構築する
+
+        Returns:
+            int: 登録したドキュメント数
+        """
+        return await self.rebuild_batches(_single_batch(list(documents)))
+
+    async def rebuild_batches(self, batches: AsyncIterator[List[SearchDocument]]) -> int:
+        """
+        バッチごとに受け取ったドキュメントでインデックスを再構築する
+        受け取ったバッチはその都度インデックスに反映し、全てのドキュメントを一度に保持しない
+        バックエンドごとに効率的な方法があれば上書きする
+
+        Returns:
+            int: 登録したドキュメント数
+        """
+        count = 0
+        async for documents in batches:
+            for document in documents:
+                await self.index(document)
+            count += len(documents)
+        return count
+
+    async def claim_rebuild(self, interval: float) -> bool:
+        """
+        起動時の再構築をこのワーカーで行うかどうかを判定する
+        ワーカーごとにインデックスを持つバックエンドは常に再構築する
+
+        Args:
+            interval (float): 他のワーカーが再構築を始めてから、再び再構築するまでの最短の間隔（秒）
+        """
+        return True
+
+class InMemorySearchBackend(SearchBackend):
+    """
+    InvertedIndexを使用するプロセス内の検索バックエンド
+    インデックスはワーカー間で共有されないため、単一ワーカーでの運用やテストで使用する
+    """
+
+    def __init__(self):
+        self._index = InvertedIndex(default_language=settings.DEFAULT_LANGUAGE)
+
+    async def index(self, document: SearchDocument) -> None:
+        self._index.add(document)
+
+    async def delete(self, doc_id: int) -> None:
+        self._index.remove(doc_id)
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> SearchPage:
+        after = decode_cursor(cursor, size=2, types=[float, int]) if cursor else None
+        # 次ページの有無を判定するため1件多く取得する
+        hits = self._index.search(query, limit=limit + 1, after=after, language=language)
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_cursor(hits[-1].score, hits[-1].id)
+        return SearchPage(hits=hits, next_cursor=next_cursor)
+
+    async def rebuild_batches(self, batches: AsyncIterator[List[SearchDocument]]) -> int:
+        # 新しいインデックスを構築してから差し替え、再構築中も検索を継続できるようにする
+        new_index = InvertedIndex(
+            k1=self._index.k1, b=self._index.b, default_language=self._index.default_language
+        )
+        async for documents in batches:
+            for document in documents:
+                new_index.add(document)
+        self._index = new_index
+        return len(new_index)
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    SQLite FTS5を使用する検索バックエンド（デフォルト）
+    インデックスをファイルに永続化するため、同一ホストのワーカー間で共有でき、
+    コマンドラインからの再構築結果もそのまま反映される
+    複数のワーカーが同じファイルに書き込むため、WALモードで開き、ロックの解放を待って書き込む
+    """
+
+    # FTS5の列順（bm25の重み指定に使用する）
+    COLUMNS = ("title", "tags", "description", "content")
+
+    def __init__(self, path: Optional[str] = None):
+        self._conn = sqlite3.connect(
+            path or settings.SEARCH_INDEX_PATH,
+            timeout=settings.SEARCH_INDEX_BUSY_TIMEOUT,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(self._create_table_sql("prompt_search"))
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_search_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def _create_table_sql(self, table: str) -> str:
+        return (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+            f"USING fts5({', '.join(self.COLUMNS)}, tokenize='unicode61')"
+        )
+
+    def _insert_sql(self, table: str) -> str:
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        return f"INSERT INTO {table}(rowid, {', '.join(self.COLUMNS)}) VALUES (?, {placeholders})"
+
+    def _analyzed_row(self, document: SearchDocument) -> Tuple:
+        # アナライザを通した結果を空白区切りで保存し、プロセス内バックエンドと同じ語彙にする
+        return tuple(
+            " ".join(analyze(document.fields.get(column, ""), document.language))
+            for column in self.COLUMNS
+        )
+
+    def _write(self, statements: List[Tuple[str, Tuple]]) -> None:
+        with self._lock, self._conn:
+            for sql, params in statements:
+                self._conn.execute(sql, params)
+
+    async def index(self, document: SearchDocument) -> None:
+        await asyncio.to_thread(self._write, [
+            ("DELETE FROM prompt_search WHERE rowid = ?", (document.id,)),
+            (self._insert_sql("prompt_search"), (document.id, *self._analyzed_row(document))),
+        ])
+
+    async def delete(self, doc_id: int) -> None:
+        await asyncio.to_thread(self._write, [("DELETE FROM prompt_search WHERE rowid = ?", (doc_id,))])
+
+    def _search(self, variants: List[List[str]], limit: int, after: Optional[Tuple[float, int]]) -> List[SearchHit]:
+        weights = ", ".join(str(FIELD_WEIGHTS[column]) for column in self.COLUMNS)
+        # 候補ごとに全ての検索語を含む条件を作り、いずれかに一致するものを返す
+        match = " OR ".join(
+            "(" + " ".join('"' + term.replace('"', '""') + '"' for term in terms) + ")"
+            for terms in variants
+        )
+        sql = (
+            "SELECT rowid, score FROM ("
+            f"  SELECT rowid, round(-bm25(prompt_search, {weights}), 6) AS score"
+            "   FROM prompt_search WHERE prompt_search MATCH ?"
+            ")"
+        )
+        params: List = [match]
+        if after is not None:
+            sql += " WHERE score < ? OR (score = ? AND rowid > ?)"
+            params.extend([after[0], after[0], after[1]])
+        sql += " ORDER BY score DESC, rowid LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [SearchHit(id=row[0], score=row[1]) for row in rows]
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> SearchPage:
+        variants = analyze_query_variants(query, language, settings.DEFAULT_LANGUAGE)
+        if not variants:
+            return SearchPage()
+        after = decode_cursor(cursor, size=2, types=[float, int]) if cursor else None
+        hits = await asyncio.to_thread(self._search, variants, limit + 1, after)
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_cursor(hits[-1].score, hits[-1].id)
+        return SearchPage(hits=hits, next_cursor=next_cursor)
+
+    def _swap_rebuilt_table(self) -> None:
+        # 1つのトランザクションで差し替え、他のワーカーから空のインデックスが見えないようにする
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DROP TABLE prompt_search")
+                self._conn.execute("ALTER TABLE prompt_search_rebuild RENAME TO prompt_search")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def rebuild_batches(self, batches: AsyncIterator[List[SearchDocument]]) -> int:
+        # 別のテーブルにバッチごとに書き込んでから差し替え、再構築中も検索を継続できるようにする
+        await asyncio.to_thread(self._write, [
+            ("DROP TABLE IF EXISTS prompt_search_rebuild", ()),
+            (self._create_table_sql("prompt_search_rebuild"), ()),
+        ])
+        insert = self._insert_sql("prompt_search_rebuild")
+        count = 0
+        async for documents in batches:
+            await asyncio.to_thread(self._write, [
+                (insert, (document.id, *self._analyzed_row(document))) for document in documents
+            ])
+            count += len(documents)
+        await asyncio.to_thread(self._swap_rebuilt_table)
+        return count
+
+    def _claim_rebuild(self, interval: float) -> bool:
+        # 書き込みロックを取ってから確認・記録し、同時に起動したワーカーのうち1つだけが再構築する
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM prompt_search_meta WHERE key = 'rebuild_started_at'"
+                ).fetchone()
+                if row is not None and now - float(row[0]) < interval:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO prompt_search_meta (key, value) VALUES ('rebuild_started_at', ?)",
+                    (str(now),)
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def claim_rebuild(self, interval: float) -> bool:
+        # インデックスのファイルはワーカー間で共有するため、ファイルに再構築の開始時刻を記録する
+        return await asyncio.to_thread(self._claim_rebuild, interval)
+
+# バックエンド名 -> ファクトリ（Elasticsearchなどのリモートバックエンドはここに登録する）
+_BACKEND_FACTORIES: Dict[str, Callable[[], SearchBackend]] = {
+    "memory": InMemorySearchBackend,
+    "sqlite": SQLiteFTSSearchBackend,
+}
+
+def register_search_backend(name: str, factory: Callable[[], SearchBackend]) -> None:
+    """検索バックエンドのファクトリを登録する"""
+    _BACKEND_FACTORIES[name] = factory
+    get_search_backend.cache_clear()
+
+@lru_cache()
+def get_search_backend() -> SearchBackend:
+    """
+    設定に応じた検索バックエンドのシングルトンを取得する
+    未登録のバックエンドが指定された場合はプロセス内バックエンドにフォールバックする
+    """
+    name = settings.SEARCH_BACKEND
+    factory = _BACKEND_FACTORIES.get(name)
+    if factory is None:
+        logger.warning(f"Search backend '{name}' is not available, falling back to 'memory'")
+        factory = InMemorySearchBackend
+    return factory()
+
+def _tags_to_text(tags) -> str:
+    """タグ（リストまたはカンマ区切り文字列）を検索用テキストに変換する"""
+    if not tags:
+        return ""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return " ".join(tag.strip() for tag in tags if tag and tag.strip())
+
+def build_search_document(prompt: Prompt) -> SearchDocument:
+    """プロンプトから検索用ドキュメントを生成する"""
+    return SearchDocument(
+        id=prompt.id,
+        fields={
+            "title": prompt.title or "",
+            "content": prompt.content or "",
+            "description": prompt.description or "",
+            "tags": _tags_to_text(prompt.tags),
+        },
+        language=prompt.language,
+    )
+
+class SearchService:
+    """プロンプト検索インデックスの更新と検索を提供するクラス"""
+
+    def __init__(self, db: AsyncSession, backend: Optional[SearchBackend] = None):
+        self.db = db
+        self.backend = backend or get_search_backend()
+
+    async def index_prompt(self, prompt: Prompt) -> None:
+        """
+        プロンプトをインデックスに反映する
+        非公開のプロンプトはインデックスから取り除く
+        """
+        if prompt.is_published:
+            await self.backend.index(build_search_document(prompt))
+        else:
+            await self.backend.delete(prompt.id)
+
+    async def remove_prompt(self, prompt_id: int) -> None:
+        """プロンプトをインデックスから削除する"""
+        await self.backend.delete(prompt_id)
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> SearchPage:
+        """
+        インデックスを検索する
+
+        Args:
+            query (str): 検索クエリ
+            limit (int): 取得する最大件数
+            cursor (Optional[str]): 前のページで返されたカーソル
+            language (Optional[str]): クエリの言語（省略時は文字種から推定する）
+
+        Returns:
+            SearchPage: 検索結果と次ページのカーソル
+        """
+        return await self.backend.search(query, limit=limit, cursor=cursor, language=language)
+
+    async def rebuild_index(self, batch_size: Optional[int] = None) -> int:
+        """
+        公開中の全プロンプトからインデックスを再構築する
+        IDのキーセットでバッチごとに読み込み、読み込んだバッチはその都度インデックスに渡す
+        （テーブル全体のドキュメントを一度にメモリへ載せない）
+
+        Returns:
+            int: インデックスに登録したプロンプト数
+        """
+        count = await self.backend.rebuild_batches(self._published_documents(batch_size))
+        logger.info(f"Search index rebuilt with {count} prompts")
+        return count
+
+    async def _published_documents(self, batch_size: Optional[int] = None) -> AsyncIterator[List[SearchDocument]]:
+        """公開中のプロンプトの検索用ドキュメントをバッチごとに返す"""
+        batch_size = batch_size or settings.SEARCH_REBUILD_BATCH_SIZE
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Prompt)
+                .where(Prompt.is_published == True)
+                .where(Prompt.id > last_id)
+                .order_by(Prompt.id)
+                .limit(batch_size)
+            )
+            prompts = result.scalars().all()
+            if not prompts:
+                return
+            documents = [build_search_document(prompt) for prompt in prompts]
+            last_id = prompts[-1].id
+            # 読み込んだORMオブジェクトを保持し続けないようにする
+            self.db.expunge_all()
+            yield documents
+
+async def rebuild_search_index() -> int:
+    """検索インデックスを再構築する（コマンドラインから使用）"""
+    from app.core.database import get_db_context
+
+    async with get_db_context(read_only=True) as db:
+        return await SearchService(db).rebuild_index()
+
+async def build_search_index_on_startup() -> Optional[int]:
+    """
+    起動時に検索インデックスを構築する
+    ワーカー間で共有するインデックス（sqlite）は、同時に起動したワーカーのうち1つだけが再構築し、
+    SEARCH_REBUILD_INTERVAL 秒以内に他のワーカーが再構築を始めていれば何もしない
+
+    Returns:
+        Optional[int]: インデックスに登録したプロンプト数（再構築しなかった場合はNone）
+    """
+    if not await get_search_backend().claim_rebuild(settings.SEARCH_REBUILD_INTERVAL):
+        logger.info("Search index was rebuilt by another worker, skipping")
+        return None
+    return await rebuild_search_index()
+
+if __name__ == "__main__":
+    # 使用例: python -m app.services.search_service rebuild
+    if len(sys.argv) != 2 or sys.argv[1] != "rebuild":
+        print("Usage: python -m app.services.search_service rebuild")
+        sys.exit(1)
+    print(f"Indexed {asyncio.run(rebuild_search_index())} prompts")
@@ -0,0 +1,274 @@
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+# コンテナあたりの値の範囲（下位16ビット）
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# これを超える要素数のコンテナは配列（集合）からビットマップに切り替える
+ARRAY_LIMIT = 4096
+
+# 配列コンテナ（疎な場合）またはビットマップコンテナ（密な場合）
+Container = Union[Set[int], int]
+
+def _cardinality(container: Container) -> int:
+    return bin(container).count("1") if isinstance(container, int) else len(container)
+
+def _to_bits(values: Set[int]) -> int:
+    bits = 0
+    for value in values:
+        bits |= 1 << value
+    return bits
+
+def _to_array(bits: int) -> Set[int]:
+    values = set()
+    while bits:
+        low = bits & -bits
+        values.add(low.bit_length() - 1)
+        bits ^= low
+    return values
+
+def _clone(container: Container) -> Container:
+    return container if isinstance(container, int) else set(container)
+
+def _optimize(container: Container) -> Optional[Container]:
+    """要素数に応じてコンテナの種類を切り替える（空の場合はNone）"""
+    if isinstance(container, int):
+        if not container:
+            return None
+        return _to_array(container) if _cardinality(container) <= ARRAY_LIMIT else container
+    if not container:
+        return None
+    return _to_bits(container) if len(container) > ARRAY_LIMIT else container
+
+def _and(a: Container, b: Container) -> Container:
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return {value for value in a if b >> value & 1}
+    return a & b
+
+def _or(a: Container, b: Container) -> Container:
+    if isinstance(a, int) or isinstance(b, int):
+        bits_a = a if isinstance(a, int) else _to_bits(a)
+        bits_b = b if isinstance(b, int) else _to_bits(b)
+        return bits_a | bits_b
+    return a | b
+
+class Bitmap:
+    """
+    Roaring Bitmap方式の整数集合
+    値を上位16ビットごとのコンテナに分け、疎なコンテナは集合、
+    密なコンテナは整数のビット列で保持することで、メモリ量と集合演算の速度を両立する
+    """
+
+    __slots__ = ("_containers",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._containers: Dict[int, Container] = {}
+        for value in values:
+            self.add(value)
+
+    @classmethod
+    def _from_containers(cls, containers: Dict[int, Container]) -> "Bitmap":
+        bitmap = cls()
+        for key, container in containers.items():
+            container = _optimize(container)
+            if container is not None:
+                bitmap._containers[key] = container
+        return bitmap
+
+    def add(self, value: int) -> None:
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        container = self._containers.get(key)
+        if container is None:
+            self._containers[key] = {low}
+        elif isinstance(container, int):
+            self._containers[key] = container | (1 << low)
+        else:
+            container.add(low)
+            if len(container) > ARRAY_LIMIT:
+                self._containers[key] = _to_bits(container)
+
+    def discard(self, value: int) -> None:
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        container = self._containers.get(key)
+        if container is None:
+            return
+        if isinstance(container, int):
+            container &= ~(1 << low)
+        else:
+            container.discard(low)
+        container = _optimize(container)
+        if container is None:
+            del self._containers[key]
+        else:
+            self._containers[key] = container
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = value & CHUNK_MASK
+        return bool(container >> low & 1) if isinstance(container, int) else low in container
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self._containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        small, large = sorted((self, other), key=lambda bitmap: len(bitmap._containers))
+        return Bitmap._from_containers({
+            key: _and(container, large._containers[key])
+            for key, container in small._containers.items()
+            if key in large._containers
+        })
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        containers = {key: _clone(container) for key, container in self._containers.items()}
+        for key, container in other._containers.items():
+            containers[key] = _or(containers[key], container) if key in containers else _clone(container)
+        return Bitmap._from_containers(containers)
+
+    def copy(self) -> "Bitmap":
+        return Bitmap._from_containers({
+            key: _clone(container) for key, container in self._containers.items()
+        })
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self._containers):
+            base = key << CHUNK_BITS
+            container = self._containers[key]
+            lows = sorted(_to_array(container) if isinstance(container, int) else container)
+            for low in lows:
+                yield base | low
+
+    def iter_desc(self, below: Optional[int] = None) -> Iterator[int]:
+        """値を降順に返す（belowが指定された場合はそれ未満の値のみ）"""
+        for key in sorted(self._containers, reverse=True):
+            base = key << CHUNK_BITS
+            if below is not None and base >= below:
+                continue
+            container = self._containers[key]
+            if isinstance(container, int):
+                bits = container
+                while bits:
+                    low = bits.bit_length() - 1
+                    bits ^= 1 << low
+                    value = base | low
+                    if below is None or value < below:
+                        yield value
+            else:
+                for low in sorted(container, reverse=True):
+                    value = base | low
+                    if below is None or value < below:
+                        yield value
+
+class TagIndex:
+    """
+    タグ・カテゴリからプロンプトIDへのビットマップインデックス
+    複数タグのAND/OR検索やカテゴリとの組み合わせをメモリ上の集合演算だけで解決する
+    公開中のプロンプトのみを保持する
+    ワーカーごとに保持するため、ワーカー間で共有するバージョンのどこまでを反映しているかを version に持つ
+    """
+
+    def __init__(self):
+        self._tags: Dict[str, Bitmap] = {}
+        self._categories: Dict[str, Bitmap] = {}
+        # prompt_id -> (タグ, カテゴリ)（更新・削除用）
+        self._prompts: Dict[int, Tuple[Tuple[str, ...], Optional[str]]] = {}
+        # 反映済みの共有のバージョン（未構築の場合はNone）と、最後にDBから構築した時刻
+        self.version: Optional[int] = None
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def set_prompt(self, prompt_id: int, tags: Iterable[str], category: Optional[str] = None) -> None:
+        """プロンプトのタグとカテゴリを登録する（既に存在する場合は置き換える）"""
+        self.remove_prompt(prompt_id)
+        tags = tuple(dict.fromkeys(tags))
+        for tag in tags:
+            self._tags.setdefault(tag, Bitmap()).add(prompt_id)
+        if category:
+            self._categories.setdefault(category, Bitmap()).add(prompt_id)
+        self._prompts[prompt_id] = (tags, category)
+
+    def swap(self, other: "TagIndex") -> None:
+        """別のインスタンスで構築したインデックスの内容に差し替える"""
+        self._tags, self._categories, self._prompts = other._tags, other._categories, other._prompts
+
+    def remove_prompt(self, prompt_id: int) -> None:
+        """プロンプトをインデックスから削除する"""
+        entry = self._prompts.pop(prompt_id, None)
+        if entry is None:
+            return
+        tags, category = entry
+        for tag in tags:
+            self._discard(self._tags, tag, prompt_id)
+        if category:
+            self._discard(self._categories, category, prompt_id)
+
+    @staticmethod
+    def _discard(bitmaps: Dict[str, Bitmap], key: str, prompt_id: int) -> None:
+        bitmap = bitmaps.get(key)
+        if bitmap is None:
+            return
+        bitmap.discard(prompt_id)
+        if not bitmap:
+            del bitmaps[key]
+
+    def query(
+        self,
+        all_tags: Iterable[str] = (),
+        any_tags: Iterable[str] = (),
+        category: Optional[str] = None
+    ) -> Optional[Bitmap]:
+        """
+        条件に一致するプロンプトIDの集合を返す
+
+        Args:
+            all_tags (Iterable[str]): 全て含むべきタグ
+            any_tags (Iterable[str]): いずれかを含むべきタグ
+            category (Optional[str]): カテゴリ
+
+        Returns:
+            Optional[Bitmap]: 一致するプロンプトIDの集合（条件が指定されていない場合はNone）
+        """
+        conditions: List[Bitmap] = []
+        for tag in dict.fromkeys(all_tags):
+            conditions.append(self._tags.get(tag) or Bitmap())
+        any_tags = list(dict.fromkeys(any_tags))
+        if any_tags:
+            union = Bitmap()
+            for tag in any_tags:
+                if tag in self._tags:
+                    union = union | self._tags[tag]
+            conditions.append(union)
+        if category:
+            conditions.append(self._categories.get(category) or Bitmap())
+
+        if not conditions:
+            return None
+        # 要素数の少ない集合から積集合を取る
+        conditions.sort(key=len)
+        result = conditions[0].copy()
+        for bitmap in conditions[1:]:
+            if not result:
+                break
+            result = result & bitmap
+        return result
+
+    def tag_counts(self, limit: int = 50) -> List[Tuple[str, int]]:
+        """タグごとのプロンプト数を多い順に返す"""
+        counts = [(tag, len(bitmap)) for tag, bitmap in self._tags.items()]
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return counts[:limit]
+
+@lru_cache()
+def get_tag_index() -> TagIndex:
+    """プロセス内のタグインデックスのシングルトンを取得する"""
+    return TagIndex()
@@ -0,0 +1,270 @@
+import asyncio
+import sys
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import and_, delete, exists, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import DEFAULT_CONFIG
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.models.prompt import Prompt
+from app.models.prompt_tag import PromptTag
+from app.models.tag import Tag
+from app.services.tag_index import TagIndex, get_tag_index
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# タグインデックスの変更を他のワーカーに知らせる共有のバージョンの名前
+TAG_INDEX_VERSION = "tag_index"
+
+# 同じワーカー内で同時に再構築しないためのロック
+_refresh_lock = asyncio.Lock()
+
+def normalize_tags(tags: Union[str, Iterable[str], None]) -> List[str]:
+    """
+    タグを正規化する
+    カンマ区切りの文字列とリストの両方を受け付け、NFKC正規化・小文字化・重複除去を行う
+
+    Args:
+        tags: タグのリストまたはカンマ区切りの文字列
+
+    Returns:
+        List[str]: 正規化されたタグのリスト（入力順を維持）
+    """
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    normalized = []
+    for tag in tags:
+        name = unicodedata.normalize("NFKC", tag or "").strip().lower()
+        if name:
+            normalized.append(name[:DEFAULT_CONFIG["MAX_TAG_LENGTH"]])
+    return list(dict.fromkeys(normalized))[:DEFAULT_CONFIG["MAX_TAGS_PER_PROMPT"]]
+
+class TagService:
+    """
+    正規化されたタグ（tags / prompt_tags テーブル）とタグインデックスを管理するクラス
+
+    カンマ区切りの Prompt.tags からの移行手順:
+      1. このバージョンをデプロイする（Prompt.tags とタグテーブルの両方に書き込む。
+         TAG_INDEX_SOURCE=csv の間はインデックスを Prompt.tags から構築する）
+      2. `python -m app.services.tag_service backfill` で既存データをタグテーブルに移す
+      3. TAG_INDEX_SOURCE=table に切り替えて再起動する
+      4. 読み込みがなくなった後で Prompt.tags カラムを削除する
+
+    タグインデックスはワーカーごとに保持する。変更したワーカーは共有のバージョンを進め、
+    他のワーカーは参照時にバージョンの違いを検出してDBから再構築する（refresh_index）
+    """
+
+    def __init__(self, db: AsyncSession, index: Optional[TagIndex] = None):
+        self.db = db
+        self.index = index or get_tag_index()
+
+    async def _get_or_create_tag_ids(self, names: List[str]) -> Dict[str, int]:
+        """タグ名からIDを取得し、存在しないタグは作成する"""
+        if not names:
+            return {}
+        result = await self.db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names)))
+        tag_ids = dict(result.all())
+        for name in names:
+            if name in tag_ids:
+                continue
+            try:
+                async with self.db.begin_nested():
+                    tag = Tag(name=name)
+                    self.db.add(tag)
+                tag_ids[name] = tag.id
+            except IntegrityError:
+                # 同時に別のリクエストが作成した場合
+                result = await self.db.execute(select(Tag.id).where(Tag.name == name))
+                tag_ids[name] = result.scalar_one()
+        return tag_ids
+
+    async def set_prompt_tags(self, prompt: Prompt, tags: Union[str, Iterable[str], None]) -> List[str]:
+        """
+        プロンプトのタグを設定する
+        移行期間中は Prompt.tags（カンマ区切り）とタグテーブルの両方に書き込む
+        コミットは呼び出し側で行う
+
+        Returns:
+            List[str]: 正規化されたタグのリスト
+        """
+        names = normalize_tags(tags)
+        prompt.tags = ",".join(names)
+
+        tag_ids = await self._get_or_create_tag_ids(names)
+        await self.db.execute(
+            delete(PromptTag)
+            .where(PromptTag.prompt_id == prompt.id)
+            .where(PromptTag.tag_id.notin_(list(tag_ids.values())))
+        )
+        result = await self.db.execute(
+            select(PromptTag.tag_id).where(PromptTag.prompt_id == prompt.id)
+        )
+        existing = set(result.scalars().all())
+        for tag_id in tag_ids.values():
+            if tag_id not in existing:
+                self.db.add(PromptTag(prompt_id=prompt.id, tag_id=tag_id))
+        await self.db.flush()
+        return names
+
+    async def index_prompt(self, prompt: Prompt) -> None:
+        """プロンプトをタグインデックスに反映する（非公開のプロンプトは取り除く）"""
+        if prompt.is_published:
+            self.index.set_prompt(prompt.id, normalize_tags(prompt.tags), prompt.category)
+        else:
+            self.index.remove_prompt(prompt.id)
+        await self._publish_change()
+
+    async def remove_prompt(self, prompt_id: int) -> None:
+        """プロンプトをタグインデックスから削除する"""
+        self.index.remove_prompt(prompt_id)
+        await self._publish_change()
+
+    async def _publish_change(self) -> None:
+        """インデックスの変更を他のワーカーに知らせる（共有のバージョンを進める）"""
+        previous = self.index.version
+        version = await get_cache().bump_version(TAG_INDEX_VERSION)
+        # 他のワーカーの変更を取り込み済みの場合だけバージョンを進める
+        # （取り込んでいない場合は古いバージョンのままにし、次の参照時に再構築させる）
+        if version is not None and previous is not None and version == previous + 1:
+            self.index.version = version
+
+    async def refresh_index(self) -> Optional[int]:
+        """
+        他のワーカーがタグインデックスを変更していれば、DBから再構築する
+        再構築は TAG_INDEX_REFRESH_INTERVAL 秒に1回までとし、それまでは反映済みのインデックスを使う
+
+        Returns:
+            Optional[int]: インデックスが反映している共有のバージョン（一覧のキャッシュのキーに含める）
+        """
+        version = await get_cache().get_version(TAG_INDEX_VERSION)
+        if version is None or version == self.index.version:
+            return self.index.version
+        async with _refresh_lock:
+            refreshed_at = self.index.refreshed_at
+            if self.index.version != version and (
+                refreshed_at is None or time.monotonic() - refreshed_at >= settings.TAG_INDEX_REFRESH_INTERVAL
+            ):
+                await self.rebuild_index()
+        return self.index.version
+
+    def tag_filter_clause(self, tags: List[str], mode: str = "all"):
+        """
+        タグで絞り込むためのSQL条件を返す（タグインデックスを使えない場合に使用する）
+        TAG_INDEX_SOURCE=csv の間は移行前のカンマ区切りカラムを使用する
+        """
+        if settings.TAG_INDEX_SOURCE != "table":
+            # 完全一致にするため前後にカンマを付けて比較する（タグの _ や % はワイルドカードとして扱わない）
+            padded = literal(",") + Prompt.tags + ","
+            clauses = [padded.contains(f",{tag},", autoescape=True) for tag in tags]
+        else:
+            clauses = [
+                exists()
+                .where(PromptTag.prompt_id == Prompt.id)
+                .where(PromptTag.tag_id == Tag.id)
+                .where(Tag.name == tag)
+                for tag in tags
+            ]
+        return or_(*clauses) if mode == "any" else and_(*clauses)
+
+    async def rebuild_index(self, batch_size: Optional[int] = None) -> int:
+        """
+        公開中のプロンプトからタグインデックスを再構築する
+        新しいインデックスを構築してから差し替えるため、再構築中も検索を継続できる
+        構築を始める前の共有のバージョンを記録し、構築中の変更は次の refresh_index で取り込む
+
+        Returns:
+            int: インデックスに登録したプロンプト数
+        """
+        batch_size = batch_size or settings.SEARCH_REBUILD_BATCH_SIZE
+        version = await get_cache().get_version(TAG_INDEX_VERSION)
+        new_index = TagIndex()
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Prompt.id, Prompt.tags, Prompt.category)
+                .where(Prompt.is_published == True)
+                .where(Prompt.id > last_id)
+                .order_by(Prompt.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            if settings.TAG_INDEX_SOURCE == "table":
+                ids = [row.id for row in rows]
+                tag_result = await self.db.execute(
+                    select(PromptTag.prompt_id, Tag.name)
+                    .join(Tag, Tag.id == PromptTag.tag_id)
+                    .where(PromptTag.prompt_id.in_(ids))
+                )
+                tags_by_prompt: Dict[int, List[str]] = {}
+                for prompt_id, name in tag_result.all():
+                    tags_by_prompt.setdefault(prompt_id, []).append(name)
+                for row in rows:
+                    new_index.set_prompt(row.id, tags_by_prompt.get(row.id, []), row.category)
+            else:
+                for row in rows:
+                    new_index.set_prompt(row.id, normalize_tags(row.tags), row.category)
+            last_id = rows[-1].id
+
+        self.index.swap(new_index)
+        self.index.version = version
+        self.index.refreshed_at = time.monotonic()
+        logger.info(f"Tag index rebuilt with {len(new_index)} prompts")
+        return len(new_index)
+
+    async def backfill_from_csv(self, batch_size: int = 500) -> int:
+        """
+        Prompt.tags（カンマ区切り）の内容をタグテーブルに移す
+        IDのキーセットでバッチごとに処理・コミットし、長時間のロックを避ける
+        何度実行しても同じ結果になる
+
+        Returns:
+            int: 処理したプロンプト数
+        """
+        processed = 0
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Prompt).where(Prompt.id > last_id).order_by(Prompt.id).limit(batch_size)
+            )
+            prompts = result.scalars().all()
+            if not prompts:
+                break
+            for prompt in prompts:
+                await self.set_prompt_tags(prompt, prompt.tags)
+            await self.db.commit()
+            processed += len(prompts)
+            last_id = prompts[-1].id
+            self.db.expunge_all()
+            logger.info(f"Backfilled tags for {processed} prompts (last id: {last_id})")
+        return processed
+
+async def rebuild_tag_index() -> int:
+    """タグインデックスを再構築する（起動時に使用）"""
+    from app.core.database import get_db_context
+
+    async with get_db_context(read_only=True) as db:
+        return await TagService(db).rebuild_index()
+
+async def backfill_tags() -> int:
+    """カンマ区切りのタグをタグテーブルに移す（コマンドラインから使用）"""
+    from app.core.database import get_db_context
+
+    async with get_db_context() as db:
+        return await TagService(db).backfill_from_csv()
+
+if __name__ == "__main__":
+    # 使用例: python -m app.services.tag_service backfill
+    if len(sys.argv) != 2 or sys.argv[1] != "backfill":
+        print("Usage: python -m app.services.tag_service backfill")
+        sys.exit(1)
+    print(f"Backfilled tags for {asyncio.run(backfill_tags())} prompts")
@@ -0,0 +1,518 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import insort
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.prompt import Prompt
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# イベント種別ごとの重み
+EVENT_WEIGHTS: Dict[str, float] = {
+    "view": 0.1,
+    "like": 3.0,
+    "comment": 2.0,
+    "share": 4.0,
+}
+
+# ウィンドウごとの減衰の時定数（秒）。この時間が経過するとスコアは 1/e になる
+TRENDING_WINDOWS: Dict[str, int] = {
+    "1h": 60 * 60,
+    "24h": 24 * 60 * 60,
+    "7d": 7 * 24 * 60 * 60,
+}
+
+# 基準時刻からの経過がこの倍数（時定数比）を超えたらスコアを基準時刻に合わせて縮める
+REBASE_THRESHOLD = 50.0
+# これ未満まで減衰したスコアはリベース時に破棄する
+MIN_SCORE = 1e-3
+
+def _to_timestamp(value: datetime) -> float:
+    """UTCのnaiveなdatetimeをUNIX時間に変換する"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+class DecayedRanking:
+    """
+    時間減衰スコアのランキング（1つのウィンドウ分）
+
+    スコアを基準時刻からの「前方減衰」値 w * exp((t - t0) / tau) で保持する。
+    全プロンプトに共通の係数 exp(-(now - t0) / tau) を掛ければ現在のスコアになるため、
+    イベント到着時に1件を加算するだけでよく、時間経過による全件の再計算は不要になる。
+    上位 capacity 件は常にソート済みのリストで保持し、読み込みは O(N) で済む
+    """
+
+    def __init__(self, tau: float, capacity: int, now: Optional[float] = None):
+        self.tau = tau
+        self.capacity = capacity
+        self.t0 = time.time() if now is None else now
+        self._scores: Dict[int, float] = {}
+        # (-score, prompt_id) の昇順（スコアの降順）
+        self._top: List[Tuple[float, int]] = []
+        self._top_ids: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def add(self, prompt_id: int, weight: float, now: Optional[float] = None) -> None:
+        """イベントのスコアを加算する（weightが負の場合は減算）"""
+        now = time.time() if now is None else now
+        if (now - self.t0) / self.tau > REBASE_THRESHOLD:
+            self._rebase(now)
+        score = self._scores.get(prompt_id, 0.0) + weight * math.exp((now - self.t0) / self.tau)
+        if score <= 0:
+            self.remove(prompt_id)
+            return
+        self._scores[prompt_id] = score
+        self._update_top(prompt_id, score)
+
+    def remove(self, prompt_id: int) -> None:
+        """プロンプトをランキングから削除する"""
+        self._scores.pop(prompt_id, None)
+        if prompt_id in self._top_ids:
+            self._rebuild_top()
+
+    def top(self, limit: int, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """上位のプロンプトIDと現在時刻での減衰後のスコアを返す"""
+        now = time.time() if now is None else now
+        factor = math.exp(-(now - self.t0) / self.tau)
+        return [(prompt_id, -neg_score * factor) for neg_score, prompt_id in self._top[:limit]]
+
+    def _update_top(self, prompt_id: int, score: float) -> None:
+        previous = self._top_ids.get(prompt_id)
+        if previous is not None:
+            if score < previous:
+                # 順位が下がる場合は上位外のプロンプトに抜かれる可能性があるため作り直す
+                self._rebuild_top()
+                return
+            self._top.remove((-previous, prompt_id))
+        elif len(self._top) >= self.capacity:
+            if score <= -self._top[-1][0]:
+                return
+            _, evicted = self._top.pop()
+            del self._top_ids[evicted]
+        insort(self._top, (-score, prompt_id))
+        self._top_ids[prompt_id] = score
+
+    def _rebuild_top(self) -> None:
+        top = sorted((-score, prompt_id) for prompt_id, score in self._scores.items())
+        self._top = top[:self.capacity]
+        self._top_ids = {prompt_id: -neg_score for neg_score, prompt_id in self._top}
+
+    def _rebase(self, now: float) -> None:
+        """基準時刻を進めてスコアを縮め、十分に減衰したプロンプトを破棄する"""
+        factor = math.exp(-(now - self.t0) / self.tau)
+        self._scores = {
+            prompt_id: score * factor
+            for prompt_id, score in self._scores.items()
+            if score * factor >= MIN_SCORE
+        }
+        self.t0 = now
+        self._rebuild_top()
+
+class TrendingEngine:
+    """
+    いいね・閲覧・コメント・共有のイベントからトレンドのランキングを管理するクラス
+    ウィンドウ（1h/24h/7d）ごとに時間減衰スコアのランキングを保持する
+    """
+
+    def __init__(self, capacity: Optional[int] = None, now: Optional[float] = None):
+        capacity = capacity or settings.TRENDING_CAPACITY
+        self.rankings: Dict[str, DecayedRanking] = {
+            window: DecayedRanking(tau, capacity, now)
+            for window, tau in TRENDING_WINDOWS.items()
+        }
+
+    def record(self, prompt_id: int, event: str, count: int = 1, now: Optional[float] = None) -> None:
+        """
+        イベントを記録する
+
+        Args:
+            prompt_id (int): プロンプトID
+            event (str): イベント種別（view / like / comment / share）
+            count (int): 件数（いいねの取り消しなどは負の値）
+            now (Optional[float]): イベントの発生時刻（UNIX時間）
+        """
+        weight = EVENT_WEIGHTS.get(event)
+        if weight is None:
+            raise ValueError(f"Unknown trending event: {event}")
+        for ranking in self.rankings.values():
+            ranking.add(prompt_id, weight * count, now)
+
+    def remove_prompt(self, prompt_id: int) -> None:
+        """削除・非公開になったプロンプトをランキングから取り除く"""
+        for ranking in self.rankings.values():
+            ranking.remove(prompt_id)
+
+    def top(self, window: str = "24h", limit: int = 10, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """指定したウィンドウの上位のプロンプトIDとスコアを返す"""
+        ranking = self.rankings.get(window)
+        if ranking is None:
+            raise ValueError(f"Unknown trending window: {window}")
+        return ranking.top(limit, now)
+
+    def swap(self, other: "TrendingEngine") -> None:
+        """別のインスタンスで構築したランキングの内容に差し替える"""
+        self.rankings = other.rankings
+
+    async def ranked(self, window: str = "24h", limit: int = 10) -> List[Tuple[int, float]]:
+        """上位のプロンプトIDとスコアを返す（SharedTrendingEngine と同じインターフェース）"""
+        return self.top(window, limit)
+
+    async def initialize(self, warmed: "TrendingEngine") -> bool:
+        """起動時に構築したランキングで初期化する"""
+        self.swap(warmed)
+        return True
+
+class TrendingStore(ABC):
+    """
+    ワーカー間で共有するトレンドのランキングの保存先
+
+    スコアは DecayedRanking と同じく基準時刻からの前方減衰値で保持する。
+    書き込む増分は、呼び出し側が epoch 時点の重みに換算して渡す
+    """
+
+    @abstractmethod
+    async def add(self, window: str, increments: Dict[int, float], epoch: float) -> None:
+        """epoch 時点の重みに換算した増分を加算する"""
+
+    @abstractmethod
+    async def remove(self, prompt_ids: Iterable[int]) -> None:
+        """プロンプトを全てのウィンドウから取り除く"""
+
+    @abstractmethod
+    async def top(self, window: str, limit: int, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """上位のプロンプトIDと現在時刻での減衰後のスコアを返す"""
+
+    @abstractmethod
+    async def claim_warm_up(self) -> bool:
+        """起動時の初期化を行うワーカーを1つに絞る（初期化済みの場合は False）"""
+
+    async def close(self) -> None:
+        pass
+
+class InMemoryTrendingStore(TrendingStore):
+    """
+    プロセス内の TrendingEngine を使用する保存先（単一ワーカー・テスト用）
+    """
+
+    def __init__(self, engine: Optional[TrendingEngine] = None):
+        self.engine = engine or TrendingEngine()
+        self._warmed = False
+
+    async def add(self, window: str, increments: Dict[int, float], epoch: float) -> None:
+        ranking = self.engine.rankings[window]
+        for prompt_id, increment in increments.items():
+            ranking.add(prompt_id, increment, epoch)
+
+    async def remove(self, prompt_ids: Iterable[int]) -> None:
+        for prompt_id in prompt_ids:
+            self.engine.remove_prompt(prompt_id)
+
+    async def top(self, window: str, limit: int, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        return self.engine.top(window, limit, now)
+
+    async def claim_warm_up(self) -> bool:
+        if self._warmed:
+            return False
+        self._warmed = True
+        return True
+
+# 前方減衰値を加算する。基準時刻から REBASE_THRESHOLD 倍以上経過していれば先に全体を縮める
+# KEYS: ランキングのZSET, 基準時刻 / ARGV: 時定数, epoch, REBASE_THRESHOLD, MIN_SCORE, (ID, 増分)...
+_REDIS_ADD_SCRIPT = """
+local tau = tonumber(ARGV[1])
+local epoch = tonumber(ARGV[2])
+local t0 = tonumber(redis.call('GET', KEYS[2]))
+if not t0 then
+    t0 = epoch
+    redis.call('SET', KEYS[2], ARGV[2])
+end
+if (epoch - t0) / tau > tonumber(ARGV[3]) then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', tostring(math.exp(-(epoch - t0) / tau)))
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[4])
+    t0 = epoch
+    redis.call('SET', KEYS[2], ARGV[2])
+end
+local scale = math.exp((epoch - t0) / tau)
+for i = 5, #ARGV, 2 do
+    local score = tonumber(redis.call('ZINCRBY', KEYS[1], tostring(tonumber(ARGV[i + 1]) * scale), ARGV[i]))
+    if score <= 0 then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+class RedisTrendingStore(TrendingStore):
+    """
+    Redisを使用した保存先
+    ウィンドウごとにZSET（trending:{window}）と基準時刻（trending:{window}:t0）を保持する
+    """
+
+    KEY_PREFIX = "trending"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self._add = self._client.register_script(_REDIS_ADD_SCRIPT)
+
+    def _keys(self, window: str) -> List[str]:
+        key = f"{self.KEY_PREFIX}:{window}"
+        return [key, f"{key}:t0"]
+
+    async def add(self, window: str, increments: Dict[int, float], epoch: float) -> None:
+        args: List[Union[str, float]] = [TRENDING_WINDOWS[window], epoch, REBASE_THRESHOLD, MIN_SCORE]
+        for prompt_id, increment in increments.items():
+            args += [str(prompt_id), repr(increment)]
+        await self._add(keys=self._keys(window), args=args)
+
+    async def remove(self, prompt_ids: Iterable[int]) -> None:
+        members = [str(prompt_id) for prompt_id in prompt_ids]
+        if not members:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for window in TRENDING_WINDOWS:
+                pipe.zrem(self._keys(window)[0], *members)
+            await pipe.execute()
+
+    async def top(self, window: str, limit: int, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        now = time.time() if now is None else now
+        key, t0_key = self._keys(window)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.zrevrange(key, 0, limit - 1, withscores=True)
+            pipe.get(t0_key)
+            entries, t0 = await pipe.execute()
+        if not entries:
+            return []
+        factor = math.exp(-(now - float(t0)) / TRENDING_WINDOWS[window])
+        return [(int(member), score * factor) for member, score in entries]
+
+    async def claim_warm_up(self) -> bool:
+        # ランキングが消えた場合（Redisの再起動など）はこのキーも消えるため、次の起動時に初期化される
+        return bool(await self._client.set(f"{self.KEY_PREFIX}:warmed", "1", nx=True))
+
+    async def close(self) -> None:
+        await self._client.close()
+
+class SharedTrendingEngine:
+    """
+    ワーカー間で共有するランキング（TrendingStore）を使用するトレンドエンジン
+
+    イベントはワーカーごとに epoch 時点の前方減衰値として集約し、
+    TRENDING_FLUSH_INTERVAL 秒ごとにまとめて保存先に加算する。
+    どのワーカーが応答しても同じ順位になり、ワーカーの再起動でランキングが失われない。
+    ランキングへの反映は最大でフラッシュ間隔分だけ遅れる
+    """
+
+    def __init__(self, store: TrendingStore, interval: Optional[float] = None, now: Optional[float] = None):
+        self.store = store
+        self.interval = interval or settings.TRENDING_FLUSH_INTERVAL
+        self._epoch = time.time() if now is None else now
+        self._pending: Dict[str, Dict[int, float]] = {}
+        self._removed: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, prompt_id: int, event: str, count: int = 1, now: Optional[float] = None) -> None:
+        """イベントを記録する（保存先への書き込みは次のフラッシュで行う）"""
+        weight = EVENT_WEIGHTS.get(event)
+        if weight is None:
+            raise ValueError(f"Unknown trending event: {event}")
+        now = time.time() if now is None else now
+        for window, tau in TRENDING_WINDOWS.items():
+            pending = self._pending.setdefault(window, {})
+            pending[prompt_id] = pending.get(prompt_id, 0.0) + weight * count * math.exp((now - self._epoch) / tau)
+
+    def remove_prompt(self, prompt_id: int) -> None:
+        """削除・非公開になったプロンプトをランキングから取り除く（次のフラッシュで反映する）"""
+        for pending in self._pending.values():
+            pending.pop(prompt_id, None)
+        self._removed.add(prompt_id)
+
+    async def flush(self, now: Optional[float] = None) -> int:
+        """
+        集約したイベントを保存先に書き込む
+        失敗した場合はバッファに戻し、次回のフラッシュで再試行する
+
+        Returns:
+            int: 書き込んだプロンプト数（ウィンドウごとに数える）
+        """
+        async with self._lock:
+            if not self._pending and not self._removed:
+                return 0
+            pending, self._pending = self._pending, {}
+            removed, self._removed = self._removed, set()
+            epoch = self._epoch
+            # 経過時間が長くなると前方減衰値が大きくなるため、フラッシュごとに基準時刻を進める
+            self._epoch = time.time() if now is None else now
+            try:
+                if removed:
+                    await self.store.remove(removed)
+                for window, increments in pending.items():
+                    if increments:
+                        await self.store.add(window, increments, epoch)
+            except Exception as e:
+                self._restore(pending, removed, epoch)
+                logger.error(f"Failed to flush trending events: {str(e)}")
+                return 0
+        return sum(len(increments) for increments in pending.values())
+
+    def _restore(self, pending: Dict[str, Dict[int, float]], removed: Set[int], epoch: float) -> None:
+        for window, increments in pending.items():
+            scale = math.exp((epoch - self._epoch) / TRENDING_WINDOWS[window])
+            buffered = self._pending.setdefault(window, {})
+            for prompt_id, increment in increments.items():
+                buffered[prompt_id] = buffered.get(prompt_id, 0.0) + increment * scale
+        self._removed |= removed
+
+    async def ranked(self, window: str = "24h", limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        共有するランキングの上位のプロンプトIDとスコアを返す
+        保存先の障害時は空のランキングとして扱う
+        """
+        if window not in TRENDING_WINDOWS:
+            raise ValueError(f"Unknown trending window: {window}")
+        try:
+            return await self.store.top(window, limit)
+        except Exception as e:
+            logger.error(f"Failed to read trending rankings: {str(e)}")
+            return []
+
+    async def initialize(self, warmed: TrendingEngine, now: Optional[float] = None) -> bool:
+        """
+        起動時に構築したランキングを保存先に書き込む
+        他のワーカーが初期化済みの場合は書き込まない（スコアを二重に加算しないため）
+
+        Returns:
+            bool: 書き込んだ場合は True
+        """
+        if not await self.store.claim_warm_up():
+            return False
+        now = time.time() if now is None else now
+        for window, ranking in warmed.rankings.items():
+            scores = dict(ranking.top(ranking.capacity, now))
+            if scores:
+                await self.store.add(window, scores, now)
+        return True
+
+    def start(self) -> None:
+        """定期的なフラッシュを開始する"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的なフラッシュを停止し、残りのイベントを書き込む"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self.store.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+def _build_trending_store() -> TrendingStore:
+    if settings.TRENDING_BACKEND == "redis" and settings.REDIS_URL:
+        try:
+            return RedisTrendingStore(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis is not installed, trending rankings are kept per worker")
+    return InMemoryTrendingStore()
+
+@lru_cache()
+def get_trending_engine() -> SharedTrendingEngine:
+    """プロセス内のトレンドエンジンのシングルトンを取得する"""
+    return SharedTrendingEngine(_build_trending_store())
+
+def record_event(prompt_id: int, event: str, count: int = 1) -> None:
+    """トレンドのイベントを記録する"""
+    get_trending_engine().record(prompt_id, event, count)
+
+class TrendingService:
+    """
+    トレンドのプロンプトを取得するクラス
+    """
+
+    def __init__(self, db: AsyncSession, engine: Optional[Union[TrendingEngine, SharedTrendingEngine]] = None):
+        self.db = db
+        self.engine = engine or get_trending_engine()
+
+    async def get_trending_prompts(self, window: str = "24h", limit: int = 10) -> List[Prompt]:
+        """
+        トレンドのプロンプトをスコア順に取得する
+        上位のIDはランキングから求め、DBからは該当するプロンプトのみを読み込む
+        非公開・削除済みのプロンプトを除いて limit 件に満たない場合は、続きの順位から補う
+        """
+        prompts: List[Prompt] = []
+        seen = 0
+        fetch = limit * 2
+        while len(prompts) < limit:
+            ranked = [prompt_id for prompt_id, _ in await self.engine.ranked(window, fetch)]
+            ids = ranked[seen:]
+            if not ids:
+                break
+            result = await self.db.execute(
+                select(Prompt).where(Prompt.id.in_(ids)).where(Prompt.is_published == True)
+            )
+            prompts_by_id = {prompt.id: prompt for prompt in result.scalars().all()}
+            prompts.extend(prompts_by_id[i] for i in ids if i in prompts_by_id)
+            if len(ranked) < fetch:
+                break
+            seen = len(ranked)
+            fetch *= 2
+        return prompts[:limit]
+
+    async def warm_up(self) -> int:
+        """
+        直近に作成されたプロンプトの累計値からランキングを初期化する
+        ランキングが空の状態で起動した場合に備えるためのもので、
+        最長のウィンドウより古いプロンプトは読み込まない。
+        共有するランキングを他のワーカーが初期化済みの場合は何もしない
+
+        Returns:
+            int: 読み込んだプロンプト数（初期化しなかった場合は 0）
+        """
+        since = datetime.utcnow() - timedelta(seconds=max(TRENDING_WINDOWS.values()))
+        result = await self.db.execute(
+            select(Prompt.id, Prompt.created_at, Prompt.like_count, Prompt.view_count)
+            .where(Prompt.is_published == True)
+            .where(Prompt.created_at >= since)
+        )
+        rows = result.all()
+        # 作成時刻から古い順に加算する（基準時刻のリベースが時刻順に進むように）
+        rows.sort(key=lambda row: row.created_at)
+        new_engine = TrendingEngine(now=_to_timestamp(since))
+        for row in rows:
+            created_at = _to_timestamp(row.created_at)
+            if row.like_count:
+                new_engine.record(row.id, "like", row.like_count, now=created_at)
+            if row.view_count:
+                new_engine.record(row.id, "view", row.view_count, now=created_at)
+        if not await self.engine.initialize(new_engine):
+            logger.info("Trending rankings are already initialized by another worker")
+            return 0
+        logger.info(f"Trending rankings warmed up with {len(rows)} prompts")
+        return len(rows)
+
+async def warm_up_trending() -> int:
+    """トレンドのランキングを初期化する（起動時に使用）"""
+    from app.core.database import get_db_context
+
+    async with get_db_context(read_only=True) as db:
+        return await TrendingService(db).warm_up()
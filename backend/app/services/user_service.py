@@ -0,0 +1,40 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from app.core.cache import cached
+from app.core.pagination import apply_keyset, created_at_key, keyset_page
+
+class UserService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @cached("user", key=lambda self, user_id: user_id)
+    async def get_user_data(self, user_id: int) -> Optional[Dict]:
+        """
+        ユーザー情報を辞書で取得する（キャッシュ付き）
+        更新・削除時は app.core.cache.invalidate("user", user_id) で無効化する
+        """
+        result = await self.db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        return user.to_dict() if user else None
+
+    async def get_users(
+        self,
+        limit: int = 100,
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[str]]:
+        """
+        ユーザーの一覧を新しい順に取得する
+        (created_at, id) のキーセットでページングし、次ページ取得用のカーソルを返す
+        """
+        query = select(User)
+        if search:
+            query = query.where(or_(
+                User.username.ilike(f"%{search}%"),
+                User.email.ilike(f"%{search}%")
+            ))
+        query = apply_keyset(query, [User.created_at, User.id], cursor, limit)
+        result = await self.db.execute(query)
+        return keyset_page(result.scalars().all(), limit, created_at_key)
@@ -0,0 +1,131 @@
+import asyncio
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import case, update
+
+from app.core.config import settings
+from app.models.prompt import Prompt
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# メトリクス定義
+VIEWS_BUFFERED = Counter('prompt_views_buffered_total', 'Prompt views buffered in memory')
+VIEWS_FLUSHED = Counter('prompt_views_flushed_total', 'Prompt views written to the database')
+VIEWS_PENDING = Gauge('prompt_views_pending', 'Prompt views waiting to be flushed')
+VIEW_FLUSH_FAILURES = Counter('prompt_view_flush_failures_total', 'Failed prompt view flushes')
+
+class ViewCountAggregator:
+    """
+    プロンプトの閲覧数をメモリ上で集約し、まとめてDBに書き込むクラス（write-behind）
+
+    閲覧のたびに行を更新する代わりに、ワーカーごとにプロンプトIDと増分を保持し、
+    一定間隔で `UPDATE prompts SET view_count = view_count + n` をまとめて実行する。
+    DBの値は最大でフラッシュ間隔分だけ遅れる
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self._session_factory = session_factory
+        self.interval = interval or settings.VIEW_COUNT_FLUSH_INTERVAL
+        self.batch_size = batch_size or settings.VIEW_COUNT_FLUSH_BATCH_SIZE
+        self._pending: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> Dict[int, int]:
+        """フラッシュ待ちの閲覧数（プロンプトID -> 増分）"""
+        return dict(self._pending)
+
+    def record(self, prompt_id: int, count: int = 1) -> None:
+        """閲覧を記録する（DBへの書き込みは次のフラッシュで行う）"""
+        self._pending[prompt_id] = self._pending.get(prompt_id, 0) + count
+        VIEWS_BUFFERED.inc(count)
+        VIEWS_PENDING.inc(count)
+
+    async def flush(self) -> int:
+        """
+        集約した閲覧数をDBに書き込む
+        失敗した場合は増分をバッファに戻し、次回のフラッシュで再試行する
+
+        Returns:
+            int: 書き込んだ閲覧数
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                await self._write(pending)
+            except Exception as e:
+                for prompt_id, count in pending.items():
+                    self._pending[prompt_id] = self._pending.get(prompt_id, 0) + count
+                VIEW_FLUSH_FAILURES.inc()
+                logger.error(f"Failed to flush view counts: {str(e)}")
+                return 0
+
+        flushed = sum(pending.values())
+        VIEWS_FLUSHED.inc(flushed)
+        VIEWS_PENDING.dec(flushed)
+        return flushed
+
+    async def _write(self, pending: Dict[int, int]) -> None:
+        # ID順に処理し、ワーカー間での行ロックの取得順を揃える
+        prompt_ids = iter(sorted(pending))
+        session_factory = self._session_factory or _default_session_factory()
+        async with session_factory() as db:
+            while True:
+                batch = list(islice(prompt_ids, self.batch_size))
+                if not batch:
+                    break
+                increments = {prompt_id: pending[prompt_id] for prompt_id in batch}
+                # 閲覧数の更新で updated_at（プロンプトの編集日時）が変わらないようにする
+                await db.execute(
+                    update(Prompt)
+                    .where(Prompt.id.in_(batch))
+                    .values(
+                        view_count=Prompt.view_count + case(increments, value=Prompt.id, else_=0),
+                        updated_at=Prompt.updated_at
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+    def start(self) -> None:
+        """定期的なフラッシュを開始する"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期的なフラッシュを停止し、残りの閲覧数を書き込む"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+def _default_session_factory() -> Callable:
+    from app.core.database import get_db_context
+
+    return get_db_context
+
+@lru_cache()
+def get_view_counter() -> ViewCountAggregator:
+    """プロセス内の閲覧数集約のシングルトンを取得する"""
+    return ViewCountAggregator()
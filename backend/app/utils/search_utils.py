@@ -0,0 +1,236 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence
+
+# 日本語（ひらがな・カタカナ・漢字）および韓国語の文字の連続
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_CJK_RUN_PATTERN = re.compile(f"[{_CJK_CHARS}]+")
+# CJK文字の連続、またはそれ以外の英数字の連続を1つのまとまりとして取り出す
+_RUN_PATTERN = re.compile(f"([{_CJK_CHARS}]+)|((?:(?![{_CJK_CHARS}])\\w)+)", re.UNICODE)
+
+# 言語ごとのストップワード
+STOP_WORDS: Dict[str, FrozenSet[str]] = {
+    "en": frozenset("""
+        a an and are as at be but by for from has have how i if in into is it its
+        of on or so than that the their then there these this to was were what
+        when which who will with you your
+    """.split()),
+    "es": frozenset("""
+        a al como con de del el en es esta este la las lo los mas o para pero por
+        que se sin su sus un una uno unos y
+    """.split()),
+    "fr": frozenset("""
+        a au aux avec ce ces dans de des du elle en est et il ils je la le les leur
+        mais ne nous on ou par pas pour qu que qui sa se ses son sur un une vous
+    """.split()),
+}
+
+def normalize_search_query(query: str) -> str:
+    """
+    検索クエリを正規化する
+    全角・半角の揺れをNFKCで吸収し、小文字化と空白の整理を行う
+
+    Args:
+        query (str): 元の検索クエリ
+
+    Returns:
+        str: 正規化された検索クエリ
+    """
+    if not query:
+        return ""
+    normalized = unicodedata.normalize("NFKC", query).lower()
+    return " ".join(normalized.split())
+
+def contains_cjk(text: str) -> bool:
+    """テキストにCJK文字が含まれるかどうかを判定する"""
+    return bool(_CJK_RUN_PATTERN.search(text or ""))
+
+def strip_accents(word: str) -> str:
+    """アクセント記号を取り除く（é -> e など）"""
+    decomposed = unicodedata.normalize("NFD", word)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def stem_english(word: str) -> str:
+    """英語の軽量ステミング（複数形・進行形・過去形の語尾を取り除く）"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if len(stem) >= 3 and re.search("[aeiouy]", stem):
+                # running -> run のように重なった子音を1つにする
+                if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                    stem = stem[:-1]
+                return stem
+    return word
+
+def stem_spanish(word: str) -> str:
+    """スペイン語の軽量ステミング（主に複数形を単数形に揃える）"""
+    word = strip_accents(word)
+    if len(word) <= 4:
+        return word
+    if word.endswith("ces"):
+        return word[:-3] + "z"
+    if word.endswith("es") and word[-3] not in "aeiou":
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+def stem_french(word: str) -> str:
+    """フランス語の軽量ステミング（主に複数形を単数形に揃える）"""
+    word = strip_accents(word)
+    if len(word) <= 4:
+        return word
+    if word.endswith("aux"):
+        return word[:-3] + "al"
+    if word.endswith(("s", "x")):
+        word = word[:-1]
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+class Analyzer:
+    """
+    検索用のテキスト解析パイプライン
+    CJK文字の連続はN-gram（既定はバイグラムとトライグラム）に分割し、
+    それ以外の単語はストップワード除去とステミングを行う
+    インデックス作成時と検索時で同じ設定のアナライザを使用すること
+    """
+
+    def __init__(
+        self,
+        stop_words: FrozenSet[str] = frozenset(),
+        stemmer: Optional[Callable[[str], str]] = None,
+        ngram_sizes: Sequence[int] = (2, 3)
+    ):
+        self.stop_words = stop_words
+        self.stemmer = stemmer
+        self.ngram_sizes = tuple(sorted(ngram_sizes))
+
+    def _analyze_word(self, word: str) -> Optional[str]:
+        if word in self.stop_words:
+            return None
+        return self.stemmer(word) if self.stemmer else word
+
+    def analyze(self, text: str) -> List[str]:
+        """
+        インデックス用にテキストをトークン列に変換する
+        CJK文字の連続からは設定された全てのサイズのN-gramを生成する
+        最小のサイズより短い連続（1文字の漢字など）はそのまま1つのトークンにする
+
+        Args:
+            text (str): 解析するテキスト
+
+        Returns:
+            List[str]: トークンのリスト
+        """
+        tokens: List[str] = []
+        for cjk_run, word in _RUN_PATTERN.findall(normalize_search_query(text)):
+            if cjk_run:
+                if len(cjk_run) < self.ngram_sizes[0]:
+                    tokens.append(cjk_run)
+                    continue
+                for n in self.ngram_sizes:
+                    tokens.extend(cjk_run[i:i + n] for i in range(len(cjk_run) - n + 1))
+            else:
+                term = self._analyze_word(word)
+                if term:
+                    tokens.append(term)
+        return tokens
+
+    def analyze_query(self, query: str) -> List[str]:
+        """
+        検索クエリをトークン列に変換する
+        CJK文字の連続は可能な限り長いN-gramのみを使用し、
+        全てのN-gramを含むドキュメントに絞り込むことで部分一致検索を実現する
+        最小のサイズより短い連続はそのまま使用するため、同じく短い連続として現れる箇所にのみ一致する
+
+        Args:
+            query (str): 検索クエリ
+
+        Returns:
+            List[str]: 重複を除いたトークンのリスト
+        """
+        tokens: List[str] = []
+        for cjk_run, word in _RUN_PATTERN.findall(normalize_search_query(query)):
+            if cjk_run:
+                sizes = [size for size in self.ngram_sizes if size <= len(cjk_run)]
+                n = max(sizes) if sizes else len(cjk_run)
+                tokens.extend(cjk_run[i:i + n] for i in range(len(cjk_run) - n + 1))
+            else:
+                term = self._analyze_word(word)
+                if term:
+                    tokens.append(term)
+        return list(dict.fromkeys(tokens))
+
+# 言語コード -> アナライザの生成関数
+# 日本語のプロンプトに含まれる英単語は英語として扱う
+_ANALYZER_FACTORIES: Dict[str, Callable[[], Analyzer]] = {
+    "en": lambda: Analyzer(STOP_WORDS["en"], stem_english),
+    "ja": lambda: Analyzer(STOP_WORDS["en"], stem_english),
+    "es": lambda: Analyzer(STOP_WORDS["es"], stem_spanish),
+    "fr": lambda: Analyzer(STOP_WORDS["fr"], stem_french),
+}
+
+@lru_cache()
+def get_analyzer(language: Optional[str] = None) -> Analyzer:
+    """
+    言語コードに対応するアナライザを取得する
+    未対応の言語の場合はステミングを行わない汎用アナライザを返す
+    """
+    factory = _ANALYZER_FACTORIES.get((language or "").lower())
+    return factory() if factory else Analyzer()
+
+def detect_query_language(query: str, default_language: str = "en") -> str:
+    """
+    言語が指定されていない検索クエリの言語を推定する
+    CJK文字を含む場合は日本語、それ以外は既定の言語とみなす
+    """
+    return "ja" if contains_cjk(query) else default_language
+
+def analyze(text: str, language: Optional[str] = None) -> List[str]:
+    """指定された言語のアナライザでインデックス用のトークン列を生成する"""
+    return get_analyzer(language).analyze(text)
+
+def analyze_query(query: str, language: Optional[str] = None, default_language: str = "en") -> List[str]:
+    """
+    検索クエリを解析する
+    言語が指定されていない場合はクエリの文字種から推定する
+    """
+    language = language or detect_query_language(query, default_language)
+    return get_analyzer(language).analyze_query(query)
+
+def analyze_query_variants(
+    query: str,
+    language: Optional[str] = None,
+    default_language: str = "en"
+) -> List[List[str]]:
+    """
+    検索クエリを、一致させる候補ごとのトークン列に解析する
+    言語が指定されている場合とCJK文字を含む場合は、その言語のトークン列のみを返す
+    それ以外は言語を判別できないため、既定の言語を先頭に全ての言語のアナライザで解析する
+    （スペイン語・フランス語のドキュメントはアクセント記号の除去とステミングをしてインデックスされるため、
+    既定の言語のアナライザだけでは "canción" などが自身のドキュメントに一致しない）
+    検索時はいずれかの候補の全てのトークンを含むドキュメントを一致とみなす
+
+    Returns:
+        List[List[str]]: 重複と空のものを除いたトークン列のリスト
+    """
+    if language or contains_cjk(query):
+        languages = [language or detect_query_language(query, default_language)]
+    else:
+        languages = [default_language] + [code for code in _ANALYZER_FACTORIES if code != default_language]
+    variants: List[List[str]] = []
+    for code in languages:
+        terms = get_analyzer(code).analyze_query(query)
+        if terms and terms not in variants:
+            variants.append(terms)
+    return variants
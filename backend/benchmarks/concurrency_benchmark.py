@@ -0,0 +1,146 @@
+"""
+1ワーカーあたりのスループットのベンチマーク（同期の Session と AsyncSession のリポジトリの比較）
+
+async のルートから同期の Session を呼び出していた従来の経路と、リポジトリ（AsyncSession）の経路で、
+同時に届いたリクエストを1つのイベントループ（uvicorn の1ワーカー相当）で処理したときの
+スループットを比較する。
+
+DBにはSQLiteのファイルを使用し、文の実行ごとにDBの応答時間（--latency-ms）をトレースコールバックで再現する。
+同期のドライバ（sqlite3）はイベントループのスレッドで応答を待つため、同時リクエストが1件ずつ処理される。
+aiosqlite は別のスレッドで待つため、待っている間に他のリクエストを処理できる。
+
+使用例（backend ディレクトリで実行）:
+    python -m benchmarks.concurrency_benchmark
+    python -m benchmarks.concurrency_benchmark --concurrency 1 10 50 --requests 500 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# リレーションの解決に必要なモデルを登録する
+from app.models import comment, comment_like, like, notification, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.repositories.prompt_repository import PromptRepository
+
+PROMPT_COUNT = 200
+
+Handler = Callable[[int], Awaitable[Dict]]
+Dispose = Callable[[], Awaitable[None]]
+
+def add_latency(engine, latency: float) -> None:
+    """接続ごとに、文の実行時にDBの応答時間だけ待つトレースコールバックを設定する"""
+
+    def wait(statement: str) -> None:
+        time.sleep(latency)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        driver_connection = getattr(dbapi_connection, "_connection", None)
+        if driver_connection is None:
+            dbapi_connection.set_trace_callback(wait)
+        else:
+            # aiosqlite: コールバックは aiosqlite のスレッドで実行される
+            dbapi_connection.await_(driver_connection.set_trace_callback(wait))
+
+def seed(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Prompt.metadata.create_all(engine, tables=[User.__table__, Prompt.__table__])
+    with Session(engine) as db:
+        user = User(username="bench", email="bench@example.com", password="Benchmark1")
+        db.add(user)
+        db.flush()
+        db.add_all(
+            Prompt(title=f"プロンプト {i}", content="以下の文章を要約してください。", user_id=user.id)
+            for i in range(PROMPT_COUNT)
+        )
+        db.commit()
+    engine.dispose()
+
+def summarize(prompt: Prompt) -> Dict:
+    return {"id": prompt.id, "title": prompt.title, "like_count": prompt.like_count}
+
+def legacy_handler(path: str, latency: float, pool_size: int) -> Tuple[Handler, Dispose]:
+    """従来の経路: async のルートから同期の Session を呼び出す（待つ間イベントループが止まる）"""
+    engine = create_engine(
+        f"sqlite:///{path}", poolclass=QueuePool, pool_size=pool_size, max_overflow=0
+    )
+    add_latency(engine, latency)
+    factory = sessionmaker(engine)
+
+    async def handle(prompt_id: int) -> Dict:
+        with factory() as db:
+            prompt = db.execute(select(Prompt).where(Prompt.id == prompt_id)).scalar_one()
+            return summarize(prompt)
+
+    async def dispose() -> None:
+        engine.dispose()
+
+    return handle, dispose
+
+def repository_handler(path: str, latency: float, pool_size: int) -> Tuple[Handler, Dispose]:
+    """リポジトリの経路: AsyncSession で await する"""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=0
+    )
+    add_latency(engine.sync_engine, latency)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def handle(prompt_id: int) -> Dict:
+        async with factory() as db:
+            prompt = await PromptRepository(db).get(prompt_id)
+            return summarize(prompt)
+
+    return handle, engine.dispose
+
+async def run(path_handler: Tuple[Handler, Dispose], requests: int, concurrency: int) -> float:
+    """
+    同時に concurrency 件ずつリクエストを処理する（終了後に接続を閉じる）
+
+    Returns:
+        float: スループット（件/秒）
+    """
+    handler, dispose = path_handler
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i: int) -> None:
+        async with semaphore:
+            await handler(i % PROMPT_COUNT + 1)
+
+    # 接続の確立をウォームアップで済ませる
+    await asyncio.gather(*(handler(1) for _ in range(concurrency)))
+    started = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await dispose()
+    return requests / elapsed
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="1ワーカーあたりのスループットのベンチマーク")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50], help="同時リクエスト数")
+    parser.add_argument("--requests", type=int, default=300, help="計測ごとのリクエスト数")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="1文あたりのDBの応答時間（ミリ秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        latency = args.latency_ms / 1000
+
+        print(f"requests: {args.requests}, latency per statement: {args.latency_ms}ms, workers: 1")
+        print(f"{'concurrency':>11}{'sync Session(req/s)':>21}{'repository(req/s)':>19}{'speedup':>9}")
+        for concurrency in args.concurrency:
+            legacy = await run(legacy_handler(path, latency, concurrency), args.requests, concurrency)
+            repository = await run(repository_handler(path, latency, concurrency), args.requests, concurrency)
+            print(f"{concurrency:>11}{legacy:>21.1f}{repository:>19.1f}{repository / legacy:>8.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+一覧レスポンスのシリアライズのベンチマーク
+
+現在の経路（pydanticのモデルで検証 → 標準のjson）と、
+コンパイル済みのエンコーダー → orjson の経路をページ件数ごとに比較する。
+プロンプトはキャッシュから取得する辞書、コメントはORMオブジェクト相当の値で計測する。
+
+使用例（backend ディレクトリで実行）:
+    python -m benchmarks.serialization_benchmark
+    python -m benchmarks.serialization_benchmark --sizes 20 50 100 --repeat 200
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from app.core.serialization import dumps, encode_many, orjson
+from app.schemas.comment import CommentResponse
+from app.schemas.prompt import PromptListResponse
+
+BASE_TIME = datetime(2024, 12, 1, 9, 30, 15, 123456)
+
+def make_prompt(i: int) -> Dict[str, Any]:
+    """Prompt.to_dict と同じ形式のプロンプト"""
+    created_at = BASE_TIME - timedelta(minutes=i)
+    return {
+        "id": 100000 - i,
+        "title": f"プロンプト {i}: 議事録を要約する",
+        "slug": f"prompt-{i}",
+        "content": "以下の議事録を3行で要約してください。\n" * 20,
+        "description": "会議の議事録を短く要約するためのプロンプト",
+        "category": "business",
+        "tags": ["要約", "議事録", "ビジネス"],
+        "language": "ja",
+        "view_count": 1200 + i,
+        "like_count": 35 + i % 7,
+        "average_rating": 4.25,
+        "is_published": True,
+        "is_featured": i % 10 == 0,
+        "is_approved": True,
+        "created_at": created_at.isoformat(),
+        "updated_at": created_at.isoformat(),
+        "user_id": 10 + i % 50,
+        "is_liked_by_current_user": i % 3 == 0,
+    }
+
+def make_comment(i: int) -> SimpleNamespace:
+    """ORMから読み込んだコメント相当のオブジェクト"""
+    created_at = BASE_TIME - timedelta(minutes=i)
+    return SimpleNamespace(
+        id=50000 - i,
+        content="とても参考になりました。社内の定例でも使っています。" * 3,
+        prompt_id=1234,
+        user_id=20 + i % 30,
+        created_at=created_at,
+        updated_at=created_at,
+        is_deleted=False,
+        user_name=f"user{i % 30}",
+        user_avatar=None,
+        likes_count=i % 5,
+        is_liked_by_current_user=False,
+    )
+
+def pydantic_path(schema, items: List[Any]) -> bytes:
+    """現在の経路: スキーマで検証してから標準のjsonで出力する"""
+    if hasattr(schema, "model_validate"):
+        content = [schema.model_validate(item, from_attributes=True).model_dump(mode="json") for item in items]
+    else:
+        content = [json.loads((schema.parse_obj(item) if isinstance(item, dict) else schema.from_orm(item)).json()) for item in items]
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def compiled_path(schema, items: List[Any]) -> bytes:
+    """高速な経路: コンパイル済みのエンコーダーと orjson で出力する"""
+    return dumps(encode_many(schema, items))
+
+def measure(func: Callable[[], bytes], repeat: int) -> float:
+    """1回あたりの処理時間（ミリ秒、5回計測した最小値）"""
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="一覧レスポンスのシリアライズのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100], help="ページ件数")
+    parser.add_argument("--repeat", type=int, default=100, help="1回の計測での実行回数")
+    args = parser.parse_args()
+
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'json (orjson is not installed)'}")
+    print(f"{'schema':<20}{'size':>6}{'pydantic+json(ms)':>20}{'compiled(ms)':>15}{'speedup':>10}")
+    for schema, factory in ((PromptListResponse, make_prompt), (CommentResponse, make_comment)):
+        for size in args.sizes:
+            items = [factory(i) for i in range(size)]
+            assert json.loads(pydantic_path(schema, items)) == json.loads(compiled_path(schema, items))
+            baseline = measure(lambda: pydantic_path(schema, items), args.repeat)
+            compiled = measure(lambda: compiled_path(schema, items), args.repeat)
+            print(f"{schema.__name__:<20}{size:>6}{baseline:>20.3f}{compiled:>15.3f}{baseline / compiled:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache, cached
+
+class FailingSharedCache(InMemorySharedCache):
+    async def get(self, key):
+        raise ConnectionError("redis is down")
+
+    async def set(self, key, value, ttl):
+        raise ConnectionError("redis is down")
+
+@pytest.fixture
+def cache():
+    return Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=InMemorySharedCache())
+
+class TestLocalLRUCache:
+    def test_evicts_least_recently_used(self):
+        local = LocalLRUCache(max_size=2, ttl=30)
+        local.set("a", "1")
+        local.set("b", "2")
+        local.get("a")
+        local.set("c", "3")
+        assert local.get("a") == "1"
+        assert local.get("b") is None
+        assert len(local) == 2
+
+    def test_expires_after_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        local = LocalLRUCache(max_size=10, ttl=30)
+        local.set("a", "1")
+        now[0] += 31
+        assert local.get("a") is None
+
+class TestCache:
+    @pytest.mark.asyncio
+    async def test_falls_back_to_shared_tier(self, cache):
+        await cache.set("prompt", 1, {"id": 1})
+        cache.clear_local()
+        assert await cache.get("prompt", 1) == {"id": 1}
+
+    @pytest.mark.asyncio
+    async def test_returned_values_are_copies(self, cache):
+        await cache.set("prompt", 1, {"id": 1})
+        value = await cache.get("prompt", 1)
+        value["is_liked_by_current_user"] = True
+        assert await cache.get("prompt", 1) == {"id": 1}
+
+    @pytest.mark.asyncio
+    async def test_delete(self, cache):
+        await cache.set("prompt", 1, {"id": 1})
+        await cache.delete("prompt", 1)
+        assert await cache.get("prompt", 1) is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_namespace(self, cache):
+        await cache.set("prompt_list", "page1", {"items": []})
+        await cache.set("prompt", 1, {"id": 1})
+        await cache.invalidate_namespace("prompt_list")
+        assert await cache.get("prompt_list", "page1") is None
+        assert await cache.get("prompt", 1) == {"id": 1}
+
+    @pytest.mark.asyncio
+    async def test_shared_tier_failure_is_not_fatal(self):
+        cache = Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=FailingSharedCache())
+        await cache.set("prompt", 1, {"id": 1})
+        assert await cache.get("prompt", 1) == {"id": 1}
+        cache.clear_local()
+        assert await cache.get("prompt", 1) is None
+
+class TestCacheAcrossWorkers:
+    @pytest.fixture
+    def workers(self):
+        shared = InMemorySharedCache()
+        return [Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=shared) for _ in range(2)]
+
+    @pytest.mark.asyncio
+    async def test_stamp_deletion_is_visible_to_other_workers(self, workers):
+        writer, reader = workers
+        await writer.set("prompt", 1, {"id": 1, "title": "old"})
+        await writer.set_stamp("prompt", 1, 'W/"old"')
+        assert await reader.get("prompt", 1) == {"id": 1, "title": "old"}
+        assert await reader.get_stamp("prompt", 1) == 'W/"old"'
+
+        await writer.delete("prompt", 1)
+        assert await reader.get_stamp("prompt", 1) is None
+        # LRUに残った本文はスタンプと比較して破棄する
+        await reader.discard_local("prompt", 1)
+        assert await reader.get("prompt", 1) is None
+
+    @pytest.mark.asyncio
+    async def test_stale_local_value_is_replaced_from_shared_tier(self, workers):
+        writer, reader = workers
+        await writer.set("prompt", 1, {"id": 1, "title": "old"})
+        assert await reader.get("prompt", 1) == {"id": 1, "title": "old"}
+
+        await writer.delete("prompt", 1)
+        await writer.set("prompt", 1, {"id": 1, "title": "new"})
+        assert await reader.get("prompt", 1) == {"id": 1, "title": "old"}
+        await reader.discard_local("prompt", 1)
+        assert await reader.get("prompt", 1) == {"id": 1, "title": "new"}
+
+    @pytest.mark.asyncio
+    async def test_namespace_invalidation_is_visible_to_other_workers(self, workers):
+        writer, reader = workers
+        await reader.set("prompt_list", "page1", {"items": [1]})
+        assert await reader.get("prompt_list", "page1") == {"items": [1]}
+        await writer.invalidate_namespace("prompt_list")
+        assert await reader.get("prompt_list", "page1") is None
+
+class TestSharedLock:
+    @pytest.mark.asyncio
+    async def test_only_one_worker_acquires_until_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        shared = InMemorySharedCache()
+        first, second = [Cache(local=LocalLRUCache(max_size=10, ttl=30), shared=shared) for _ in range(2)]
+        assert await first.acquire_lock("job:purge", 60) is True
+        assert await second.acquire_lock("job:purge", 60) is False
+        assert await second.acquire_lock("job:digest", 60) is True
+        now[0] += 61
+        assert await second.acquire_lock("job:purge", 60) is True
+
+    @pytest.mark.asyncio
+    async def test_lock_without_shared_tier_or_on_failure(self):
+        assert await Cache(local=LocalLRUCache(max_size=10, ttl=30)).acquire_lock("job:purge", 60) is True
+
+        class FailingLock(FailingSharedCache):
+            async def set_if_absent(self, key, value, ttl):
+                raise ConnectionError("redis is down")
+
+        cache = Cache(local=LocalLRUCache(max_size=10, ttl=30), shared=FailingLock())
+        assert await cache.acquire_lock("job:purge", 60) is True
+
+class TestCachedDecorator:
+    @pytest.mark.asyncio
+    async def test_caches_by_arguments(self, cache, monkeypatch):
+        monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+        calls = []
+
+        class Service:
+            @cached("prompt")
+            async def get_prompt_data(self, prompt_id):
+                calls.append(prompt_id)
+                return {"id": prompt_id}
+
+        service = Service()
+        assert await service.get_prompt_data(1) == {"id": 1}
+        assert await service.get_prompt_data(1) == {"id": 1}
+        assert await service.get_prompt_data(2) == {"id": 2}
+        assert calls == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_does_not_cache_none(self, cache, monkeypatch):
+        monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+        calls = []
+
+        @cached("user")
+        async def get_user_data(user_id):
+            calls.append(user_id)
+            return None
+
+        await get_user_data(1)
+        await get_user_data(1)
+        assert calls == [1, 1]
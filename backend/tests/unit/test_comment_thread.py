@@ -0,0 +1,155 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.comment import Comment
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.services.comment_service import (
+    CommentService,
+    build_comment_path,
+    build_thread,
+    path_ids,
+    subtree_upper_bound,
+    walk_thread,
+)
+
+def make_comment(id, parent=None, reply_count=0):
+    path = build_comment_path(parent.path if parent else None, id)
+    return SimpleNamespace(
+        id=id,
+        content=f"comment {id}",
+        prompt_id=1,
+        user_id=1,
+        parent_id=parent.id if parent else None,
+        path=path,
+        depth=parent.depth + 1 if parent else 0,
+        reply_count=reply_count,
+        created_at=datetime(2024, 1, 1),
+        updated_at=datetime(2024, 1, 1),
+        is_deleted=False,
+        like_count=0,
+    )
+
+def test_path_helpers():
+    root = build_comment_path(None, 12)
+    child = build_comment_path(root, 345)
+    assert root == "0000000012/"
+    assert child == "0000000012/0000000345/"
+    assert path_ids(child) == [12, 345]
+    # 子孫は全て [root, upper) の範囲に入り、後続の兄弟は範囲外になる
+    upper = subtree_upper_bound(root)
+    assert root < child < upper
+    assert build_comment_path(None, 13) >= upper
+    assert build_comment_path(child, 9999999999) < upper
+
+def test_build_thread_limits_replies_per_node():
+    root = make_comment(1, reply_count=3)
+    a = make_comment(2, root, reply_count=1)
+    a1 = make_comment(5, a)
+    b = make_comment(3, root)
+    c = make_comment(4, root)
+    other = make_comment(6)
+
+    descendants = sorted([a, a1, b, c], key=lambda comment: comment.path)
+    thread = build_thread([other, root], descendants, reply_limit=2)
+
+    assert [node["id"] for node in thread] == [6, 1]
+    replies = thread[1]["replies"]
+    assert [node["id"] for node in replies] == [2, 3]
+    assert thread[1]["has_more_replies"] is True
+    assert [node["id"] for node in replies[0]["replies"]] == [5]
+    assert replies[0]["has_more_replies"] is False
+    assert [node["id"] for node in walk_thread(thread)] == [6, 1, 2, 5, 3]
+
+@pytest.mark.asyncio
+async def test_get_thread_skips_range_query_without_replies():
+    result = Mock()
+    result.scalars.return_value.all.return_value = [make_comment(2), make_comment(1)]
+    db = Mock()
+    db.execute = AsyncMock(return_value=result)
+
+    thread, next_cursor = await CommentService(db).get_thread(prompt_id=1, limit=20)
+
+    assert [node["id"] for node in thread] == [2, 1]
+    assert next_cursor is None
+    assert db.execute.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_thread_loads_one_query_per_depth():
+    roots = Mock()
+    roots.scalars.return_value.all.return_value = [make_comment(2, reply_count=1), make_comment(1, reply_count=1)]
+    parent_1, parent_2 = make_comment(1), make_comment(2)
+    replies = Mock()
+    replies.scalars.return_value.all.return_value = [make_comment(3, parent_1), make_comment(4, parent_2)]
+    db = Mock()
+    db.execute = AsyncMock(side_effect=[roots, replies])
+
+    thread, _ = await CommentService(db).get_thread(prompt_id=1, limit=20)
+
+    # 返信に返信がなければ次の深さは読み込まない
+    assert db.execute.await_count == 2
+    assert [[reply["id"] for reply in node["replies"]] for node in thread] == [[4], [3]]
+
+@pytest.mark.asyncio
+async def test_get_thread_reads_only_returned_replies(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'comments.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Prompt.metadata.create_all,
+            tables=[User.__table__, Prompt.__table__, Comment.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.flush()
+    db.add(Prompt(id=1, title="p", content="c", user_id=user.id))
+    await db.flush()
+
+    def add(comment_id, parent=None, reply_count=0):
+        comment = Comment(
+            id=comment_id,
+            content=f"comment {comment_id}",
+            prompt_id=1,
+            user_id=user.id,
+            parent_id=parent.id if parent else None,
+            path=build_comment_path(parent.path if parent else None, comment_id),
+            depth=parent.depth + 1 if parent else 0,
+            reply_count=reply_count
+        )
+        db.add(comment)
+        return comment
+
+    # 最上位のコメント1に返信が10件、最初の2件にはそれぞれ返信が5件ある
+    root = add(1, reply_count=10)
+    replies = [add(comment_id, root, reply_count=5 if comment_id < 4 else 0) for comment_id in range(2, 12)]
+    for index, reply in enumerate(replies[:2]):
+        for offset in range(5):
+            add(100 + index * 10 + offset, reply)
+    await db.commit()
+
+    service = CommentService(db)
+    loaded = []
+    first_replies = service._first_replies
+
+    async def recording_first_replies(parent_ids, limit):
+        replies = await first_replies(parent_ids, limit)
+        loaded.append([reply.id for reply in replies])
+        return replies
+
+    service._first_replies = recording_first_replies
+    thread, _ = await service.get_thread(prompt_id=1, limit=20, reply_limit=2)
+
+    [node] = thread
+    assert [reply["id"] for reply in node["replies"]] == [2, 3]
+    assert node["has_more_replies"] is True
+    assert [[child["id"] for child in reply["replies"]] for reply in node["replies"]] == [[100, 101], [110, 111]]
+    assert [reply["has_more_replies"] for reply in node["replies"]] == [True, True]
+    # 深さごとに1回ずつ読み込み、読み込む返信は返す6件のみ
+    assert loaded == [[2, 3], [100, 101, 110, 111]]
+    await db.close()
+    await engine.dispose()
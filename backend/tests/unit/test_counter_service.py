@@ -0,0 +1,137 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.models import comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.comment import Comment
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.services.comment_like_service import CommentLikeService
+from app.services.comment_service import CommentService, build_comment_path
+from app.services.counter_service import COUNTERS, CounterReconciler, CounterService
+
+def make_result(rows=(), rowcount=1, scalar=None):
+    result = Mock()
+    result.all.return_value = list(rows)
+    result.rowcount = rowcount
+    result.scalar_one_or_none.return_value = scalar
+    return result
+
+@pytest.mark.asyncio
+async def test_reconcile_counter_repairs_only_drifted_rows():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(side_effect=[
+        # (id, comment_count)
+        make_result([(1, 2), (2, 5), (3, 0)]),
+        # コメントテーブルの集計（プロンプト3はコメントなし）
+        make_result([(1, 2), (2, 4)]),
+        # プロンプト2の修正
+        make_result(),
+        make_result([]),
+    ])
+
+    assert await CounterService(db).reconcile_counter(COUNTERS[0], batch_size=3) == 1
+    assert db.execute.await_count == 4
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_unlike_comment_without_like_does_not_touch_counter():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(return_value=make_result(rowcount=0))
+
+    assert await CommentLikeService(db).unlike(comment_id=1, user_id=1) is False
+    assert db.execute.await_count == 1
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_reconciler_disabled_with_zero_interval():
+    reconciler = CounterReconciler(interval=0)
+    reconciler.start()
+    assert reconciler._task is None
+    await reconciler.stop()
+
+@pytest.mark.asyncio
+async def test_run_once_uses_own_session():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(return_value=make_result([]))
+
+    @asynccontextmanager
+    async def session_factory():
+        yield db
+
+    repaired = await CounterReconciler(session_factory=session_factory, interval=0).run_once()
+    assert repaired == {spec.name: 0 for spec in COUNTERS}
+
+@pytest.mark.asyncio
+async def test_scheduled_reconcile_runs_in_one_worker(monkeypatch):
+    cache = Cache(local=LocalLRUCache(max_size=10, ttl=30), shared=InMemorySharedCache())
+    monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+    workers = [CounterReconciler(interval=3600) for _ in range(2)]
+    for worker in workers:
+        worker.run_once = AsyncMock(return_value={})
+
+    assert await workers[0].run_scheduled() == {}
+    assert await workers[1].run_scheduled() is None
+    workers[0].run_once.assert_awaited_once()
+    workers[1].run_once.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_prompt_comment_count_keeps_updated_at():
+    db = Mock()
+    db.execute = AsyncMock()
+    await CommentService(db)._add_prompt_comment_count(1, 1)
+    assert "updated_at=prompts.updated_at" in str(db.execute.await_args.args[0])
+
+@pytest.mark.asyncio
+async def test_deleting_comment_with_replies_subtracts_live_subtree(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "get_cache", lambda: Cache(local=LocalLRUCache(max_size=10, ttl=30)))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'comments.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Prompt.metadata.create_all,
+            tables=[User.__table__, Prompt.__table__, Comment.__table__, comment_like.CommentLike.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.flush()
+    db.add(Prompt(id=1, title="p", content="c", user_id=user.id, comment_count=4))
+    await db.flush()
+
+    def add(comment_id, parent=None, reply_count=0, is_deleted=False):
+        db.add(Comment(
+            id=comment_id,
+            content="c",
+            prompt_id=1,
+            user_id=user.id,
+            parent_id=parent[0] if parent else None,
+            path=build_comment_path(parent[1] if parent else None, comment_id),
+            depth=len(parent[1]) // 11 if parent else 0,
+            reply_count=reply_count,
+            is_deleted=is_deleted
+        ))
+        return comment_id, build_comment_path(parent[1] if parent else None, comment_id)
+
+    # 1 -> 2 -> 3（論理削除済み）、1 -> 4 と、別のスレッドの 5
+    root = add(1, reply_count=2)
+    reply = add(2, root, reply_count=1)
+    add(3, reply, is_deleted=True)
+    add(4, root)
+    add(5)
+    await db.commit()
+
+    assert await CommentService(db).delete_comment(1, user.id) is True
+    # 部分木の論理削除されていない3件（1, 2, 4）を減算する
+    prompt = (await db.execute(select(Prompt).where(Prompt.id == 1).execution_options(populate_existing=True))).scalar_one()
+    assert prompt.comment_count == 1
+    assert (await db.execute(select(Comment.id))).scalars().all() == [5]
+    await db.close()
+    await engine.dispose()
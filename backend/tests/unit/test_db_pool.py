@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db_pool import (
+    DB_POOL_TIMEOUTS,
+    InstrumentedAsyncQueuePool,
+    PoolAutoscaler,
+    connection_limit,
+    instrument_engine,
+    pool_stats
+)
+
+def make_engine(tmp_path, label, pool_size=1, max_overflow=0):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=0.05
+    )
+    instrument_engine(engine, label)
+    return engine
+
+@pytest.mark.asyncio
+async def test_checkout_and_timeout_are_recorded(tmp_path):
+    engine = make_engine(tmp_path, "test-timeout")
+    stats = pool_stats("test-timeout")
+    before = DB_POOL_TIMEOUTS.labels(pool="test-timeout")._value.get()
+
+    async with engine.connect():
+        assert stats.checked_out == 1
+        with pytest.raises(exc.TimeoutError):
+            async with engine.connect():
+                pass
+    await engine.dispose()
+
+    assert stats.checked_out == 0
+    assert stats.peak == 1
+    assert stats.timeouts == 1
+    assert max(stats.waits) >= 0.05
+    assert DB_POOL_TIMEOUTS.labels(pool="test-timeout")._value.get() == before + 1
+
+@pytest.mark.asyncio
+async def test_autoscaler_grows_on_wait_and_shrinks_when_idle(tmp_path):
+    engine = make_engine(tmp_path, "test-adaptive", pool_size=2, max_overflow=0)
+    scaler = PoolAutoscaler(engine, min_connections=2, max_connections=5, target_wait=0.01, label="test-adaptive")
+    stats = pool_stats("test-adaptive")
+
+    stats.waits = [0.001] * 90 + [0.2] * 10
+    assert scaler.adjust() == 3
+    stats.timeouts = 1
+    assert scaler.adjust() == 4
+    stats.timeouts = 1
+    assert scaler.adjust() == 5
+    # 上限を超えては増やさない
+    stats.timeouts = 1
+    assert scaler.adjust() == 5
+    assert engine.pool._max_overflow == 3
+
+    # 待ちがなく使用中の接続が少なければ1つずつ減らし、pool_size より小さくはしない
+    assert scaler.adjust() == 4
+    for _ in range(5):
+        scaler.adjust()
+    assert connection_limit(engine.pool) == 2
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_autoscaler_keeps_limit_when_busy(tmp_path):
+    engine = make_engine(tmp_path, "test-busy", pool_size=2, max_overflow=2)
+    scaler = PoolAutoscaler(engine, min_connections=2, max_connections=8, label="test-busy")
+    stats = pool_stats("test-busy")
+    stats.peak = 4
+    stats.waits = [0.0001] * 10
+    assert scaler.adjust() == 4
+
+    # 作り直したプールにもラベルと上限が引き継がれる
+    await engine.dispose()
+    assert engine.pool.label == "test-busy"
+    assert connection_limit(engine.pool) == 4
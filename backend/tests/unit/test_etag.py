@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.core.etag import compute_etag, etag_matches
+
+def test_compute_etag_is_weak_and_stable():
+    etag = compute_etag(1, "2024-12-24T10:00:00", 3)
+    assert etag.startswith('W/"')
+    assert etag == compute_etag(1, "2024-12-24T10:00:00", 3)
+    assert etag != compute_etag(1, "2024-12-24T10:00:01", 3)
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('W/"xyz", W/"abc"', True),
+    ('W/"xyz"', False),
+    ("*", True),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, 'W/"abc"') is expected
+
+@pytest.mark.asyncio
+async def test_stamp_is_removed_with_entry():
+    cache = Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=InMemorySharedCache())
+    await cache.set("prompt", 1, {"id": 1})
+    await cache.set_stamp("prompt", 1, 'W/"abc"')
+    assert await cache.get_stamp("prompt", 1) == 'W/"abc"'
+
+    await cache.delete("prompt", 1)
+    assert await cache.get_stamp("prompt", 1) is None
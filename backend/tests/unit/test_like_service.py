@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.services.like_service import LikeService
+
+def make_db(liked_ids=(), rowcount=1):
+    db = Mock()
+    result = Mock()
+    result.scalars.return_value.all.return_value = list(liked_ids)
+    result.rowcount = rowcount
+    db.execute = AsyncMock(return_value=result)
+    db.commit = AsyncMock()
+    return db
+
+@pytest.mark.asyncio
+async def test_get_liked_prompt_ids_uses_single_query():
+    db = make_db(liked_ids=[2, 5])
+    liked = await LikeService(db).get_liked_prompt_ids(1, [1, 2, 3, 4, 5, 2])
+    assert liked == {2, 5}
+    assert db.execute.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_liked_prompt_ids_without_ids_skips_query():
+    db = make_db()
+    assert await LikeService(db).get_liked_prompt_ids(1, []) == set()
+    db.execute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_mark_liked_by_user():
+    db = make_db(liked_ids=[2])
+    prompts = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+    await LikeService(db).mark_liked_by_user(prompts, user_id=1)
+    assert [prompt.is_liked_by_current_user for prompt in prompts] == [False, True]
+
+@pytest.mark.asyncio
+async def test_unlike_without_like_does_not_touch_counter():
+    db = make_db(rowcount=0)
+    assert await LikeService(db).unlike(prompt_id=1, user_id=1) is False
+    assert db.execute.await_count == 1
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_unlike_keeps_prompt_updated_at(monkeypatch):
+    from app.services import like_service as like_module
+
+    monkeypatch.setattr(like_module, "invalidate", AsyncMock())
+    monkeypatch.setattr(like_module, "record_event", Mock())
+    db = make_db()
+    assert await LikeService(db).unlike(prompt_id=1, user_id=1) is True
+    statement = db.execute.await_args_list[1].args[0]
+    assert "updated_at=prompts.updated_at" in str(statement)
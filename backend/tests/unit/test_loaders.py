@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.services.loaders import COMMENT_USER, NOTIFICATION_SENDER, PROMPT_AUTHOR, BatchLoader, Loaders
+
+def make_result(rows):
+    result = Mock()
+    result.all.return_value = list(rows)
+    return result
+
+@pytest.mark.asyncio
+async def test_loads_in_one_batch_and_caches():
+    calls = []
+
+    async def batch(keys):
+        calls.append(list(keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    loader = BatchLoader(batch, default=-1)
+    assert await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3)) == [10, 20, 10, -1]
+    assert await loader.load_many([2, None, 4]) == [20, -1, 40]
+    assert calls == [[1, 2, 3], [4]]
+
+@pytest.mark.asyncio
+async def test_splits_large_batches():
+    calls = []
+
+    async def batch(keys):
+        calls.append(len(keys))
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch, max_batch_size=2)
+    assert await loader.load_many(range(5)) == [0, 1, 2, 3, 4]
+    assert calls == [2, 2, 1]
+
+@pytest.mark.asyncio
+async def test_failed_keys_are_retried():
+    batch = AsyncMock(side_effect=[RuntimeError("db down"), {1: "ok"}])
+    loader = BatchLoader(batch)
+    with pytest.raises(RuntimeError):
+        await loader.load(1)
+    assert await loader.load(1) == "ok"
+
+@pytest.mark.asyncio
+async def test_include_resolves_page_with_one_query_per_loader():
+    alice = SimpleNamespace(id=1, username="alice", display_name=None, avatar_url="https://example.com/a.png")
+    bob = SimpleNamespace(id=2, username="bob", display_name="Bob", avatar_url=None)
+    db = Mock()
+    db.execute = AsyncMock(return_value=make_result([alice, bob]))
+
+    rows = [
+        SimpleNamespace(id=10, user_id=1, sender_id=2),
+        SimpleNamespace(id=11, user_id=2, sender_id=None),
+        SimpleNamespace(id=12, user_id=1, sender_id=1),
+    ]
+    # 同じローダーを使う宣言はまとめて1回のクエリになる
+    await Loaders(db).include(rows, COMMENT_USER, NOTIFICATION_SENDER)
+
+    assert db.execute.await_count == 1
+    assert [row.user_name for row in rows] == ["alice", "Bob", "alice"]
+    assert rows[0].user_avatar == "https://example.com/a.png"
+    assert [row.sender_name for row in rows] == ["Bob", None, "alice"]
+
+@pytest.mark.asyncio
+async def test_include_sets_dict_rows_and_missing_relations():
+    db = Mock()
+    db.execute = AsyncMock(return_value=make_result([]))
+    prompts = [{"id": 1, "user_id": 99}]
+    await Loaders(db).include(prompts, PROMPT_AUTHOR)
+    assert prompts == [{"id": 1, "user_id": 99, "author_name": None, "author_avatar": None}]
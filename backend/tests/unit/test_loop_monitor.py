@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.core.loop_monitor import EVENT_LOOP_SLOW_STEPS, LoopMonitor, endpoint_label
+
+def block_event_loop(seconds):
+    time.sleep(seconds)
+
+def test_endpoint_label_uses_innermost_route_frame():
+    routes = os.path.join("backend", "app", "api", "v1", "prompts", "routes.py")
+    frames = [
+        (os.path.join("site-packages", "passlib", "handlers", "bcrypt.py"), "verify"),
+        (routes, "login"),
+        (os.path.join("site-packages", "starlette", "routing.py"), "app"),
+    ]
+    assert endpoint_label(frames) == "v1.prompts.routes:login"
+    assert endpoint_label(frames[:1]) == "other"
+
+@pytest.mark.asyncio
+async def test_stall_is_captured_with_stack():
+    monitor = LoopMonitor(interval=0.01, stall_threshold=0.05, debug=False)
+    monitor.start()
+    await asyncio.sleep(0.03)
+    block_event_loop(0.3)
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert "block_event_loop" in stall.stack
+    assert stall.route == "other"
+    assert 0.2 <= stall.duration < 0.5
+
+@pytest.mark.asyncio
+async def test_debug_mode_reports_slow_steps():
+    before = EVENT_LOOP_SLOW_STEPS.labels(route="other")._value.get()
+    original = asyncio.events.Handle._run
+    monitor = LoopMonitor(interval=1, stall_threshold=5, debug=True, slow_step_threshold=0.05)
+    monitor.start()
+
+    async def slow_step():
+        block_event_loop(0.1)
+
+    await asyncio.create_task(slow_step())
+    await monitor.stop()
+
+    assert EVENT_LOOP_SLOW_STEPS.labels(route="other")._value.get() == before + 1
+    assert asyncio.events.Handle._run is original
+
+@pytest.mark.asyncio
+async def test_monitor_disabled_with_zero_interval():
+    monitor = LoopMonitor(interval=0)
+    monitor.start()
+    assert monitor._task is None
+    await monitor.stop()
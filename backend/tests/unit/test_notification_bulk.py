@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.user import User
+from app.repositories.notification_repository import NotificationRepository
+from app.schemas.notification import NotificationBulkDelete, NotificationBulkUpdate
+from app.services.notification_service import NotificationService
+
+NOW = datetime(2024, 1, 10)
+
+async def seed(tmp_path):
+    """2人のユーザーに、古い未読・古い既読・新しい未読の通知を作成する"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'notifications.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all, tables=[User.__table__, Notification.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com", password="Password1") for i in (1, 2)
+    ]
+    db.add_all(users)
+    await db.flush()
+    for user in users:
+        user.unread_notification_count = 2
+        for days, is_read in ((5, False), (5, True), (0, False)):
+            notification = Notification(user_id=user.id, type="like", content="liked")
+            notification.is_read = is_read
+            notification.created_at = NOW - timedelta(days=days)
+            db.add(notification)
+    await db.commit()
+    return engine, db, [user.id for user in users]
+
+@pytest.mark.asyncio
+async def test_mark_read_before_timestamp(tmp_path):
+    engine, db, (user_id, other_id) = await seed(tmp_path)
+    result = await NotificationService(db).update_many(
+        user_id, NotificationBulkUpdate(before=NOW - timedelta(days=1))
+    )
+    assert (result.affected, result.unread_count) == (1, 1)
+    # 他のユーザーの通知は変更しない
+    assert await NotificationRepository(db).count_unread(other_id) == 2
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_mark_ids_skips_unchanged_and_other_users(tmp_path):
+    engine, db, (user_id, other_id) = await seed(tmp_path)
+    ids = list(range(1, 7))
+    result = await NotificationService(db).update_many(user_id, NotificationBulkUpdate(notification_ids=ids))
+    assert (result.affected, result.unread_count) == (2, 0)
+
+    result = await NotificationService(db).update_many(
+        user_id, NotificationBulkUpdate(notification_ids=ids, is_read=False)
+    )
+    assert (result.affected, result.unread_count) == (3, 3)
+    assert await NotificationRepository(db).count_unread(other_id) == 2
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_delete_many_reports_unread_rows(tmp_path):
+    engine, db, (user_id, _) = await seed(tmp_path)
+    deleted, unread = await NotificationRepository(db).delete_many(
+        user_id, before=NOW - timedelta(days=1), commit=False
+    )
+    assert (deleted, unread) == (2, 1)
+    await db.rollback()
+
+    result = await NotificationService(db).delete_many(user_id, NotificationBulkDelete(before=NOW - timedelta(days=1)))
+    assert (result.affected, result.unread_count) == (2, 1)
+    result = await NotificationService(db).delete_many(user_id, NotificationBulkDelete(notification_ids=[3]))
+    assert (result.affected, result.unread_count) == (1, 0)
+    await db.close()
+    await engine.dispose()
+
+def test_bulk_selection_requires_exactly_one_target():
+    with pytest.raises(ValidationError):
+        NotificationBulkUpdate()
+    with pytest.raises(ValidationError):
+        NotificationBulkDelete(notification_ids=[1], before=NOW)
+    with pytest.raises(ValidationError):
+        NotificationBulkDelete(notification_ids=[])
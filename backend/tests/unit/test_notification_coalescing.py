@@ -0,0 +1,159 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
+from app.models.user import User
+from app.repositories.notification_repository import NotificationRepository
+from app.services.notification_digest import (
+    NotificationDigest,
+    NotificationDigestScheduler,
+    NotificationDigestService,
+)
+from app.services.notification_outbox import NotificationOutboxWorker
+from app.services.notification_service import NotificationService
+
+async def seed(tmp_path):
+    """プロンプトの作成者（最初のユーザー）と、いいねする3人のユーザーを作成する"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'coalesce.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all,
+            tables=[User.__table__, Notification.__table__, NotificationOutbox.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com", password="Password1") for i in range(4)
+    ]
+    db.add_all(users)
+    await db.commit()
+
+    @asynccontextmanager
+    async def session_factory():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    return engine, db, [user.id for user in users], session_factory
+
+async def like_prompt(db, owner_id, actor_ids, prompt_id=1, created_at=None):
+    service = NotificationService(db)
+    for actor_id in actor_ids:
+        entry = service.enqueue_like_notification(owner_id, actor_id, prompt_id)
+        entry.created_at = created_at or datetime.utcnow()
+    await db.commit()
+
+async def notifications(db, user_id):
+    db.expire_all()
+    result = await db.execute(select(Notification).where(Notification.user_id == user_id).order_by(Notification.id))
+    return list(result.scalars().all())
+
+@pytest.mark.asyncio
+async def test_likes_are_coalesced_into_one_unread_notification(tmp_path):
+    engine, db, (owner, *actors), session_factory = await seed(tmp_path)
+    worker = NotificationOutboxWorker(session_factory=session_factory, interval=0)
+    await like_prompt(db, owner, [actors[0], actors[1], actors[0]])
+    await worker.run_once()
+    await like_prompt(db, owner, [actors[2]])
+    await worker.run_once()
+
+    (notification,) = await notifications(db, owner)
+    assert (notification.actor_count, notification.actor_ids) == (3, [actors[2], actors[0], actors[1]])
+    assert notification.content == "user3さんと他2人があなたのプロンプトにいいねしました"
+    assert await NotificationService(db)._get_unread_count(owner) == 1
+
+    # 既読にした後のいいねで未読に戻り、未読数は1件分だけ増える
+    await NotificationService(db).mark_as_read(notification.id)
+    await like_prompt(db, owner, [actors[1]])
+    await worker.run_once()
+    (notification,) = await notifications(db, owner)
+    assert (notification.is_read, notification.actor_count) == (False, 3)
+    assert await NotificationService(db)._get_unread_count(owner) == 1
+    assert await NotificationRepository(db).count_unread(owner) == 1
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_likes_in_other_time_bucket_or_prompt_are_separate(tmp_path):
+    engine, db, (owner, *actors), session_factory = await seed(tmp_path)
+    await like_prompt(db, owner, actors[:1], created_at=datetime.utcnow() - timedelta(days=2))
+    await like_prompt(db, owner, actors[:1])
+    await like_prompt(db, owner, actors[:1], prompt_id=2)
+    await NotificationOutboxWorker(session_factory=session_factory, interval=0).run_once()
+
+    assert len(await notifications(db, owner)) == 3
+    assert await NotificationService(db)._get_unread_count(owner) == 3
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_digest_is_built_from_coalesced_notifications(tmp_path):
+    engine, db, (owner, *actors), session_factory = await seed(tmp_path)
+    worker = NotificationOutboxWorker(session_factory=session_factory, interval=0)
+    await like_prompt(db, owner, actors)
+    await worker.run_once()
+
+    sent = []
+    failing = True
+
+    async def sender(to, subject, body):
+        if failing:
+            raise OSError("smtp unavailable")
+        sent.append((to, subject, body))
+
+    scheduler = NotificationDigestScheduler(session_factory=session_factory, interval=0, sender=sender)
+    # 送信に失敗した通知は次回に再び含める
+    assert await scheduler.run_once() == 0
+    failing = False
+    assert await scheduler.run_once() == 1
+    assert sent == [("user0@example.com", "未読の通知が1件あります", "・user3さんと他2人があなたのプロンプトにいいねしました")]
+    assert await scheduler.run_once() == 0
+
+    # まとめた通知が更新されると次のダイジェストに含める
+    await like_prompt(db, owner, [actors[0]])
+    await worker.run_once()
+    assert await scheduler.run_once() == 1
+    assert sent[-1][2] == "・user1さんと他2人があなたのプロンプトにいいねしました"
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_overlapping_digest_is_not_claimed(tmp_path):
+    engine, db, (owner, *actors), session_factory = await seed(tmp_path)
+    for index in range(3):
+        db.add(Notification(user_id=owner, type="comment", content=f"comment {index}"))
+    await db.commit()
+    [digest] = await NotificationDigestService(db).build_digests()
+    ids = digest.notification_ids
+
+    # 2つのワーカーが一部の通知が重なるダイジェストを作成した
+    async with session_factory() as first, session_factory() as second:
+        digest.notification_ids = ids[:2]
+        assert await NotificationDigestService(first).claim(digest, datetime.utcnow()) is True
+        overlapping = NotificationDigest(user_id=owner, email=digest.email, notification_ids=ids[1:])
+        assert await NotificationDigestService(second).claim(overlapping, datetime.utcnow()) is False
+
+    # 重なったダイジェストの記録は取り消され、残りの通知は次回のダイジェストに含まれる
+    [rest] = await NotificationDigestService(db).build_digests()
+    assert rest.notification_ids == ids[2:]
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_scheduled_digest_runs_in_one_worker(monkeypatch):
+    cache = Cache(local=LocalLRUCache(max_size=10, ttl=30), shared=InMemorySharedCache())
+    monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+    first, second = [NotificationDigestScheduler(interval=3600) for _ in range(2)]
+    first.run_once = AsyncMock(return_value=1)
+    second.run_once = AsyncMock(return_value=1)
+
+    assert await first.run_scheduled() == 1
+    assert await second.run_scheduled() is None
+    second.run_once.assert_not_awaited()
@@ -0,0 +1,90 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.notification_hub import InMemoryBroker, NotificationHub, event_stream
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.user import User
+from app.services.notification_service import NotificationService
+
+async def started_hub(queue_size=10):
+    hub = NotificationHub(InMemoryBroker(), queue_size=queue_size)
+    await hub.start()
+    return hub
+
+def parse(event):
+    fields = dict(line.split(": ", 1) for line in event.strip().split("\n"))
+    return fields.get("id"), fields["event"], json.loads(fields["data"])
+
+@pytest.mark.asyncio
+async def test_events_reach_only_the_recipient():
+    hub = await started_hub()
+    alice, bob = hub.subscribe(1), hub.subscribe(2)
+    await hub.publish(1, "notification", {"content": "liked"}, event_id=5)
+
+    event_id, event = await alice.next(timeout=0.1)
+    assert event_id == 5
+    assert parse(event) == ("5", "notification", {"content": "liked"})
+    assert await bob.next(timeout=0.01) is None
+    await hub.stop()
+
+@pytest.mark.asyncio
+async def test_overflowing_connection_is_closed():
+    hub = await started_hub(queue_size=2)
+    subscription = hub.subscribe(1)
+    for i in range(3):
+        await hub.publish(1, "unread_count", {"unread_count": i})
+
+    assert subscription.overflowed and subscription.closed
+    # 閉じた接続はキューに残ったイベントを送ってからストリームを終える
+    events = [event async for event in event_stream(hub, subscription, [], heartbeat=1)]
+    assert len(events) == 3
+    assert hub._subscriptions == {}
+    await hub.stop()
+
+@pytest.mark.asyncio
+async def test_stream_skips_replayed_events_and_sends_heartbeats():
+    hub = await started_hub()
+    subscription = hub.subscribe(1)
+    # 再送する通知の取得中に配信された通知（再送と重複する）と、その後の通知
+    await hub.publish(1, "notification", {}, event_id=3)
+    await hub.publish(1, "notification", {}, event_id=4)
+    stream = event_stream(hub, subscription, [(3, "id: 3\nevent: notification\ndata: {}\n\n")], heartbeat=0.01)
+
+    assert (await stream.__anext__()).startswith("retry:")
+    assert parse(await stream.__anext__())[0] == "3"
+    assert parse(await stream.__anext__())[0] == "4"
+    assert await stream.__anext__() == ": heartbeat\n\n"
+    await stream.aclose()
+    assert hub._subscriptions == {}
+    await hub.stop()
+
+@pytest.mark.asyncio
+async def test_create_notification_publishes_with_unread_count(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'hub.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all, tables=[User.__table__, Notification.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="author", email="author@example.com", password="Password1")
+    db.add(user)
+    await db.commit()
+
+    hub = await started_hub()
+    subscription = hub.subscribe(user.id)
+    with patch("app.services.notification_service.get_notification_hub", return_value=hub):
+        notification = await NotificationService(db).create_notification(user.id, "like", "liked")
+        await NotificationService(db).mark_as_read(notification.id)
+
+    event_id, event = await subscription.next(timeout=0.1)
+    _, name, data = parse(event)
+    assert (event_id, name, data["content"], data["unread_count"]) == (notification.id, "notification", "liked", 1)
+    _, event = await subscription.next(timeout=0.1)
+    assert parse(event) == (None, "unread_count", {"unread_count": 0})
+    await hub.stop()
+    await db.close()
+    await engine.dispose()
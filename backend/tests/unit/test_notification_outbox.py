@@ -0,0 +1,104 @@
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.notification_hub import InMemoryBroker, NotificationHub
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
+from app.models.user import User
+from app.repositories.notification_repository import NotificationRepository
+from app.services.notification_outbox import NotificationOutboxWorker
+from app.services.notification_service import NotificationService
+
+async def seed(tmp_path, contents):
+    """2人のユーザーと、(受信者の番号, 内容) ごとのアウトボックスの行を作成する"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all,
+            tables=[User.__table__, Notification.__table__, NotificationOutbox.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com", password="Password1") for i in (1, 2)
+    ]
+    db.add_all(users)
+    await db.flush()
+    service = NotificationService(db)
+    for index, content in contents:
+        service.enqueue_notification(users[index].id, "comment", content)
+    await db.commit()
+    return engine, db, [user.id for user in users]
+
+def make_worker(engine, **kwargs):
+    @asynccontextmanager
+    async def session_factory():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+
+    return NotificationOutboxWorker(session_factory=session_factory, interval=0, **kwargs)
+
+async def outbox_rows(db):
+    return list((await db.execute(select(NotificationOutbox).order_by(NotificationOutbox.id))).scalars().all())
+
+def failing_add_many(bad_content):
+    """bad_content の通知を含む登録を失敗させる"""
+    original = NotificationRepository.add_many
+
+    async def add_many(self, values):
+        if any(value["content"] == bad_content for value in values):
+            raise IntegrityError("INSERT", {}, Exception("rejected"))
+        return await original(self, values)
+
+    return add_many
+
+@pytest.mark.asyncio
+async def test_worker_creates_notifications_in_batches(tmp_path):
+    engine, db, (user_id, other_id) = await seed(tmp_path, [(0, "a"), (0, "b"), (1, "c")])
+    hub = NotificationHub(InMemoryBroker())
+    await hub.start()
+    subscription = hub.subscribe(user_id)
+    with patch("app.services.notification_service.get_notification_hub", return_value=hub):
+        assert await make_worker(engine, batch_size=2).run_once() == 3
+
+    assert await outbox_rows(db) == []
+    assert await NotificationRepository(db).count_unread(user_id) == 2
+    assert await NotificationService(db)._get_unread_count(other_id) == 1
+    _, event = await subscription.next(timeout=0.1)
+    assert '"content":"a"' in event
+    await hub.stop()
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_failed_entry_is_retried_later_without_blocking_batch(tmp_path):
+    engine, db, (user_id, _) = await seed(tmp_path, [(0, "good"), (0, "bad"), (1, "good")])
+    with patch.object(NotificationRepository, "add_many", failing_add_many("bad")):
+        assert await make_worker(engine, retry_delay=60).run_once() == 2
+        # 再試行の時刻まで取り出さない
+        assert await make_worker(engine, retry_delay=60).run_once() == 0
+
+    (entry,) = await outbox_rows(db)
+    assert (entry.content, entry.status, entry.attempts) == ("bad", NotificationOutbox.PENDING, 1)
+    assert "rejected" in entry.last_error
+    assert await NotificationRepository(db).count_unread(user_id) == 1
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_entry_moves_to_dead_letter_after_max_attempts(tmp_path):
+    engine, db, _ = await seed(tmp_path, [(0, "bad")])
+    worker = make_worker(engine, max_attempts=2, retry_delay=0)
+    with patch.object(NotificationRepository, "add_many", failing_add_many("bad")):
+        assert await worker.run_once() == 0
+        assert await worker.run_once() == 0
+
+    (entry,) = await outbox_rows(db)
+    assert (entry.status, entry.attempts) == (NotificationOutbox.DEAD, 2)
+    await db.close()
+    await engine.dispose()
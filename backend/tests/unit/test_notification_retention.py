@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.user import User
+from app.repositories.notification_repository import NotificationRepository
+from app.services.notification_retention import NotificationPurger, NotificationRetentionService, retention_cutoff
+
+NOW = datetime(2024, 6, 1)
+
+async def seed(tmp_path, rows):
+    """(タイプ, 経過日数, 既読) ごとの通知を1人のユーザーに作成し、未読数を合わせる"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all, tables=[User.__table__, Notification.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.flush()
+    for notification_type, days, is_read in rows:
+        notification = Notification(user_id=user.id, type=notification_type, content=f"{notification_type}-{days}")
+        notification.is_read = is_read
+        notification.created_at = NOW - timedelta(days=days)
+        db.add(notification)
+    user.unread_notification_count = sum(1 for _, _, is_read in rows if not is_read)
+    await db.commit()
+    return engine, db, user.id
+
+@pytest.mark.asyncio
+async def test_purge_applies_policy_per_type_in_batches(tmp_path):
+    engine, db, user_id = await seed(tmp_path, [
+        ("system", 40, False),
+        ("system", 10, True),
+        ("like", 100, True),
+        ("like", 100, False),
+        ("like", 400, False),
+        ("comment", 60, True),
+    ])
+    purged = await NotificationRetentionService(db).purge(batch_size=1, now=NOW)
+    assert purged == {"system": 1, "default": 2}
+
+    result = await db.execute(select(Notification.content).order_by(Notification.id))
+    assert result.scalars().all() == ["system-10", "like-100", "comment-60"]
+    # 削除した未読の通知の分だけ未読数を減らす
+    assert (await db.get(User, user_id)).unread_notification_count == 1
+    assert await NotificationRepository(db).count_unread(user_id) == 1
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_user_notifications_skip_rows_past_retention(tmp_path):
+    engine, db, user_id = await seed(tmp_path, [("like", 400, False), ("like", 1, False)])
+    notifications, _ = await NotificationRepository(db).page_for_user(user_id, since=retention_cutoff(NOW))
+    assert [notification.content for notification in notifications] == ["like-1"]
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_scheduled_purge_runs_in_one_worker(monkeypatch):
+    cache = Cache(local=LocalLRUCache(max_size=10, ttl=30), shared=InMemorySharedCache())
+    monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+    first, second = [NotificationPurger(interval=3600) for _ in range(2)]
+    first.run_once = AsyncMock(return_value={})
+    second.run_once = AsyncMock(return_value={})
+
+    assert await first.run_scheduled() == {}
+    assert await second.run_scheduled() is None
+    second.run_once.assert_not_awaited()
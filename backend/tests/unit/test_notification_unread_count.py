@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.models import comment, comment_like, like, prompt, prompt_tag, rating, tag  # noqa: F401
+from app.models.notification import Notification
+from app.models.user import User
+from app.repositories.notification_repository import NotificationRepository
+from app.schemas.notification import NotificationBulkDelete, NotificationBulkUpdate
+from app.services.counter_service import COUNTERS, CounterService
+from app.services.notification_service import NotificationService
+
+UNREAD_COUNTER = next(spec for spec in COUNTERS if spec.name == "user_unread_notification_count")
+
+async def seed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'unread.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Notification.metadata.create_all, tables=[User.__table__, Notification.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com", password="Password1") for i in (1, 2)
+    ]
+    db.add_all(users)
+    await db.commit()
+    return engine, db, [user.id for user in users]
+
+def new_cache():
+    return Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=InMemorySharedCache())
+
+async def assert_counter_matches(db, user_id, expected):
+    service = NotificationService(db)
+    assert await service.get_unread_count(user_id) == expected
+    assert await NotificationRepository(db).count_unread(user_id) == expected
+
+@pytest.mark.asyncio
+async def test_counter_follows_create_read_and_delete(tmp_path):
+    engine, db, (user_id, _) = await seed(tmp_path)
+    service = NotificationService(db)
+    with patch("app.core.cache.get_cache", return_value=new_cache()):
+        notifications = [await service.create_notification(user_id, "like", "liked") for _ in range(4)]
+        await assert_counter_matches(db, user_id, 4)
+
+        # 既読の通知をもう一度既読にしても減算しない
+        assert await service.mark_as_read(notifications[0].id) is True
+        assert await service.mark_as_read(notifications[0].id) is True
+        await assert_counter_matches(db, user_id, 3)
+
+        result = await service.update_many(
+            user_id, NotificationBulkUpdate(notification_ids=[notifications[0].id, notifications[1].id])
+        )
+        assert (result.affected, result.unread_count) == (1, 2)
+
+        # 既読の通知の削除は未読数を変えない
+        result = await service.delete_many(
+            user_id, NotificationBulkDelete(notification_ids=[notifications[0].id, notifications[2].id])
+        )
+        assert (result.affected, result.unread_count) == (2, 1)
+        assert await service.delete_notification(notifications[3].id) is True
+        await assert_counter_matches(db, user_id, 0)
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_unread_count_is_served_from_cache(tmp_path):
+    engine, db, (user_id, _) = await seed(tmp_path)
+    service = NotificationService(db)
+    with patch("app.core.cache.get_cache", return_value=new_cache()):
+        await service.create_notification(user_id, "like", "liked")
+        assert await service.get_unread_count(user_id) == 1
+
+        # キャッシュされた値を返し、DBを読まない
+        await db.execute(update(User).values(unread_notification_count=5))
+        await db.commit()
+        assert await service.get_unread_count(user_id) == 1
+
+        # 未読数の更新で無効化される
+        await service.mark_all_as_read(user_id)
+        assert await service.get_unread_count(user_id) == 4
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drifted_users_and_invalidates_cache(tmp_path):
+    engine, db, (user_id, other_id) = await seed(tmp_path)
+    service = NotificationService(db)
+    with patch("app.core.cache.get_cache", return_value=new_cache()):
+        for recipient in (user_id, user_id, other_id):
+            await service.create_notification(recipient, "like", "liked")
+        await db.execute(update(User).where(User.id == user_id).values(unread_notification_count=7))
+        await db.commit()
+        assert await service.get_unread_count(user_id) == 7
+
+        assert await CounterService(db).reconcile_counter(UNREAD_COUNTER, batch_size=1) == 1
+        await assert_counter_matches(db, user_id, 2)
+        await assert_counter_matches(db, other_id, 1)
+    await db.close()
+    await engine.dispose()
@@ -0,0 +1,60 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+
+from app.core.pagination import (
+    InvalidCursorError,
+    apply_keyset,
+    created_at_key,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+)
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 12, 24, 10, 30, 15, 123456)
+    cursor = encode_cursor(created_at, 42)
+    assert decode_cursor(cursor, size=2) == (created_at, 42)
+
+def test_score_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1.5, 7)) == (1.5, 7)
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(1, 2, 3)])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, size=2)
+
+items = Table("items", MetaData(), Column("id", Integer, primary_key=True), Column("created_at", DateTime))
+
+def test_apply_keyset_accepts_cursor_matching_column_types():
+    cursor = encode_cursor(datetime(2024, 1, 1), 42)
+    query = apply_keyset(select(items), [items.c.created_at, items.c.id], cursor, 10)
+    assert query.compile().params["param_1"] == datetime(2024, 1, 1)
+
+@pytest.mark.parametrize("values", [
+    ("2024-01-01", 42),
+    (datetime(2024, 1, 1), "42"),
+    (datetime(2024, 1, 1), 4.2),
+    (datetime(2024, 1, 1), True),
+])
+def test_apply_keyset_rejects_tampered_cursor(values):
+    # 型の異なる値はSQLに渡す前に不正なカーソルとして扱う（400として返される）
+    with pytest.raises(InvalidCursorError):
+        apply_keyset(select(items), [items.c.created_at, items.c.id], encode_cursor(*values), 10)
+
+def test_keyset_page_returns_cursor_for_last_item():
+    rows = [
+        SimpleNamespace(id=i, created_at=datetime(2024, 1, 1, 0, 0, 60 - i))
+        for i in range(1, 5)
+    ]
+    page, next_cursor = keyset_page(rows, 3, created_at_key)
+    assert [row.id for row in page] == [1, 2, 3]
+    assert decode_cursor(next_cursor) == (rows[2].created_at, 3)
+
+def test_keyset_page_last_page_has_no_cursor():
+    rows = [SimpleNamespace(id=1, created_at=datetime(2024, 1, 1))]
+    page, next_cursor = keyset_page(rows, 3, created_at_key)
+    assert len(page) == 1
+    assert next_cursor is None
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.core.config import settings
+from app.models import comment, comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.repositories.prompt_repository import PromptRepository
+from app.services import search_service as search_module
+from app.services import tag_service as tag_module
+from app.services.prompt_service import PromptService
+from app.services.search_service import InMemorySearchBackend
+from app.services.tag_index import TagIndex
+from app.services.tag_service import TagService
+
+LIST_FILTERS = {"category": None, "tags": None, "tag_mode": "all", "is_published": True}
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    """ワーカー間で共有するキャッシュ（全てのワーカーが同じ共有キャッシュを参照する）"""
+    shared = InMemorySharedCache()
+    cache = Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=shared)
+    monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+    monkeypatch.setattr(tag_module, "get_cache", lambda: cache)
+    monkeypatch.setattr(search_module, "get_search_backend", InMemorySearchBackend)
+    monkeypatch.setattr(settings, "TAG_INDEX_REFRESH_INTERVAL", 0)
+    return shared
+
+async def seed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'prompts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.flush()
+    db.add_all([
+        Prompt(title="Python and AI", content="c", tags="python,ai", category="coding", user_id=user.id),
+        Prompt(title="Python only", content="c", tags="python", category="coding", user_id=user.id),
+        Prompt(title="Draft", content="c", tags="python,ai", is_published=False, user_id=user.id),
+    ])
+    await db.commit()
+    return engine, db, user.id
+
+def worker(db, index: TagIndex) -> PromptService:
+    """ワーカーごとのタグインデックスを使うサービス"""
+    service = PromptService(db)
+    service.tag_service = TagService(db, index=index)
+    return service
+
+@pytest.mark.asyncio
+async def test_default_listing_returns_published_prompts(tmp_path, shared_cache):
+    engine, db, _ = await seed(tmp_path)
+    page = await worker(db, TagIndex()).get_prompt_list_data(limit=10, filters=LIST_FILTERS)
+    assert [item["title"] for item in page["items"]] == ["Python only", "Python and AI"]
+    assert page["next_cursor"] is None
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_tag_listing_picks_up_changes_from_other_workers(tmp_path, shared_cache):
+    engine, db, user_id = await seed(tmp_path)
+    first, second = worker(db, TagIndex()), worker(db, TagIndex())
+    filters = dict(LIST_FILTERS, tags=["python", "ai"])
+
+    page = await second.get_prompt_list_data(limit=10, filters=filters)
+    assert [item["title"] for item in page["items"]] == ["Python and AI"]
+
+    # 1つ目のワーカーで作成したプロンプトが、2つ目のワーカーの一覧にも反映される
+    prompt = Prompt(title="New", content="c", tags="python,ai", user_id=user_id)
+    db.add(prompt)
+    await db.commit()
+    await first.tag_service.refresh_index()
+    await first.tag_service.index_prompt(prompt)
+    assert first.tag_service.index.version == await cache_module.get_cache().get_version(tag_module.TAG_INDEX_VERSION)
+
+    page = await second.get_prompt_list_data(limit=10, filters=filters)
+    assert [item["title"] for item in page["items"]] == ["New", "Python and AI"]
+    assert second.tag_service.index.version == first.tag_service.index.version
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_tag_mode_applies_to_offset_listing(tmp_path, shared_cache):
+    engine, db, _ = await seed(tmp_path)
+    repository = PromptRepository(db)
+    tags = TagService(db, index=TagIndex())
+
+    matched_all = await repository.list_prompts(
+        skip=0, limit=10, is_published=True, tag_clause=tags.tag_filter_clause(["ai", "python"], "all")
+    )
+    matched_any = await repository.list_prompts(
+        skip=0, limit=10, is_published=True, tag_clause=tags.tag_filter_clause(["ai", "python"], "any")
+    )
+    assert [prompt.title for prompt in matched_all] == ["Python and AI"]
+    assert [prompt.title for prompt in matched_any] == ["Python only", "Python and AI"]
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_stale_tag_index_does_not_return_unpublished_prompts(tmp_path, shared_cache):
+    engine, db, _ = await seed(tmp_path)
+    stale = worker(db, TagIndex())
+    filters = dict(LIST_FILTERS, tags=["python"])
+    await stale.get_prompt_list_data(limit=10, filters=filters)
+
+    # 他のワーカーで非公開にされたが、このワーカーのインデックスにはまだ残っている
+    prompt = await db.get(Prompt, 1)
+    prompt.is_published = False
+    await db.commit()
+    prompts, _ = await stale.get_prompts(limit=10, filters=filters)
+    assert 1 in stale.tag_service.index.query(all_tags=["python"])
+    assert [prompt.title for prompt in prompts] == ["Python only"]
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_csv_tag_clause_treats_wildcards_literally(tmp_path, shared_cache):
+    engine, db, user_id = await seed(tmp_path)
+    db.add_all([
+        Prompt(title="Underscore", content="c", tags="machine_learning", user_id=user_id),
+        Prompt(title="Lookalike", content="c", tags="machine-learning", user_id=user_id),
+    ])
+    await db.commit()
+    tags = TagService(db, index=TagIndex())
+
+    matched = await PromptRepository(db).list_prompts(
+        skip=0, limit=10, tag_clause=tags.tag_filter_clause(["machine_learning"])
+    )
+    assert [prompt.title for prompt in matched] == ["Underscore"]
+    await db.close()
+    await engine.dispose()
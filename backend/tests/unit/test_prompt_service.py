@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import cache as cache_module
+from app.core.cache import Cache, InMemorySharedCache, LocalLRUCache
+from app.models import comment, comment_like, like, rating  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.prompt_tag import PromptTag
+from app.models.tag import Tag
+from app.models.user import User
+from app.schemas.prompt import PromptCreate, PromptUpdate
+from app.services import search_service as search_module
+from app.services import tag_service as tag_module
+from app.services.prompt_service import PromptService
+from app.services.search_service import InMemorySearchBackend
+from app.services.tag_index import TagIndex
+from app.services.tag_service import TagService
+
+@pytest.fixture(autouse=True)
+def isolated_indexes(monkeypatch):
+    """キャッシュと検索インデックスをテストごとに用意する"""
+    cache = Cache(local=LocalLRUCache(max_size=100, ttl=30), shared=InMemorySharedCache())
+    monkeypatch.setattr(cache_module, "get_cache", lambda: cache)
+    monkeypatch.setattr(tag_module, "get_cache", lambda: cache)
+    monkeypatch.setattr(search_module, "get_search_backend", InMemorySearchBackend)
+
+async def setup(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'prompts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Prompt.metadata.create_all,
+            tables=[User.__table__, Prompt.__table__, Tag.__table__, PromptTag.__table__]
+        )
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.commit()
+    service = PromptService(db)
+    service.tag_service = TagService(db, index=TagIndex())
+    return engine, db, service, user.id
+
+@pytest.mark.asyncio
+async def test_create_prompt_stores_visibility_in_is_published(tmp_path):
+    engine, db, service, user_id = await setup(tmp_path)
+    prompt = await service.create_prompt(
+        PromptCreate(title="Draft", content="private notes", category="misc", tags=["Notes"], is_public=False),
+        user_id
+    )
+
+    stored = (await db.execute(select(Prompt).where(Prompt.id == prompt.id))).scalar_one()
+    assert stored.is_published is False
+    assert stored.tags == "notes"
+    # 非公開のプロンプトは検索・タグのインデックスに載せない
+    assert (await service.search_service.search("private")).hits == []
+    assert list(service.tag_service.index.query(all_tags=["notes"])) == []
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_update_prompt_maps_is_public_to_is_published(tmp_path):
+    engine, db, service, user_id = await setup(tmp_path)
+    prompt = await service.create_prompt(
+        PromptCreate(title="Draft", content="notes", category="misc", tags=["notes"], is_public=False),
+        user_id
+    )
+
+    updated = await service.update_prompt(prompt.id, PromptUpdate(is_public=True), user_id)
+    assert updated.is_published is True
+    assert [hit.id for hit in (await service.search_service.search("notes")).hits] == [prompt.id]
+    assert list(service.tag_service.index.query(all_tags=["notes"])) == [prompt.id]
+    await db.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_share_prompt_keeps_updated_at(tmp_path):
+    engine, db, service, user_id = await setup(tmp_path)
+    edited_at = datetime(2024, 1, 1)
+    db.add(Prompt(id=1, title="p", content="c", user_id=user_id, updated_at=edited_at))
+    await db.commit()
+
+    assert await service.share_prompt(1) is True
+    assert await service.share_prompt(2) is False
+    db.expire_all()
+    stored = (await db.execute(select(Prompt).where(Prompt.id == 1))).scalar_one()
+    assert stored.share_count == 1
+    assert stored.updated_at == edited_at
+    await db.close()
+    await engine.dispose()
@@ -0,0 +1,55 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.services.rating_service import RatingService
+
+def make_result(rows=(), scalar=None):
+    result = Mock()
+    result.all.return_value = list(rows)
+    result.scalar_one_or_none.return_value = scalar
+    return result
+
+def test_aggregates_from_histogram():
+    assert RatingService._aggregates({5: 2, 3: 1}) == [13, 3, 0, 0, 1, 0, 2]
+    assert RatingService._aggregates({}) == [0, 0, 0, 0, 0, 0, 0]
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_only_drifted_prompts():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(side_effect=[
+        # (id, rating_sum, rating_count, rating_count_1..5)
+        make_result([
+            (1, 9, 2, 0, 0, 0, 1, 1),
+            (2, 4, 1, 0, 0, 0, 1, 0),
+        ]),
+        # 評価テーブルの集計（プロンプト2は評価が削除済み）
+        make_result([(1, 4, 1), (1, 5, 1)]),
+        # プロンプト2の修正
+        make_result(),
+        make_result([]),
+    ])
+
+    assert await RatingService(db).reconcile(batch_size=2) == 1
+    assert db.execute.await_count == 4
+    db.commit.assert_awaited_once()
+    # 集計値の修正で編集日時は変えない
+    assert "updated_at=prompts.updated_at" in str(db.execute.await_args_list[2].args[0])
+
+@pytest.mark.asyncio
+async def test_delete_missing_rating_does_not_touch_aggregates():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(return_value=make_result(scalar=None))
+
+    assert await RatingService(db).delete_rating(prompt_id=1, user_id=1) is False
+    assert db.execute.await_count == 1
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_rating_change_keeps_prompt_updated_at():
+    db = Mock()
+    db.execute = AsyncMock()
+    await RatingService(db)._apply_delta(1, 2, 0, {3: -1, 5: 1})
+    assert "updated_at=prompts.updated_at" in str(db.execute.await_args.args[0])
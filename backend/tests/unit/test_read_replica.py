@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import SessionRouter, WriteTrackingSession
+from app.core.recent_writes import RecentWrites
+from app.models import comment, comment_like, like, notification, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+
+async def create_database(path):
+    """プライマリとレプリカの代わりにするSQLiteのDBを作成し、同じ行を入れる"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+    async with AsyncSession(engine) as db:
+        user = User(username="author", email="author@example.com", password="Password1")
+        db.add(user)
+        await db.flush()
+        db.add(Prompt(id=1, title="before", content="content", user_id=user.id))
+        await db.commit()
+    return engine
+
+async def make_router(tmp_path):
+    primary = await create_database(tmp_path / "primary.db")
+    replica = await create_database(tmp_path / "replica.db")
+    router = SessionRouter(
+        sessionmaker(primary, class_=AsyncSession, sync_session_class=WriteTrackingSession, expire_on_commit=False),
+        sessionmaker(replica, class_=AsyncSession, expire_on_commit=False),
+        RecentWrites(window=5)
+    )
+    return router, [primary, replica]
+
+async def dispose(engines):
+    for engine in engines:
+        await engine.dispose()
+
+async def read_title(router, key):
+    async with await router.reader(key) as db:
+        return (await db.execute(select(Prompt.title).where(Prompt.id == 1))).scalar_one()
+
+@pytest.mark.asyncio
+async def test_writer_reads_own_write_from_primary(tmp_path):
+    router, engines = await make_router(tmp_path)
+    async with router.writer("alice") as db:
+        await db.execute(update(Prompt).where(Prompt.id == 1).values(title="after"))
+        await db.commit()
+
+    # レプリカには反映されていない（遅延している）状態で、書き込んだユーザーだけプライマリから読む
+    assert await read_title(router, "alice") == "after"
+    assert await read_title(router, "bob") == "before"
+    assert await read_title(router, None) == "before"
+    await dispose(engines)
+
+@pytest.mark.asyncio
+async def test_read_only_commit_does_not_pin_to_primary(tmp_path):
+    router, engines = await make_router(tmp_path)
+    async with router.writer("alice") as db:
+        await db.execute(select(Prompt).where(Prompt.id == 1))
+        await db.commit()
+    assert await router.recent_writes.is_recent("alice") is False
+    await dispose(engines)
+
+@pytest.mark.asyncio
+async def test_reads_use_primary_without_replica(tmp_path):
+    router, engines = await make_router(tmp_path)
+    router.replica = None
+    async with router.writer("alice") as db:
+        prompt = await db.get(Prompt, 1)
+        prompt.title = "after"
+        await db.commit()
+    assert await read_title(router, "bob") == "after"
+    await dispose(engines)
+
+@pytest.mark.asyncio
+async def test_recent_write_expires():
+    writes = RecentWrites(window=0.01)
+    writes.mark("alice")
+    assert await writes.is_recent("alice") is True
+    writes.local.set("alice", "1", ttl=0)
+    assert await writes.is_recent("alice") is False
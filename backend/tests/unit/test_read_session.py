@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import (
+    DB_ROUND_TRIPS_SAVED,
+    WriteTrackingSession,
+    read_sessionmaker,
+    record_round_trips
+)
+from app.models import comment, comment_like, like, notification, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+
+async def create_engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'read.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+    return engine
+
+async def run_reads(factory, count=2):
+    async with factory() as db:
+        for _ in range(count):
+            await db.execute(select(Prompt.id).limit(1))
+        return record_round_trips(db, "read", route="test")
+
+@pytest.mark.asyncio
+async def test_autocommit_read_session_skips_begin_and_commit(tmp_path):
+    engine = await create_engine(tmp_path)
+    before = DB_ROUND_TRIPS_SAVED.labels(route="test")._value.get()
+    assert await run_reads(read_sessionmaker(engine)) == 2
+    assert DB_ROUND_TRIPS_SAVED.labels(route="test")._value.get() == before + 2
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_transactional_read_session_rolls_back_instead_of_commit(tmp_path):
+    engine = await create_engine(tmp_path)
+    before = DB_ROUND_TRIPS_SAVED.labels(route="test")._value.get()
+    with patch.object(settings, "DB_READ_SESSION_AUTOCOMMIT", False):
+        factory = read_sessionmaker(engine)
+    # BEGIN + 2文 + 閉じる時の ROLLBACK（コミットした場合と同じ回数）
+    assert await run_reads(factory) == 4
+    assert DB_ROUND_TRIPS_SAVED.labels(route="test")._value.get() == before
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_read_session_rejects_writes(tmp_path):
+    engine = await create_engine(tmp_path)
+    async with read_sessionmaker(engine)() as db:
+        with pytest.raises(InvalidRequestError):
+            await db.execute(update(Prompt).values(title="changed"))
+        db.add(User(username="reader", email="reader@example.com", password="Password1"))
+        with pytest.raises(InvalidRequestError):
+            await db.flush()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_write_session_counts_transaction(tmp_path):
+    engine = await create_engine(tmp_path)
+    factory = sessionmaker(engine, class_=AsyncSession, sync_session_class=WriteTrackingSession)
+    async with factory() as db:
+        await db.execute(select(Prompt.id).limit(1))
+        await db.commit()
+        assert record_round_trips(db, "write") == 3
+    await engine.dispose()
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.repositories import CommentRepository, NotificationRepository, PromptRepository, UserRepository
+from app.schemas.comment import CommentUpdate
+from app.services.comment_service import CommentService
+
+def make_db(scalar=None, rowcount=1, get=None):
+    db = Mock()
+    result = Mock()
+    result.scalar_one_or_none.return_value = scalar
+    result.scalar_one.return_value = scalar
+    result.scalars.return_value.all.return_value = []
+    result.rowcount = rowcount
+    db.execute = AsyncMock(return_value=result)
+    db.get = AsyncMock(return_value=get)
+    db.delete = AsyncMock()
+    db.commit = AsyncMock()
+    db.flush = AsyncMock()
+    db.refresh = AsyncMock()
+    return db
+
+@pytest.mark.asyncio
+async def test_get_uses_async_session():
+    prompt = SimpleNamespace(id=1)
+    db = make_db(get=prompt)
+    assert await PromptRepository(db).get(1) is prompt
+    db.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_update_commits_and_refreshes():
+    db = make_db()
+    comment = SimpleNamespace(content="before", updated_at=None)
+    await CommentRepository(db).update_content(comment, "after")
+    assert comment.content == "after"
+    assert comment.updated_at is not None
+    db.commit.assert_awaited_once()
+    db.refresh.assert_awaited_once_with(comment)
+
+@pytest.mark.asyncio
+async def test_write_without_commit_only_flushes():
+    db = make_db()
+    comment = SimpleNamespace(id=1)
+    await CommentRepository(db).delete(comment, commit=False)
+    db.delete.assert_awaited_once_with(comment)
+    db.flush.assert_awaited_once()
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_delete_by_id_without_row():
+    db = make_db(rowcount=0)
+    assert await NotificationRepository(db).delete_by_id(1) is False
+    db.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_mark_all_read_uses_single_update():
+    db = make_db(rowcount=3)
+    assert await NotificationRepository(db).mark_all_read(user_id=1) == 3
+    assert db.execute.await_count == 1
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_authenticate_rejects_wrong_password():
+    user = Mock()
+    user.check_password.return_value = False
+    db = make_db(scalar=user)
+    assert await UserRepository(db).authenticate("user@example.com", "wrong") is None
+    user.check_password.assert_called_once_with("wrong")
+
+@pytest.mark.asyncio
+async def test_exists_does_not_load_row():
+    db = make_db(scalar=None)
+    assert await PromptRepository(db).exists(1) is False
+    db.get.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_update_comment_rejects_other_user():
+    comment = SimpleNamespace(id=1, user_id=2, prompt_id=1, content="original")
+    db = make_db(get=comment)
+    assert await CommentService(db).update_comment(1, 1, CommentUpdate(content="changed")) is None
+    assert comment.content == "original"
+    db.commit.assert_not_awaited()
@@ -0,0 +1,179 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import comment, comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.services import search_service as search_module
+from app.services.prompt_service import PromptService
+from app.services.search_service import (
+    InMemorySearchBackend,
+    InvertedIndex,
+    SearchDocument,
+    SearchService,
+    SQLiteFTSSearchBackend,
+)
+
+def make_document(doc_id, title, content="", tags=""):
+    return SearchDocument(
+        id=doc_id,
+        fields={"title": title, "content": content, "description": "", "tags": tags},
+    )
+
+class TestInvertedIndex:
+    @pytest.fixture
+    def index(self):
+        index = InvertedIndex()
+        index.add(make_document(1, "Python tips", "write clean python code"))
+        index.add(make_document(2, "Cooking", "python is also a snake"))
+        index.add(make_document(3, "Marketing copy", "write a catchy headline", tags="ad,copy"))
+        return index
+
+    def test_search_ranks_title_matches_first(self, index):
+        hits = index.search("python")
+        assert [hit.id for hit in hits] == [1, 2]
+
+    def test_search_requires_all_terms(self, index):
+        hits = index.search("write python")
+        assert [hit.id for hit in hits] == [1]
+
+    def test_search_unknown_term_returns_empty(self, index):
+        assert index.search("rust") == []
+
+    def test_update_replaces_previous_terms(self, index):
+        index.add(make_document(2, "Cooking", "pasta recipes"))
+        assert [hit.id for hit in index.search("python")] == [1]
+        assert [hit.id for hit in index.search("pasta")] == [2]
+
+    def test_remove(self, index):
+        index.remove(1)
+        assert 1 not in index
+        assert [hit.id for hit in index.search("python")] == [2]
+
+    def test_search_after_key(self, index):
+        first = index.search("python", limit=1)
+        rest = index.search("python", limit=10, after=(first[0].score, first[0].id))
+        assert [hit.id for hit in rest] == [2]
+
+class TestInMemorySearchBackend:
+    @pytest.mark.asyncio
+    async def test_keyset_pagination_visits_every_hit_once(self):
+        backend = InMemorySearchBackend()
+        for doc_id in range(1, 26):
+            await backend.index(make_document(doc_id, "prompt", "prompt " * (doc_id % 5)))
+
+        seen = []
+        cursor = None
+        while True:
+            page = await backend.search("prompt", limit=10, cursor=cursor)
+            seen.extend(hit.id for hit in page.hits)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert sorted(seen) == list(range(1, 26))
+
+    @pytest.mark.asyncio
+    async def test_rebuild_replaces_index(self):
+        backend = InMemorySearchBackend()
+        await backend.index(make_document(1, "old prompt"))
+        count = await backend.rebuild([make_document(2, "new prompt")])
+        assert count == 1
+        page = await backend.search("prompt", limit=10)
+        assert [hit.id for hit in page.hits] == [2]
+
+class TestSQLiteFTSSearchBackend:
+    @pytest.mark.asyncio
+    async def test_sqlite_matches_spanish_query_without_language(self, tmp_path):
+        backend = SQLiteFTSSearchBackend(str(tmp_path / "search_index.sqlite3"))
+        await backend.index(SearchDocument(id=1, fields={"title": "Canciones para niños"}, language="es"))
+        await backend.index(SearchDocument(id=2, fields={"title": "Writing prompts"}, language="en"))
+        assert [hit.id for hit in (await backend.search("canción", limit=10)).hits] == [1]
+        assert [hit.id for hit in (await backend.search("writing", limit=10)).hits] == [2]
+
+async def seed_prompts(tmp_path):
+    """公開中と非公開のプロンプトを prompts テーブルに作成する"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+    db = AsyncSession(engine, expire_on_commit=False)
+    user = User(username="user", email="user@example.com", password="Password1")
+    db.add(user)
+    await db.flush()
+    db.add_all([
+        Prompt(title="Python tips", content="write clean python code", user_id=user.id),
+        Prompt(title="Python draft", content="unfinished python notes", is_published=False, user_id=user.id),
+    ])
+    await db.commit()
+    return engine, db
+
+class TestSearchWithPromptTable:
+    @pytest.mark.asyncio
+    async def test_rebuild_and_search_only_published_prompts(self, tmp_path, monkeypatch):
+        # 既定のバックエンド（インデックスのファイル）を開かないよう、プロセス内のバックエンドを使う
+        monkeypatch.setattr(search_module, "get_search_backend", InMemorySearchBackend)
+        engine, db = await seed_prompts(tmp_path)
+        service = PromptService(db)
+        assert await service.search_service.rebuild_index() == 1
+
+        prompts, _ = await service.search_prompts("python")
+        assert [prompt.title for prompt in prompts] == ["Python tips"]
+
+        # 非公開にしたプロンプトはインデックスから取り除く
+        prompts[0].is_published = False
+        await service.search_service.index_prompt(prompts[0])
+        assert await service.search_prompts("python") == ([], None)
+        await db.close()
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_sqlite_index_is_shared_between_workers(self, tmp_path):
+        engine, db = await seed_prompts(tmp_path)
+        path = str(tmp_path / "search_index.sqlite3")
+        # 同じファイルを開く2つのバックエンド（ワーカー）の一方で書き込み、もう一方で検索する
+        writer = SearchService(db, backend=SQLiteFTSSearchBackend(path))
+        reader = SearchService(db, backend=SQLiteFTSSearchBackend(path))
+        assert await writer.rebuild_index() == 1
+
+        page = await reader.search("python")
+        assert len(page.hits) == 1
+        await writer.remove_prompt(page.hits[0].id)
+        assert (await reader.search("python")).hits == []
+        await db.close()
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_rebuild_indexes_each_batch_as_it_is_read(self, tmp_path):
+        engine, db = await seed_prompts(tmp_path)
+        db.add_all([Prompt(title=f"Python {i}", content="python", user_id=1) for i in range(3)])
+        await db.commit()
+        batches = []
+
+        class RecordingBackend(InMemorySearchBackend):
+            async def rebuild_batches(self, source):
+                async def record():
+                    async for documents in source:
+                        batches.append(len(documents))
+                        yield documents
+                return await super().rebuild_batches(record())
+
+        service = SearchService(db, backend=RecordingBackend())
+        assert await service.rebuild_index(batch_size=2) == 4
+        assert batches == [2, 2]
+        await db.close()
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_sqlite_rebuild_runs_once_across_workers(self, tmp_path):
+        engine, db = await seed_prompts(tmp_path)
+        path = str(tmp_path / "search_index.sqlite3")
+        first, second = SQLiteFTSSearchBackend(path), SQLiteFTSSearchBackend(path)
+        # 先に再構築を始めたワーカーだけが再構築し、間隔を過ぎるまで他のワーカーは省略する
+        assert await first.claim_rebuild(600) is True
+        assert await second.claim_rebuild(600) is False
+        assert await second.claim_rebuild(0) is True
+
+        await SearchService(db, backend=second).rebuild_index(batch_size=1)
+        assert len((await SearchService(db, backend=first).search("python")).hits) == 1
+        await db.close()
+        await engine.dispose()
@@ -0,0 +1,70 @@
+from app.services.search_service import InvertedIndex, SearchDocument
+from app.utils.search_utils import (
+    analyze,
+    analyze_query,
+    analyze_query_variants,
+    normalize_search_query,
+    stem_english,
+    stem_french,
+    stem_spanish,
+)
+
+def test_normalize_search_query():
+    assert normalize_search_query("  Ｐｙｔｈｏｎ   Tips ") == "python tips"
+
+def test_japanese_text_is_split_into_bigrams_and_trigrams():
+    assert analyze("機械学習", "ja") == ["機械", "械学", "学習", "機械学", "械学習"]
+
+def test_short_japanese_run_is_kept_whole():
+    assert analyze("猫", "ja") == ["猫"]
+
+def test_japanese_query_uses_longest_ngram():
+    assert analyze_query("機械学習") == ["機械学", "械学習"]
+    assert analyze_query("学習") == ["学習"]
+    assert analyze_query("猫") == ["猫"]
+
+def test_mixed_text_keeps_latin_words():
+    assert analyze("ChatGPTの使い方", "ja") == [
+        "chatgpt", "の使", "使い", "い方", "の使い", "使い方"
+    ]
+
+def test_english_stop_words_and_stemming():
+    assert analyze("The prompts for writing stories", "en") == ["prompt", "writ", "story"]
+
+def test_stemmers():
+    assert stem_english("running") == "run"
+    assert stem_spanish("canciones") == "cancion"
+    assert stem_french("journaux") == "journal"
+
+def test_japanese_substring_search():
+    index = InvertedIndex()
+    index.add(SearchDocument(id=1, fields={"content": "機械学習のためのプロンプト"}, language="ja"))
+    index.add(SearchDocument(id=2, fields={"content": "学習計画を立てる"}, language="ja"))
+
+    assert [hit.id for hit in index.search("機械学習")] == [1]
+    assert sorted(hit.id for hit in index.search("学習")) == [1, 2]
+    assert [hit.id for hit in index.search("プロンプト")] == [1]
+    # トライグラムで絞り込むため、バイグラムが離れて現れるだけのドキュメントには一致しない
+    index.add(SearchDocument(id=3, fields={"content": "機械の学習"}, language="ja"))
+    assert [hit.id for hit in index.search("機械学習")] == [1]
+
+def test_english_query_matches_inflected_forms():
+    index = InvertedIndex()
+    index.add(SearchDocument(id=1, fields={"title": "Writing prompts"}, language="en"))
+    assert [hit.id for hit in index.search("prompt", language="en")] == [1]
+
+def test_query_without_language_is_analyzed_for_every_language():
+    assert analyze_query_variants("canción") == [["canción"], ["cancion"]]
+    assert analyze_query_variants("canción", "es") == [["cancion"]]
+    assert analyze_query_variants("機械学習") == [["機械学", "械学習"]]
+
+def test_spanish_and_french_queries_match_without_language():
+    index = InvertedIndex()
+    index.add(SearchDocument(id=1, fields={"title": "Canciones para niños"}, language="es"))
+    index.add(SearchDocument(id=2, fields={"title": "Créer des histoires"}, language="fr"))
+    index.add(SearchDocument(id=3, fields={"title": "Writing prompts"}, language="en"))
+
+    assert [hit.id for hit in index.search("canción")] == [1]
+    assert [hit.id for hit in index.search("créer")] == [2]
+    assert [hit.id for hit in index.search("histoire")] == [2]
+    assert [hit.id for hit in index.search("writing")] == [3]
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.core.serialization import FastJSONResponse, compile_encoder, encode_many, list_response
+
+class Author(BaseModel):
+    id: int
+    name: str
+
+class Item(BaseModel):
+    id: int
+    title: str
+    tags: List[str] = []
+    created_at: datetime
+    author: Optional[Author] = None
+    replies: List["Item"] = []
+
+Item.model_rebuild()
+
+def test_encoder_reads_objects_and_dicts():
+    created_at = datetime(2024, 12, 1, 9, 30)
+    row = SimpleNamespace(id=1, title="a", created_at=created_at, author=SimpleNamespace(id=2, name="bob"), secret="x")
+    encoded = compile_encoder(Item)(row)
+    assert encoded == {
+        "id": 1,
+        "title": "a",
+        "tags": [],
+        "created_at": created_at,
+        "author": {"id": 2, "name": "bob"},
+        "replies": [],
+    }
+    assert "secret" not in encoded
+
+    encoded = compile_encoder(Item)({"id": 3, "title": "b", "created_at": "2024-12-01T09:30:00", "replies": [{"id": 4, "title": "c"}]})
+    assert encoded["author"] is None
+    assert encoded["replies"][0]["id"] == 4
+
+def test_encoder_is_compiled_once_per_schema():
+    assert compile_encoder(Item) is compile_encoder(Item)
+
+def test_output_matches_pydantic():
+    rows = [
+        SimpleNamespace(id=i, title=f"t{i}", tags=["x"], created_at=datetime(2024, 1, 1, 0, 0, i, 123), author=None, replies=[])
+        for i in range(3)
+    ]
+    fast = json.loads(FastJSONResponse(content=encode_many(Item, rows)).body)
+    expected = [Item.model_validate(row, from_attributes=True).model_dump(mode="json") for row in rows]
+    assert fast == expected
+
+def test_list_response_keeps_route_headers():
+    response = Response()
+    response.headers["X-Next-Cursor"] = "abc"
+    response.headers["ETag"] = 'W/"1"'
+    result = list_response(response, Author, [{"id": 1, "name": "a"}])
+    assert result.headers["X-Next-Cursor"] == "abc"
+    assert result.headers["ETag"] == 'W/"1"'
+    assert json.loads(result.body) == [{"id": 1, "name": "a"}]
@@ -0,0 +1,85 @@
+import pytest
+
+from app.services.tag_index import ARRAY_LIMIT, Bitmap, TagIndex
+
+class TestBitmap:
+    def test_add_and_contains_across_chunks(self):
+        bitmap = Bitmap([1, 70000, 3])
+        assert 1 in bitmap
+        assert 70000 in bitmap
+        assert 2 not in bitmap
+        assert list(bitmap) == [1, 3, 70000]
+        assert len(bitmap) == 3
+
+    def test_dense_container_round_trip(self):
+        bitmap = Bitmap(range(ARRAY_LIMIT + 10))
+        assert isinstance(bitmap._containers[0], int)
+        assert len(bitmap) == ARRAY_LIMIT + 10
+
+        for value in range(20):
+            bitmap.discard(value)
+        assert isinstance(bitmap._containers[0], set)
+        assert len(bitmap) == ARRAY_LIMIT - 10
+        assert 19 not in bitmap
+        assert 20 in bitmap
+
+    def test_and_or(self):
+        evens = Bitmap(range(0, 10000, 2))
+        threes = Bitmap(range(0, 10000, 3))
+        assert list(evens & threes) == list(range(0, 10000, 6))
+        assert len(evens | threes) == len(set(range(0, 10000, 2)) | set(range(0, 10000, 3)))
+
+    def test_or_does_not_mutate_operands(self):
+        a = Bitmap([1, 2])
+        b = Bitmap([3])
+        union = a | b
+        union.add(4)
+        assert list(a) == [1, 2]
+        assert list(b) == [3]
+
+    def test_iter_desc_below(self):
+        bitmap = Bitmap([5, 70000, 3, 65536, 9000])
+        assert list(bitmap.iter_desc()) == [70000, 65536, 9000, 5, 3]
+        assert list(bitmap.iter_desc(below=65536)) == [9000, 5, 3]
+
+class TestTagIndex:
+    @pytest.fixture
+    def index(self):
+        index = TagIndex()
+        index.set_prompt(1, ["python", "ai"], "coding")
+        index.set_prompt(2, ["python"], "coding")
+        index.set_prompt(3, ["ai", "paint"], "art")
+        index.set_prompt(4, ["paint"], "art")
+        return index
+
+    def test_query_all_tags(self, index):
+        assert list(index.query(all_tags=["python", "ai"])) == [1]
+
+    def test_query_any_tags(self, index):
+        assert list(index.query(any_tags=["python", "paint"])) == [1, 2, 3, 4]
+
+    def test_query_with_category(self, index):
+        assert list(index.query(any_tags=["ai"], category="art")) == [3]
+
+    def test_tags_match_exactly(self, index):
+        # "ai" が "paint" の部分文字列として一致しないこと
+        assert list(index.query(all_tags=["ai"])) == [1, 3]
+
+    def test_unknown_tag_returns_empty(self, index):
+        assert list(index.query(all_tags=["python", "rust"])) == []
+
+    def test_no_conditions_returns_none(self, index):
+        assert index.query() is None
+
+    def test_update_and_remove(self, index):
+        index.set_prompt(1, ["rust"], "coding")
+        assert list(index.query(all_tags=["python"])) == [2]
+        index.remove_prompt(2)
+        assert list(index.query(all_tags=["python"])) == []
+        assert ("python", 0) not in index.tag_counts()
+        assert len(index) == 3
+
+    def test_query_result_is_independent_copy(self, index):
+        result = index.query(all_tags=["paint"])
+        result.add(99)
+        assert 99 not in index.query(all_tags=["paint"])
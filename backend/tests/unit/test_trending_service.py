@@ -0,0 +1,218 @@
+import math
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import comment, comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.services.trending_service import (
+    EVENT_WEIGHTS,
+    REBASE_THRESHOLD,
+    DecayedRanking,
+    InMemoryTrendingStore,
+    SharedTrendingEngine,
+    TrendingEngine,
+    TrendingService,
+)
+
+HOUR = 60 * 60
+
+class TestDecayedRanking:
+    def test_scores_decay_over_time(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=10, now=0)
+        ranking.add(1, 1.0, now=0)
+        [(prompt_id, score)] = ranking.top(10, now=HOUR)
+        assert prompt_id == 1
+        assert score == pytest.approx(math.exp(-1))
+
+    def test_recent_events_outrank_older_ones(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=10, now=0)
+        ranking.add(1, 2.0, now=0)
+        ranking.add(2, 1.0, now=2 * HOUR)
+        assert [prompt_id for prompt_id, _ in ranking.top(10, now=2 * HOUR)] == [2, 1]
+
+    def test_top_is_bounded_by_capacity(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=3, now=0)
+        for prompt_id in range(1, 6):
+            ranking.add(prompt_id, float(prompt_id), now=0)
+        assert [prompt_id for prompt_id, _ in ranking.top(10, now=0)] == [5, 4, 3]
+
+        # 上位外のプロンプトのスコアが上がれば上位に入る
+        ranking.add(1, 10.0, now=0)
+        assert [prompt_id for prompt_id, _ in ranking.top(10, now=0)] == [1, 5, 4]
+
+    def test_decrease_lets_other_prompt_back_in(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=2, now=0)
+        ranking.add(1, 3.0, now=0)
+        ranking.add(2, 2.0, now=0)
+        ranking.add(3, 1.0, now=0)
+        ranking.add(1, -2.5, now=0)
+        assert [prompt_id for prompt_id, _ in ranking.top(10, now=0)] == [2, 3]
+
+    def test_rebase_keeps_ranking_and_drops_stale_prompts(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=10, now=0)
+        ranking.add(1, 1.0, now=0)
+        now = (REBASE_THRESHOLD + 1) * HOUR
+        ranking.add(2, 1.0, now=now)
+        assert ranking.t0 == now
+        assert len(ranking) == 1
+        [(prompt_id, score)] = ranking.top(10, now=now)
+        assert prompt_id == 2
+        assert score == pytest.approx(1.0)
+
+    def test_remove(self):
+        ranking = DecayedRanking(tau=HOUR, capacity=10, now=0)
+        ranking.add(1, 1.0, now=0)
+        ranking.add(2, 2.0, now=0)
+        ranking.remove(2)
+        assert [prompt_id for prompt_id, _ in ranking.top(10, now=0)] == [1]
+
+class TestTrendingEngine:
+    def test_windows_rank_independently(self):
+        engine = TrendingEngine(capacity=10, now=0)
+        # 古いが大量のいいね
+        engine.record(1, "like", 20, now=0)
+        # 最近の少数のいいね
+        engine.record(2, "like", 2, now=6 * HOUR)
+
+        assert engine.top("1h", now=6 * HOUR)[0][0] == 2
+        assert engine.top("7d", now=6 * HOUR)[0][0] == 1
+
+    def test_event_weights(self):
+        engine = TrendingEngine(capacity=10, now=0)
+        engine.record(1, "share", now=0)
+        engine.record(2, "view", now=0)
+        scores = dict(engine.top("24h", now=0))
+        assert scores[1] == pytest.approx(EVENT_WEIGHTS["share"])
+        assert scores[2] == pytest.approx(EVENT_WEIGHTS["view"])
+
+    def test_unknown_event_and_window(self):
+        engine = TrendingEngine(capacity=10, now=0)
+        with pytest.raises(ValueError):
+            engine.record(1, "download")
+        with pytest.raises(ValueError):
+            engine.top("30d")
+
+class FailingTrendingStore(InMemoryTrendingStore):
+    def __init__(self):
+        super().__init__(TrendingEngine(capacity=10, now=0))
+        self.fail = True
+
+    async def add(self, window, increments, epoch):
+        if self.fail:
+            raise ConnectionError("store is down")
+        await super().add(window, increments, epoch)
+
+class TestSharedTrendingEngine:
+    @pytest.mark.asyncio
+    async def test_workers_share_one_ranking(self):
+        store = InMemoryTrendingStore(TrendingEngine(capacity=10, now=0))
+        first = SharedTrendingEngine(store, now=0)
+        second = SharedTrendingEngine(store, now=0)
+        first.record(1, "like", 2, now=0)
+        second.record(2, "like", 3, now=0)
+        first.record(2, "view", now=0)
+        await first.flush(now=0)
+        await second.flush(now=0)
+
+        # どちらのワーカーから読んでも同じ順位とスコアになる
+        assert await first.ranked("24h") == await second.ranked("24h")
+        scores = dict(store.engine.top("24h", now=0))
+        assert scores[1] == pytest.approx(2 * EVENT_WEIGHTS["like"])
+        assert scores[2] == pytest.approx(3 * EVENT_WEIGHTS["like"] + EVENT_WEIGHTS["view"])
+
+    @pytest.mark.asyncio
+    async def test_buffered_events_keep_their_decay(self):
+        store = InMemoryTrendingStore(TrendingEngine(capacity=10, now=0))
+        worker = SharedTrendingEngine(store, now=0)
+        worker.record(1, "like", now=0)
+        worker.record(2, "like", now=HOUR)
+        await worker.flush(now=HOUR)
+
+        scores = dict(store.engine.top("1h", now=HOUR))
+        assert scores[1] == pytest.approx(EVENT_WEIGHTS["like"] * math.exp(-1))
+        assert scores[2] == pytest.approx(EVENT_WEIGHTS["like"])
+
+    @pytest.mark.asyncio
+    async def test_removed_prompt_leaves_shared_ranking(self):
+        store = InMemoryTrendingStore(TrendingEngine(capacity=10, now=0))
+        first = SharedTrendingEngine(store, now=0)
+        second = SharedTrendingEngine(store, now=0)
+        first.record(1, "like", now=0)
+        first.record(2, "like", now=0)
+        await first.flush(now=0)
+        second.remove_prompt(1)
+        await second.flush(now=0)
+        assert [prompt_id for prompt_id, _ in await first.ranked("24h")] == [2]
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self):
+        store = FailingTrendingStore()
+        worker = SharedTrendingEngine(store, now=0)
+        worker.record(1, "like", now=0)
+        assert await worker.flush(now=HOUR) == 0
+        assert store.engine.top("1h", now=HOUR) == []
+
+        store.fail = False
+        assert await worker.flush(now=HOUR) == len(store.engine.rankings)
+        [(prompt_id, score)] = store.engine.top("1h", now=HOUR)
+        assert prompt_id == 1
+        assert score == pytest.approx(EVENT_WEIGHTS["like"] * math.exp(-1))
+
+    @pytest.mark.asyncio
+    async def test_only_one_worker_initializes_the_ranking(self):
+        store = InMemoryTrendingStore(TrendingEngine(capacity=10, now=0))
+        warmed = TrendingEngine(capacity=10, now=0)
+        warmed.record(1, "like", now=0)
+        assert await SharedTrendingEngine(store, now=0).initialize(warmed, now=0)
+        assert not await SharedTrendingEngine(store, now=0).initialize(warmed, now=0)
+        [(prompt_id, score)] = store.engine.top("24h", now=0)
+        assert prompt_id == 1
+        assert score == pytest.approx(EVENT_WEIGHTS["like"])
+
+class TestTrendingService:
+    async def seed(self, tmp_path):
+        """公開中のプロンプト（ID 1, 3, 5, 6）と非公開のプロンプト（ID 2, 4）を作成する"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'trending.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+        db = AsyncSession(engine, expire_on_commit=False)
+        user = User(username="user", email="user@example.com", password="Password1")
+        db.add(user)
+        await db.flush()
+        for prompt_id in range(1, 7):
+            db.add(Prompt(
+                id=prompt_id,
+                title=f"prompt {prompt_id}",
+                content="c",
+                is_published=prompt_id not in (2, 4),
+                like_count=prompt_id,
+                created_at=datetime.utcnow(),
+                user_id=user.id
+            ))
+        await db.commit()
+        return engine, db
+
+    @pytest.mark.asyncio
+    async def test_hidden_prompts_are_backfilled_from_lower_ranks(self, tmp_path):
+        engine, db = await self.seed(tmp_path)
+        ranking = TrendingEngine(capacity=10)
+        # ID 7 は削除済み（テーブルにない）プロンプト
+        for prompt_id, likes in [(7, 9), (4, 8), (2, 7), (6, 6), (5, 5), (3, 4), (1, 3)]:
+            ranking.record(prompt_id, "like", likes)
+
+        prompts = await TrendingService(db, ranking).get_trending_prompts(limit=2)
+        assert [prompt.id for prompt in prompts] == [6, 5]
+        await db.close()
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_warm_up_reads_published_prompts(self, tmp_path):
+        engine, db = await self.seed(tmp_path)
+        ranking = TrendingEngine(capacity=10)
+        assert await TrendingService(db, ranking).warm_up() == 4
+        assert [prompt_id for prompt_id, _ in ranking.top("7d", 10)] == [6, 5, 3, 1]
+        await db.close()
+        await engine.dispose()
@@ -0,0 +1,96 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import comment, comment_like, like, prompt_tag, rating, tag  # noqa: F401
+from app.models.prompt import Prompt
+from app.models.user import User
+from app.services.view_counter import ViewCountAggregator
+
+class FakeSession:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, statement):
+        if self.fail:
+            raise RuntimeError("database is unavailable")
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.committed = True
+
+def make_aggregator(session, batch_size=500):
+    @asynccontextmanager
+    async def session_factory():
+        yield session
+
+    return ViewCountAggregator(session_factory=session_factory, interval=60, batch_size=batch_size)
+
+def test_record_aggregates_per_prompt():
+    aggregator = make_aggregator(FakeSession())
+    aggregator.record(1)
+    aggregator.record(1)
+    aggregator.record(2, 3)
+    assert aggregator.pending == {1: 2, 2: 3}
+
+@pytest.mark.asyncio
+async def test_flush_writes_batches_and_clears_buffer():
+    session = FakeSession()
+    aggregator = make_aggregator(session, batch_size=2)
+    for prompt_id in range(1, 6):
+        aggregator.record(prompt_id)
+
+    assert await aggregator.flush() == 5
+    assert len(session.statements) == 3
+    assert session.committed
+    assert aggregator.pending == {}
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_counts():
+    aggregator = make_aggregator(FakeSession(fail=True))
+    aggregator.record(1, 2)
+    assert await aggregator.flush() == 0
+    aggregator.record(1)
+    assert aggregator.pending == {1: 3}
+
+@pytest.mark.asyncio
+async def test_stop_flushes_remaining_views():
+    session = FakeSession()
+    aggregator = make_aggregator(session)
+    aggregator.start()
+    aggregator.record(1)
+    await aggregator.stop()
+    assert aggregator.pending == {}
+    assert session.committed
+
+@pytest.mark.asyncio
+async def test_flush_keeps_prompt_updated_at(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'views.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Prompt.metadata.create_all, tables=[User.__table__, Prompt.__table__])
+    edited_at = datetime(2024, 1, 1)
+    async with AsyncSession(engine) as db:
+        user = User(username="user", email="user@example.com", password="Password1")
+        db.add(user)
+        await db.flush()
+        db.add(Prompt(id=1, title="p", content="c", user_id=user.id, updated_at=edited_at))
+        await db.commit()
+
+    @asynccontextmanager
+    async def session_factory():
+        async with AsyncSession(engine) as db:
+            yield db
+
+    aggregator = ViewCountAggregator(session_factory=session_factory, interval=60)
+    aggregator.record(1, 3)
+    assert await aggregator.flush() == 3
+
+    async with AsyncSession(engine) as db:
+        prompt = await db.get(Prompt, 1)
+        assert prompt.view_count == 3
+        assert prompt.updated_at == edited_at
+    await engine.dispose()